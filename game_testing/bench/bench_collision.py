@@ -0,0 +1,70 @@
+#physics_entity.update at dash speeds and beyond: the swept update against the two-pass one over one rect per tile
+#every sample starts the player-sized entity somewhere clear on the tutorial level and moves it one frame in a random direction
+#"passed" counts the moves the two-pass update let through a wall or pushed out the far side, "inside" the ones it left overlapping a solid tile
+#run from the repo root: python game_testing/bench/bench_collision.py
+import os
+import sys
+import math
+import random
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import game
+from script.entity import physics_entity
+from check_collision import two_pass_update, tile_rects
+
+SAMPLES = 20000
+SPEEDS = (2, 8, 10, 16, 32, 64)
+
+UPDATES = (
+    ("two pass tiles", lambda entity, tilemap: two_pass_update(entity, tilemap=tilemap, lookup=tile_rects)),
+    ("swept", lambda entity, tilemap: physics_entity.update(entity, tilemap=tilemap)),
+)
+
+def inside(tilemap, rect):
+    if tilemap.collision is None:
+        tilemap.build_collision()
+    return rect.collidelist(tilemap.collision[0]) != -1
+
+def samples(tilemap, entity, speed):
+    random.seed(speed)
+    moves = []
+    while len(moves) < SAMPLES:
+        entity.position = [random.uniform(0, 1800), random.uniform(0, 240)]
+        if inside(tilemap, entity.rect()):
+            continue
+        angle = random.random()*math.pi*2
+        moves.append((list(entity.position), [math.cos(angle)*speed, math.sin(angle)*speed]))
+    return moves
+
+def run(update, entity, tilemap, moves):
+    ends = []
+    start = time.perf_counter()
+    for position, velocity in moves:
+        entity.position = list(position)
+        entity.velocity = list(velocity)
+        update(entity, tilemap)
+        ends.append(tuple(entity.position))
+    return (time.perf_counter() - start)/len(moves)*1e6, ends
+
+def main():
+    main_game = game.main_game(headless=True)
+    main_game.level = -1
+    main_game.load_level(False)
+    tilemap = main_game.tilemap
+    entity = physics_entity(main_game, 'player', (0, 0), (8, 15))
+    print("%6s %-16s %10s %8s %8s" % ("speed", "", "us/update", "passed", "inside"))
+    for speed in SPEEDS:
+        moves = samples(tilemap, entity, speed)
+        results = [(name,) + run(update, entity, tilemap, moves) for name, update in UPDATES]
+        swept_ends = results[-1][2]
+        for name, us, ends in results:
+            passed = sum(1 for end, swept_end in zip(ends, swept_ends) if end != swept_end)
+            stuck = 0
+            for end in ends:
+                entity.position = list(end)
+                stuck += inside(tilemap, entity.rect())
+            print("%6d %-16s %10.3f %8d %8d" % (speed, name, us, passed, stuck))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#combat bursts of particles: a new Particle per hit removed with list.remove, against Particle_Pool
+#run from the repo root: python game_testing/bench/bench_particles.py
+import os
+import sys
+import gc
+import math
+import random
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import pygame
+from script.utils import Animation_Clip
+from script.particle import Particle, Particle_Pool
+
+FRAMES = 2000
+
+class Bench_Game:
+    #particles only look up their animation in assets
+    def __init__(self):
+        images = [pygame.Surface((4, 4)) for i in range(4)]
+        self.assets = {"particle/particle": Animation_Clip(images, duration=6, loop=False)}
+
+def bursts(spawn, frames, per_hit):
+    #a hit every 4 frames, like a combo on the boss
+    random.seed(0)
+    for frame in range(frames):
+        if frame % 4 == 0:
+            for i in range(per_hit):
+                angle = random.random()*math.pi*2
+                speed = random.random()*5
+                spawn([math.cos(angle)*speed*0.5, math.sin(angle)*speed*0.5], random.randint(0,7))
+        yield
+
+def list_run(game, per_hit):
+    particles = []
+    for frame in bursts(lambda velocity, start: particles.append(Particle(game, 'particle', (160, 120), velocity, frame=start)), FRAMES, per_hit):
+        for particle in particles.copy():
+            if particle.update():
+                particles.remove(particle)
+    return len(particles)
+
+def pool_run(game, per_hit):
+    particles = Particle_Pool(game)
+    for frame in bursts(lambda velocity, start: particles.spawn('particle', (160, 120), velocity, frame=start), FRAMES, per_hit):
+        particles.update()
+    return len(particles)
+
+def timed(function):
+    collections = sum(stat["collections"] for stat in gc.get_stats())
+    start = time.perf_counter()
+    result = function()
+    elapsed = (time.perf_counter() - start) / FRAMES * 1000
+    return elapsed, sum(stat["collections"] for stat in gc.get_stats()) - collections, result
+
+def main():
+    game = Bench_Game()
+    print("%8s %10s %10s %10s %10s" % ("per hit", "list ms", "list gc", "pool ms", "pool gc"))
+    for per_hit in (10, 40, 200):
+        list_ms, list_gc, list_left = timed(lambda: list_run(game, per_hit))
+        pool_ms, pool_gc, pool_left = timed(lambda: pool_run(game, per_hit))
+        assert list_left == pool_left
+        print("%8d %10.4f %10d %10.4f %10d" % (per_hit, list_ms, list_gc, pool_ms, pool_gc))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#cost of one step of bullets (move, timers, wall check, player and melee hit tests) against the bullet count,
+#per-bullet python against Projectile_Pool.update plus collide_point/collide_rect, with the hit tests also timed on their own
+#run from the repo root: python game_testing/bench/bench_projectiles.py
+import os
+import sys
+import math
+import random
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import pygame
+from script.tilemap import Tilemap
+from script.projectile import Projectile_Pool
+
+FRAMES = 200
+
+class Bench_Game:
+    #the pool only needs somewhere to put sparks
+    def __init__(self):
+        self.sparks = []
+
+def make_bullets(count):
+    random.seed(count)
+    bullets = []
+    for i in range(count):
+        angle = random.random()*math.pi*2
+        bullets.append([[random.random()*320, random.random()*240], [math.cos(angle), math.sin(angle)], 0])
+    return bullets
+
+def python_frame(bullets, tilemap, player_rect, hitbox):
+    #what game.step did before the pool, one bullet at a time
+    hits = 0
+    for bullet in bullets:
+        length = math.sqrt(bullet[1][0]**2 + bullet[1][1]**2)
+        bullet[0][0] += bullet[1][0] * 1 / length
+        bullet[0][1] += bullet[1][1] * 1 / length
+        bullet[2] += 1
+        tilemap.solid_check(bullet[0]) #never solid on the empty map, timed all the same
+        if player_rect.collidepoint(bullet[0]):
+            hits += 1
+        if hitbox.colliderect(pygame.Rect(bullet[0][0]-4, bullet[0][1]-4, 8, 8)):
+            hits += 1
+    return hits
+
+def pool_frame(pool, tilemap, player_rect, hitbox):
+    #what game.step does now
+    pool.update(tilemap)
+    return pool_hits(pool, player_rect, hitbox)
+
+def pool_hits(pool, player_rect, hitbox):
+    return len(pool.collide_point(player_rect)) + len(pool.collide_rect(hitbox))
+
+def timed(function):
+    start = time.perf_counter()
+    for i in range(FRAMES):
+        result = function()
+    return (time.perf_counter() - start) / FRAMES * 1000, result
+
+def main():
+    tilemap = Tilemap(Bench_Game())
+    tilemap.clear() #no tiles, so no bullet dies and the count stays the same on every frame
+    player_rect = pygame.Rect(160, 120, 8, 15)
+    hitbox = pygame.Rect(168, 120, 28, 22)
+    print("%8s %12s %12s %12s %12s" % ("bullets", "python ms", "pool ms", "us/bullet", "hits ms"))
+    for count in (100, 500, 1000, 2000, 5000, 10000):
+        bullets = make_bullets(count)
+        pool = Projectile_Pool(Bench_Game())
+        for bullet in bullets:
+            pool.spawn(bullet[0], bullet[1], 1)
+        #both sides move the same bullets the same way, so they end on the same positions
+        python_ms, python_hits = timed(lambda: python_frame(bullets, tilemap, player_rect, hitbox))
+        pool_ms, hits = timed(lambda: pool_frame(pool, tilemap, player_rect, hitbox))
+        assert python_hits == hits
+        hits_ms, hits = timed(lambda: pool_hits(pool, player_rect, hitbox))
+        print("%8d %12.4f %12.4f %12.4f %12.4f" % (count, python_ms, pool_ms, pool_ms/count*1000, hits_ms))
+
+if __name__ == "__main__":
+    main()
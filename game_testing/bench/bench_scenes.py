@@ -0,0 +1,182 @@
+#whole-game scenarios (tutorial, the dummy, each boss phase) run headless with the real step() and render()
+#prints sim/render ms per frame, peak object counts and peak traced memory for each
+#peak counts and memory are the same on any machine: it exits 1 when one of them is worse than bench/baseline.json by more than --tolerance
+#frame times are also printed as multiples of a calibration workload timed in the same run (sim_x, render_x)
+#and only compared, as a warning, with bench/baseline.local.json that --save writes on this machine
+#run from the repo root: python game_testing/bench/bench_scenes.py [--save] [--only phase_3]
+import os
+import sys
+import json
+import random
+import time
+import argparse
+import tracemalloc
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import pygame
+import game
+from script.inputs import LEFT, RIGHT, JUMP, DASH, CONFIRM, Soak_Bot
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+LOCAL_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.local.json") #not committed
+FRAMES = 1200
+COUNTS = ("enemies", "projectiles", "sparks", "particles")
+GATED = COUNTS + ("peak_kb",)
+TIMINGS = ("sim_x", "render_x")
+
+class Dodge_Bot:
+    #keeps moving, jumping and dashing but never attacks, so a boss stays in the phase being measured
+    def __init__(self, seed=0, movement=RIGHT):
+        self.rng = random.Random(seed)
+        self.movement = movement
+        self.hold = 0
+
+    def __call__(self, game):
+        if game.in_cutscene:
+            return CONFIRM
+        if self.hold > 0:
+            self.hold -= 1
+        else:
+            self.movement = self.rng.choice([LEFT, RIGHT, 0])
+            self.hold = self.rng.randint(10, 40)
+        roll = self.rng.random()
+        if roll < 0.03:
+            return self.movement | JUMP
+        if roll < 0.04:
+            return self.movement | DASH
+        return self.movement
+
+def tutorial(main_game):
+    main_game.level = -1
+    main_game.load_level()
+    return lambda game: RIGHT | (JUMP if game.player.velocity[0] == 0 else 0)
+
+def dummy(main_game):
+    main_game.level = -1
+    main_game.load_level()
+    return Soak_Bot(1)
+
+def boss(phase):
+    def setup(main_game):
+        main_game.level = 0
+        main_game.load_level()
+        main_game.start_phase(phase)
+        return Dodge_Bot(phase)
+    return setup
+
+#phase 1 is the combo() loop, phase 2 the ground_8_shoot/diag_explode_shoot chain, phase 3 the spell cards
+SCENARIOS = {
+    "tutorial": tutorial,
+    "dummy": dummy,
+    "phase_1": boss(1),
+    "phase_2": boss(2),
+    "phase_3": boss(3),
+}
+
+def play(main_game, setup, seed):
+    random.seed(seed)
+    main_game.alpha = 1
+    return setup(main_game)
+
+def step(main_game, bot):
+    #getting hit is fine, dying would restart the level (a huge HP would make render() draw that many hearts)
+    main_game.player.HP = 5
+    main_game.step(bot(main_game))
+
+def calibrate(repeats=5):
+    #ms for a fixed mix of python arithmetic and sprite blits, best of a few runs
+    surface = pygame.Surface((320, 240))
+    sprite = pygame.Surface((16, 16))
+    sprite.set_colorkey((0, 0, 0))
+    best = None
+    for i in range(repeats):
+        start = time.perf_counter()
+        total = 0
+        for j in range(20000):
+            total += j*j % 7
+        for j in range(2000):
+            surface.blit(sprite, (j % 300, j % 220))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best*1000
+
+def measure(main_game, name, frames, calibration, seed=0):
+    result = {count: 0 for count in COUNTS}
+    bot = play(main_game, SCENARIOS[name], seed)
+    sim_time = render_time = 0
+    for frame in range(frames):
+        start = time.perf_counter()
+        step(main_game, bot)
+        sim_time += time.perf_counter() - start
+        start = time.perf_counter()
+        main_game.render()
+        render_time += time.perf_counter() - start
+        for count, things in zip(COUNTS, (main_game.enemy_spawners, main_game.projectiles, main_game.sparks, main_game.particles)):
+            result[count] = max(result[count], len(things))
+    result["sim_ms"] = sim_time/frames*1000
+    result["render_ms"] = render_time/frames*1000
+    result["sim_x"] = result["sim_ms"]/calibration
+    result["render_x"] = result["render_ms"]/calibration
+    #same run again under tracemalloc, it slows everything down too much to share the timed run
+    bot = play(main_game, SCENARIOS[name], seed)
+    tracemalloc.start()
+    for frame in range(frames):
+        step(main_game, bot)
+        main_game.render()
+    result["peak_kb"] = tracemalloc.get_traced_memory()[1]/1024
+    tracemalloc.stop()
+    return result
+
+def load(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save(path, results, columns):
+    with open(path, "w") as f:
+        json.dump({name: {column: round(result[column], 4) for column in columns} for name, result in results.items()}, f, indent=1, sort_keys=True)
+    print("saved", path)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=FRAMES)
+    parser.add_argument("--only", nargs="*", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--tolerance", type=float, default=0.3, help="how much worse than the baseline a value may be")
+    parser.add_argument("--save", action="store_true", help="write the counts to baseline.json and the timings to baseline.local.json")
+    args = parser.parse_args()
+
+    main_game = game.main_game(headless=True)
+    baseline = load(BASELINE)
+    local = load(LOCAL_BASELINE)
+    calibration = calibrate()
+    print("calibration workload: %.3f ms" % calibration)
+    columns = ("sim_ms", "render_ms") + TIMINGS + GATED
+    print(("%-10s" + " %11s"*len(columns)) % (("",) + columns))
+    results = {}
+    failures = []
+    slower = []
+    for name in args.only:
+        results[name] = measure(main_game, name, args.frames, calibration)
+        print(("%-10s" + " %11.3f"*4 + " %11d"*len(COUNTS) + " %11.0f") % ((name,) + tuple(results[name][column] for column in columns)))
+        for checked, reference, found in ((GATED, baseline, failures), (TIMINGS, local, slower)):
+            for column in checked:
+                limit = reference.get(name, {}).get(column)
+                if limit is not None and results[name][column] > limit*(1+args.tolerance):
+                    found.append("%s %s: %.3f, baseline %.3f" % (name, column, results[name][column], limit))
+
+    if args.save:
+        #a partial run (--only) keeps the other scenarios of each file
+        save(BASELINE, {**baseline, **results}, GATED)
+        save(LOCAL_BASELINE, {**local, **results}, ("sim_ms", "render_ms") + TIMINGS)
+        return
+    if slower:
+        print("\nslower than the last --save on this machine by more than %d%% (not a failure):" % round(args.tolerance*100))
+        print("\n".join(slower))
+    if failures:
+        print("\nregressed by more than %d%%:" % round(args.tolerance*100))
+        print("\n".join(failures))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#update + render cost of 10k sparks, one object per spark against Spark_System
+#run from the repo root: python game_testing/bench/bench_sparks.py
+import os
+import sys
+import math
+import random
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import pygame
+from script.spark import Spark, Flame, Gold_Flame, Ice_Flame, Flexible_Spark, Spark_System
+
+COUNT = 10000
+FRAMES = 30 #sparks slow down by 0.1 a frame, so everything spawned at speed 3+ is still alive at the end
+
+def make_sparks():
+    random.seed(0)
+    sparks = []
+    for i in range(COUNT):
+        kind = random.choice([Spark, Flame, Gold_Flame, Ice_Flame])
+        sparks.append(kind((random.random()*320, random.random()*240), random.random()*math.pi*2, 3+random.random()))
+    sparks.append(Flexible_Spark((160, 120), 0, 4, (148,0,211)))
+    return sparks
+
+def object_update(sparks):
+    for spark in sparks.copy():
+        if spark.update():
+            sparks.remove(spark)
+
+def object_render(sparks, surface):
+    for spark in sparks:
+        spark.render(surface)
+
+def timed(function):
+    start = time.perf_counter()
+    for i in range(FRAMES):
+        function()
+    return (time.perf_counter() - start) / FRAMES * 1000
+
+def main():
+    surface = pygame.Surface((320, 240))
+    sparks = make_sparks()
+    system = Spark_System()
+    for spark in make_sparks():
+        system.append(spark)
+    object_update_ms = timed(lambda: object_update(sparks))
+    system_update_ms = timed(system.update)
+    assert len(sparks) == len(system)
+    object_render_ms = timed(lambda: object_render(sparks, surface))
+    system_render_ms = timed(lambda: system.render(surface))
+    print("%d sparks, ms per frame" % len(system))
+    print("%8s %10s %10s" % ("", "update", "render"))
+    print("%8s %10.3f %10.3f" % ("objects", object_update_ms, object_render_ms))
+    print("%8s %10.3f %10.3f" % ("system", system_update_ms, system_render_ms))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#entities collide by sweeping the merged rects of the solid tiles (Tilemap.sweep), this plays the same runs with the
+#swept update and with the old two-pass update over one rect per solid tile around the entity, and checks every entity
+#ends up in the same place with the same collision flags on every frame. Then on each shipped level it sweeps a player-sized
+#box SWEEP_SAMPLES times at up to MAX_DISTANCE px and checks the merged rects stop it on the same edge as a walk over every tile
+#exits 1 if anything differs
+#run from the repo root: python game_testing/bench/check_collision.py [replay files]
+import os
+import sys
+import random
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import pygame
+import game
+from script.tilemap import NEIGHBORS, EMPTY
+from script.entity import physics_entity
+from script.replay import Input_Replay
+from bench_scenes import SCENARIOS, play, step
+
+FRAMES = 2000
+SEEDS = (0, 1, 2)
+SWEEP_SAMPLES = 5000
+MAX_DISTANCE = 200
+
+def tile_rects(tilemap, pos):
+    #Tilemap.tile_collision before the sweep: a new rect for every solid tile of the 3x3 around pos
+    rects = []
+    tile_x = int(pos[0]//tilemap.tile_size)
+    tile_y = int(pos[1]//tilemap.tile_size)
+    for offset_x, offset_y in NEIGHBORS:
+        tile_id = tilemap.tile_id(tile_x + offset_x, tile_y + offset_y)
+        if tile_id != EMPTY and tilemap.solid_ids[tile_id]:
+            rects.append(pygame.Rect((tile_x + offset_x)*tilemap.tile_size, (tile_y + offset_y)*tilemap.tile_size, tilemap.tile_size, tilemap.tile_size))
+    return rects
+
+def two_pass_update(self, movement=(0,0), tilemap=None, lookup=tile_rects):
+    #physics_entity.update before the sweep: move each axis, then push back out of the rects lookup gives around the new position
+    self.check_collision = {'up':False, 'down':False, 'left':False, 'right':False}
+    frame_movement = [movement[0] + self.velocity[0], movement[1] + self.velocity[1]]
+
+    self.position[0] += frame_movement[0]
+    entity_rect = self.rect()
+    for rect in lookup(tilemap, self.position):
+        if entity_rect.colliderect(rect):
+            if frame_movement[0] > 0:
+                entity_rect.right = rect.left
+                self.check_collision['right'] = True
+            if frame_movement[0] < 0:
+                entity_rect.left = rect.right
+                self.check_collision['left'] = True
+            self.position[0] = entity_rect.x
+
+    if movement[0] > 0:
+        self.flip = False
+    if movement[0] < 0:
+        self.flip = True
+
+    self.position[1] += frame_movement[1]
+    entity_rect = self.rect()
+    for rect in lookup(tilemap, self.position):
+        if entity_rect.colliderect(rect):
+            if frame_movement[1] > 0:
+                entity_rect.bottom = rect.top
+                self.check_collision['down'] = True
+                self.jumping = False
+            if frame_movement[1] < 0:
+                entity_rect.top = rect.bottom
+                self.check_collision['up'] = True
+            self.position[1] = entity_rect.y
+
+    if self.check_collision['down'] or self.check_collision['up']:
+        self.velocity[1] = 0
+
+    self.anim.update()
+
+def state(main_game):
+    return [(entity.entity_type, tuple(entity.position), tuple(entity.velocity), tuple(sorted(getattr(entity, "check_collision", {}).items())))
+            for entity in [main_game.player, *main_game.enemy_spawners]]
+
+def scenario_trace(main_game, name, seed):
+    trace = []
+    bot = play(main_game, SCENARIOS[name], seed)
+    for frame in range(FRAMES):
+        step(main_game, bot)
+        trace.append(state(main_game))
+    return trace
+
+def replay_trace(main_game, path):
+    trace = []
+    replay = Input_Replay(path)
+    random.seed(replay.seed)
+    main_game.level = replay.level
+    main_game.load_level()
+    while not replay.done():
+        main_game.step(replay())
+        trace.append(state(main_game))
+    return trace
+
+def tile_sweep(tilemap, position, size, distance, axis):
+    #Tilemap.sweep without the merged rects: every line of tiles checked one tile at a time in the order it is reached
+    tile_size = tilemap.tile_size
+    start = int(position[axis])
+    end = int(position[axis] + distance)
+    across = int(position[1 - axis])
+    across = range(across // tile_size, (across + size[1 - axis] - 1) // tile_size + 1)
+    if distance > 0:
+        lines = range(start // tile_size, (end + size[axis] - 1) // tile_size + 1)
+    else:
+        lines = range((start + size[axis] - 1) // tile_size, end // tile_size - 1, -1)
+    for line in lines:
+        for other in across:
+            tile_id = tilemap.tile_id(line, other) if axis == 0 else tilemap.tile_id(other, line)
+            if tile_id != EMPTY and tilemap.solid_ids[tile_id]:
+                return line * tile_size if distance > 0 else (line + 1) * tile_size
+    return None
+
+def sweep_check(main_game):
+    tilemap = main_game.tilemap
+    for i in range(SWEEP_SAMPLES):
+        position = (random.uniform(-50, 1900), random.uniform(-50, 300))
+        distance = random.uniform(-MAX_DISTANCE, MAX_DISTANCE)
+        axis = random.randint(0, 1)
+        merged = tilemap.sweep(position, (8, 15), distance, axis)
+        tiles = tile_sweep(tilemap, position, (8, 15), distance, axis)
+        if merged != tiles:
+            print("level %d: sweep from %s by %.2f on axis %d\n  merged %s\n  tiles  %s" % (main_game.level, position, distance, axis, merged, tiles))
+            return False
+    print("level %d: %d sweeps stop on the same edge" % (main_game.level, SWEEP_SAMPLES))
+    return True
+
+SWEPT_UPDATE = physics_entity.update
+
+def compare(label, run):
+    physics_entity.update = SWEPT_UPDATE
+    swept = run()
+    physics_entity.update = two_pass_update
+    try:
+        tiles = run()
+    finally:
+        physics_entity.update = SWEPT_UPDATE
+    for frame, (a, b) in enumerate(zip(swept, tiles)):
+        if a != b:
+            print("%s: frame %d differs\n  swept    %s\n  two pass %s" % (label, frame, a, b))
+            return False
+    print("%s: %d frames match" % (label, len(swept)))
+    return True
+
+def main():
+    main_game = game.main_game(headless=True)
+    ok = True
+    for name in SCENARIOS:
+        for seed in SEEDS:
+            ok = compare("%s seed %d" % (name, seed), lambda: scenario_trace(main_game, name, seed)) and ok
+    for path in sys.argv[1:]:
+        ok = compare(path, lambda: replay_trace(main_game, path)) and ok
+    for level in (-1, 0, 1):
+        main_game.level = level
+        main_game.load_level(False)
+        main_game.tilemap.build_collision()
+        rects = main_game.tilemap.collision[0]
+        print("level %d: %d solid tiles in %d merged rects" % (level, sum(rect.width*rect.height for rect in rects)//main_game.tilemap.tile_size**2, len(rects)))
+        random.seed(level)
+        ok = sweep_check(main_game) and ok
+    if not ok:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#turn .pickle saves and data/maps/*.json maps into .level files next to them
+#run from the repo root: python game_testing/convert_levels.py [files], with no files every level in the repo is converted
+import os
+import sys
+import glob
+import json
+import pickle
+from array import array
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+from script.tilemap import Tilemap, small_tile
+
+def load_json(tilemap, path):
+    #the json maps: "x;y" -> {type, variant, pos in tiles}, plus a list of offgrid tiles with pixel positions
+    with open(path) as f:
+        level = json.load(f)
+    tilemap.clear()
+    tilemap.tile_size = level.get("tile_size", tilemap.tile_size)
+    for tile in level["tilemap"].values():
+        tilemap.set_tile(tile["pos"][0], tile["pos"][1], tile["type"], tile["variant"])
+    for tile in level["offgrid"]:
+        tilemap.offgrid_tiles.append(small_tile(tile["type"], tile["variant"], tile["pos"]))
+
+def load_pickle(tilemap, path):
+    #the old saves: a pickled dict, then the pickled offgrid small_tile list
+    #the dict is "x;y" -> small_tile, or version 2: the tile type table and chunk arrays of ids
+    with open(path, 'rb') as f:
+        grid_tiles = pickle.load(f)
+        offgrid_tiles = pickle.load(f)
+    tilemap.clear()
+    tilemap.offgrid_tiles = offgrid_tiles
+    if grid_tiles.get("version") == 2:
+        for tile_type, variant in grid_tiles["tile_types"]:
+            tilemap.type_id(tile_type, variant)
+        for key, data in grid_tiles["chunks"].items():
+            tilemap.chunks[key] = array('h', data)
+    else:
+        for tile in grid_tiles.values():
+            tilemap.set_tile(tile.pos[0], tile.pos[1], tile.type, tile.variant)
+
+def convert(path):
+    tilemap = Tilemap(None)
+    if path.endswith(".json"):
+        load_json(tilemap, path)
+    else:
+        load_pickle(tilemap, path)
+    target = os.path.splitext(path)[0] + ".level"
+    tilemap.save(target)
+    check = Tilemap(None)
+    check.load(target)
+    assert sorted(check.tiles()) == sorted(tilemap.tiles())
+    assert [(tile.type, tile.variant, list(tile.pos)) for tile in check.offgrid_tiles] == [(tile.type, tile.variant, list(tile.pos)) for tile in tilemap.offgrid_tiles]
+    print("%s -> %s (%d -> %d bytes)" % (os.path.relpath(path), os.path.relpath(target), os.path.getsize(path), os.path.getsize(target)))
+
+def main():
+    paths = sys.argv[1:]
+    if not paths:
+        here = os.path.dirname(os.path.abspath(__file__))
+        paths = sorted(glob.glob(os.path.join(here, "*.pickle")) + glob.glob(os.path.join(here, "data", "maps", "*.json")))
+    for path in paths:
+        convert(path)
+
+if __name__ == "__main__":
+    main()
@@ -50,7 +50,7 @@ class editor:
         self.movements = [False,False, False, False]
 
         self.tilemap = Tilemap(self)
-        self.tilemap.load("game_testing/tilemap.pickle")
+        self.tilemap.load("game_testing/tilemap.level")
         self.camera = [0,0] #camera position = offset of everything
 
         self.tile_list = list(self.editor_assets)
@@ -78,16 +78,14 @@ class editor:
                 self.display.blit(self.assets[self.tile_list[self.tile_group]][self.tile_variant], (mouse_pos[0] - self.camera[0], mouse_pos[1] - self.camera[1]))   
 
             if self.click and self.on_grid:
-                self.tilemap.tilemap[str(tile_pos[0]) + ";" + str(tile_pos[1])] = small_tile(self.tile_list[self.tile_group], self.tile_variant, tile_pos)  
+                self.tilemap.set_tile(tile_pos[0], tile_pos[1], self.tile_list[self.tile_group], self.tile_variant)  
             if self.right_click:
-                tile_location = str(tile_pos[0]) + ";" + str(tile_pos[1])   
-                if tile_location in self.tilemap.tilemap:
-                    del self.tilemap.tilemap[tile_location]
+                self.tilemap.remove_tile(tile_pos[0], tile_pos[1])
                 for tile in self.tilemap.offgrid_tiles.copy():
                     tile_img = self.assets[tile.type][tile.variant]
                     tile_r = pygame.Rect(tile.pos[0]-self.camera[0], tile.pos[1]-self.camera[1], tile_img.get_width(), tile_img.get_height())
                     if tile_r.collidepoint(mouse_pos):
-                        self.tilemap.offgrid_tiles.remove(tile)
+                        self.tilemap.remove_offgrid(tile)
 
             current_tile_image = self.editor_assets[self.tile_list[self.tile_group]][self.tile_variant].copy()
             current_tile_image.set_alpha(150)
@@ -102,7 +100,7 @@ class editor:
                     if event.button == 1:
                         self.click = True
                         if not self.on_grid:
-                            self.tilemap.offgrid_tiles.append(small_tile(self.tile_list[self.tile_group], self.tile_variant, (mouse_pos[0] + self.camera[0], mouse_pos[1] + self.camera[1])))
+                            self.tilemap.add_offgrid(small_tile(self.tile_list[self.tile_group], self.tile_variant, (mouse_pos[0] + self.camera[0], mouse_pos[1] + self.camera[1])))
                     if event.button == 3:
                         self.right_click = True
                     if not self.shift:    
@@ -137,9 +135,9 @@ class editor:
                     if event.key == pygame.K_g:
                         self.on_grid = not self.on_grid
                     if event.key == pygame.K_o:
-                        self.tilemap.save("game_testing/tilemap.pickle")
+                        self.tilemap.save("game_testing/tilemap.level")
                     if event.key == pygame.K_l:
-                        self.tilemap.load("game_testing/tilemap.pickle")
+                        self.tilemap.load("game_testing/tilemap.level")
                 if event.type == pygame.KEYUP:
                     if event.key == pygame.K_a:
                         self.movements[0] = False
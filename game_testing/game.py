@@ -4,6 +4,9 @@ import sys
 import os
 import random
 import math
+import time
+import argparse
+import logging
 from script.entity import Player, Enemy, Beam, Dummy
 from script.utils import load_image,load_white_image
 from script.utils import load_tile,load_trans_tile
@@ -11,20 +14,55 @@ from script.utils import load_fix_tile
 from script.utils import load_images
 from script.utils import load_trans_images,load_trans_image,load_trans_scaled_images
 from script.utils import load_sfx
-from script.utils import Animation
+from script.utils import Animation_Clip
 from script.tilemap import Tilemap, small_tile
-from script.particle import Particle
-from script.spark import Spark, Flame, Ice_Flame, Gold_Flame, Dark_Blue_Flame,Flexible_Spark    
+from script.particle import Particle_Pool
+from script.container import Entity_List
+from script.render_target import Render_Target
+from script.transform_cache import Transform_Cache
+from script.outline import Outline_Pass
+from script.overlay import Overlay
+from script.ui import Menu_Screen
+from script.profiler import Profiler
+from script.replay import Input_Recorder, Input_Replay
+from script.preload import Level_Preloader
+from script.assets import Asset_Manager
+from script.projectile import Projectile_Pool
+from script.actions import load_script, PHASE_2_START, PHASE_3_START
+from script.spark import Spark, Flame, Ice_Flame, Gold_Flame, Dark_Blue_Flame,Flexible_Spark,Spark_System
+from script.inputs import LEFT, RIGHT, JUMP, DASH, ATTACK, CHARGE, PAD_JUMP, PAD_DASH, PAD_ATTACK
+from script.inputs import JUMP_RELEASE, DASH_RELEASE, ATTACK_RELEASE, CONFIRM, PAD_CONFIRM, RETRY, HELD, Soak_Bot, Fight_Bot
 
 #constants
 SCREEN_WIDTH = 1280
 SCREEN_HEIGHT = 960
 HALF_SCREEN_WIDTH = SCREEN_WIDTH // 2
 HALF_SCREEN_HEIGHT = SCREEN_HEIGHT // 2
+RENDER_SCALE = 4 #only the top-left quarter of self.display is visible, scaled 4x
 FPS = 60
+STEP = 1/FPS #step() always advances the world by one 60 Hz frame, however fast the screen is drawn
+MAX_STEPS = 5 #steps one drawn frame may catch up on, lag beyond that is dropped (frame skip)
+#profiler stages (lap/scope names) and counts, in the order of the --profile .csv columns
+PROFILE_COLUMNS = ("step/world", "step/enemies", "step/player", "step/projectiles", "step/sparks", "step/particles", "step/rest",
+                   "render/background", "render/tilemap", "render/projectiles", "render/sparks", "render/outline", "render/particles",
+                   "render/present", "render/hud", "display", "steps", "lag_ms", "enemies", "projectiles", "sparks", "particles")
+TEXT_SPEED = 4 #steps per character as cutscene text types out
+SCENES = {-1: ("game", "tutorial"), 0: ("game", "level_0"), 1: ("game", "level_1")} #assets loaded by load_level
+BOTS = {"soak": Soak_Bot, "fight": Fight_Bot} #--bot choices for --headless
+
+log = logging.getLogger(__name__) #lag, level transitions and recordings, reported from inside the game loop
+MUSIC_PATH = "game_testing/data/sfx/"
+LEVEL_MUSIC = {-1: "music_0.wav", 0: "music_1.wav", 1: "Locked_girl.wav"} #read ahead with the level by the preloader
 
 class main_game:
-    def __init__(self):
+    def __init__(self,headless=False,seed=None):
+        #headless: no window or music, the game is driven through step() as fast as the CPU allows
+        self.headless = headless
+        if headless:
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+            os.environ["SDL_AUDIODRIVER"] = "dummy"
+        if seed is not None:
+            random.seed(seed)
         pygame.init()
         pygame.joystick.init()
         self.joystick = None
@@ -37,10 +75,29 @@ class main_game:
         #放大兩倍
         self.display = pygame.Surface((HALF_SCREEN_WIDTH, HALF_SCREEN_HEIGHT), pygame.SRCALPHA)
         self.display_for_outline = pygame.Surface((HALF_SCREEN_WIDTH, HALF_SCREEN_HEIGHT))
-        self.display_brightness = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT),pygame.SRCALPHA)
+        self.overlay = Overlay((SCREEN_WIDTH, SCREEN_HEIGHT)) #dimming, fades and brightness
+        self.menu = Menu_Screen(self.screen, self.overlay) #title, setting and pause screens
         self.temp_screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT),pygame.SRCALPHA)
+        self.render_target = Render_Target((SCREEN_WIDTH//RENDER_SCALE, SCREEN_HEIGHT//RENDER_SCALE), RENDER_SCALE)
+        self.transforms = Transform_Cache() #flipped/scaled sprites drawn every frame
+        self.outline = Outline_Pass(self.display.get_size())
 
         self.clock = pygame.time.Clock()
+        self.render_fps = FPS #--fps, how often run_game draws
+        self.alpha = 1 #how far render() is from the previous step to the latest one
+        self.lag = 0 #time the simulation still has to catch up on
+        self.tick_error = 0 #what the last frame's snap to one step left out, added to the next frame
+        self.pending_inputs = 0 #presses polled on a frame that ran no step
+        self.skipped_steps = 0
+        self.lag_report_time = 0
+        self.profiler = Profiler(PROFILE_COLUMNS) #F3 or --profile
+        self.level_snapshots = {} #level -> (tilemap snapshot, fire spawner rects, spawners), made by the first load_level
+        self.tilemap = Tilemap(self) #load_level restores the level snapshot into it
+        self.preloader = Level_Preloader(self.read_level) #next level and music, started when the win animation starts
+        self.transition_stalls = [] #(level, ms the main thread was held up switching to it, ms of that waiting on the preloader)
+        self.record_path = None #--record, every run started by play() is written there
+        self.recorder = None
+        self.replay = None #Input_Replay that run_game takes its input from instead of the keyboard
         
         self.title_select_cd = 0
         self.setting_select_cd = 0
@@ -50,101 +107,106 @@ class main_game:
         self.setting_index = [1,1]
         self.text_counter = 0
 
-        self.assets = {
-            "font": pygame.font.Font("game_testing/data/font/LXGWWenKaiMonoTC-Bold.ttf", 36),
-            "font_setting": pygame.font.Font("game_testing/data/font/LXGWWenKaiMonoTC-Bold.ttf", 50),
-            "title": load_trans_image("title.png"),
-            "title_screen": load_trans_image("標題畫面.jpg"),
-            "title_start": load_trans_image("buttons/start_button.png"),
-            "title_start_selected": load_trans_image("buttons/chosen_start_button.png"),
-            "title_setting": load_trans_image("buttons/setting_button.png"),
-            "title_setting_selected": load_trans_image("buttons/chosen_setting_button.png"),
-            "title_quit":load_trans_image("buttons/quit_unchoose.png"),
-            "title_quit_selected":load_trans_image("buttons/quit_choose.png"),
-            "tri_right": load_trans_image("buttons/tri_1.png"),
-            "tri_right_selected": load_trans_image("buttons/tri_2.png"),
-            "tri_left": pygame.transform.flip(load_trans_image("buttons/tri_1.png"),True,False),
-            "tri_left_selected": pygame.transform.flip(load_trans_image("buttons/tri_2.png"),True,False),
-            "setting_screen":load_trans_image("setting_board.png"),
-            "button_background": load_trans_image("buttons/bg.png"),
-            "text_box": load_image("text_box.png"),
-            "head_1": load_trans_image("head/koakuma_head.png"),
-            "head_2": load_trans_image("head/hong_head.png"),
-            "head_1_shadow": load_trans_image("head/koakuma_shadow.png"),
-            "head_2_shadow": load_trans_image("head/hong_shadow.png"),
-            "music": load_trans_image("music.png"),
-            "sun": load_trans_image("sun.png"),
-            "battle_start": load_trans_image("BattleStart.png"),
-            "decor" : load_tile("tiles/decor"),
-            "stone" : load_tile("tiles/stone"),
-            "grass" : load_tile("tiles/grass"),
-            "large_decor" : load_trans_tile("tiles/large_decor"),
-            "block" : load_fix_tile("tiles/block"),
-            "player": load_image("entities/player.png"),
-            "background_2": load_image("background3.jpg"),
-            "background": load_image("back.png"),
-            "enemy/idle" : Animation(load_trans_images("entities/enemy/idle"),duration=10,loop=True),
-            "enemy/run" : Animation(load_trans_images("entities/enemy/run"),duration=10,loop=True),
-            "enemy/jump" : Animation(load_trans_images("entities/enemy/jump"),duration=5,loop=True),
-            "enemy/dash" : Animation(load_trans_images("entities/enemy/dash"),duration=4,loop=False),
-            "beam/idle" : Animation(load_trans_images("entities/beam"),duration=5,loop=True),
-            "dummy/idle" : Animation(load_trans_images("entities/dummy/idle"),duration=6,loop=True),
-            "player/idle" : Animation(load_trans_images("entities/player/idle"),duration=10,loop=True),
-            "player/run" : Animation(load_trans_images("entities/player/run"),duration=10,loop=True),
-            "player/jump" : Animation(load_trans_images("entities/player/jump"),duration=5,loop=True),
-            "player/attack" : Animation(load_trans_images("entities/player/attack"),duration=4,loop=False),
-            "particle/leaf" : Animation(load_images("particles/leaf"),duration=20,loop=False),
-            "particle/fire" : Animation(load_images("particles/fire"),duration=10,loop=False),
-            "particle/particle" : Animation(load_images("particles/particle"),duration=6,loop=False),
-            "particle/slash" : Animation(load_trans_scaled_images("entities/slash",0.15),duration=4,loop=False),
-            "particle/hp" : Animation(load_images("particles/hp"),duration=10,loop=False),
-            "projectile" : load_image("projectile.png"),
+        #nothing is loaded here, each scene is loaded on first use or by load_scene (see SCENES)
+        self.assets = Asset_Manager("game_testing/data/cache")
+        self.assets.add_scene("title", {
+            "font": lambda: pygame.font.Font("game_testing/data/font/LXGWWenKaiMonoTC-Bold.ttf", 36),
+            "font_setting": lambda: pygame.font.Font("game_testing/data/font/LXGWWenKaiMonoTC-Bold.ttf", 50),
+            "title": lambda: load_trans_image("title.png"),
+            "title_screen": lambda: self.assets.cached("title_screen", ["標題畫面.jpg"], lambda: [load_trans_image("標題畫面.jpg")])[0],
+            "title_start": lambda: load_trans_image("buttons/start_button.png"),
+            "title_start_selected": lambda: load_trans_image("buttons/chosen_start_button.png"),
+            "title_setting": lambda: load_trans_image("buttons/setting_button.png"),
+            "title_setting_selected": lambda: load_trans_image("buttons/chosen_setting_button.png"),
+            "title_quit": lambda: load_trans_image("buttons/quit_unchoose.png"),
+            "title_quit_selected": lambda: load_trans_image("buttons/quit_choose.png"),
+            "tri_right": lambda: load_trans_image("buttons/tri_1.png"),
+            "tri_right_selected": lambda: load_trans_image("buttons/tri_2.png"),
+            "tri_left": lambda: self.assets.cached("tri_left", ["buttons/tri_1.png"], lambda: [pygame.transform.flip(load_trans_image("buttons/tri_1.png"),True,False)])[0],
+            "tri_left_selected": lambda: self.assets.cached("tri_left_selected", ["buttons/tri_2.png"], lambda: [pygame.transform.flip(load_trans_image("buttons/tri_2.png"),True,False)])[0],
+            "setting_screen": lambda: load_trans_image("setting_board.png"),
+            "button_background": lambda: load_trans_image("buttons/bg.png"),
+            "music": lambda: load_trans_image("music.png"),
+            "sun": lambda: load_trans_image("sun.png"),
+        })
+        self.assets.add_scene("game", {
+            "decor" : lambda: load_tile("tiles/decor"),
+            "stone" : lambda: load_tile("tiles/stone"),
+            "grass" : lambda: load_tile("tiles/grass"),
+            "large_decor" : lambda: load_trans_tile("tiles/large_decor"),
+            "block" : lambda: self.assets.cached("block", ["tiles/block"], lambda: load_fix_tile("tiles/block")),
+            "player": lambda: load_image("entities/player.png"),
+            "background": lambda: load_image("back.png"),
+            "player/idle" : lambda: Animation_Clip(load_trans_images("entities/player/idle"),duration=10,loop=True),
+            "player/run" : lambda: Animation_Clip(load_trans_images("entities/player/run"),duration=10,loop=True),
+            "player/jump" : lambda: Animation_Clip(load_trans_images("entities/player/jump"),duration=5,loop=True),
+            "player/attack" : lambda: Animation_Clip(load_trans_images("entities/player/attack"),duration=4,loop=False),
+            "particle/leaf" : lambda: Animation_Clip(load_images("particles/leaf"),duration=20,loop=False),
+            "particle/fire" : lambda: Animation_Clip(load_images("particles/fire"),duration=10,loop=False),
+            "particle/particle" : lambda: Animation_Clip(load_images("particles/particle"),duration=6,loop=False),
+            "particle/slash" : lambda: Animation_Clip(self.assets.cached("particle/slash", ["entities/slash"], lambda: load_trans_scaled_images("entities/slash",0.15)),duration=4,loop=False),
+            "particle/hp" : lambda: Animation_Clip(load_images("particles/hp"),duration=10,loop=False),
+            "HP" : lambda: load_trans_image("HP.png"),
+            "star" : lambda: load_trans_image("star.png"),
+            "energy_max" : lambda: load_trans_image("new_trans_energy_hint.png"),
+            "energy_empty" : lambda: load_trans_image("new_trans_empty_energy.png"),
+            "retry" : lambda: load_trans_image("buttons/retry_unchoose.png"),
+            "pressed_retry" : lambda: load_trans_image("buttons/retry_choose.png"),
+            "continue" : lambda: load_trans_image("buttons/continue_1.png"),
+            "pressed_continue" : lambda: load_trans_image("buttons/continue_2.png"),
+            "menu" : lambda: load_trans_image("buttons/menu_1.png"),
+            "pressed_menu" : lambda: load_trans_image("buttons/menu_2.png"),
+        })
+        self.assets.add_scene("tutorial", {
+            "beam/idle" : lambda: Animation_Clip(load_trans_images("entities/beam"),duration=5,loop=True),
+            "dummy/idle" : lambda: Animation_Clip(load_trans_images("entities/dummy/idle"),duration=6,loop=True),
+        })
+        self.assets.add_scene("level_0", {
+            "text_box": lambda: load_image("text_box.png"),
+            "head_1": lambda: load_trans_image("head/koakuma_head.png"),
+            "head_2": lambda: load_trans_image("head/hong_head.png"),
+            "head_1_shadow": lambda: load_trans_image("head/koakuma_shadow.png"),
+            "head_2_shadow": lambda: load_trans_image("head/hong_shadow.png"),
+            "head_1_shaded": lambda: self.load_shaded("head_1"),
+            "head_2_shaded": lambda: self.load_shaded("head_2"),
+            "battle_start": lambda: load_trans_image("BattleStart.png"),
+            "enemy/idle" : lambda: Animation_Clip(load_trans_images("entities/enemy/idle"),duration=10,loop=True),
+            "enemy/run" : lambda: Animation_Clip(load_trans_images("entities/enemy/run"),duration=10,loop=True),
+            "enemy/jump" : lambda: Animation_Clip(load_trans_images("entities/enemy/jump"),duration=5,loop=True),
+            "enemy/dash" : lambda: Animation_Clip(load_trans_images("entities/enemy/dash"),duration=4,loop=False),
+            "projectile" : lambda: load_image("projectile.png"),
             #"projectile" : pygame.transform.rotate(load_image("entities/fireball/0.png"),90),
-            "fireball" : Animation(load_images("entities/fireball"),duration=10,loop=True),
-            "projectile_1": load_image("projectile.png"),
-            "projectile_2": load_image("projectile_orange.png"),
-            "projectile_3": load_image("projectile_yellow.png"),
-            "projectile_4": load_image("projectile_green.png"), 
-            "projectile_5": load_image("projectile_aqua.png"),  
-            "projectile_6": load_image("projectile_blue.png"),
-            "projectile_7": load_image("projectile_purple.png"),
-            "HP" : load_trans_image("HP.png"),
-            "star" : load_trans_image("star.png"),
-            #"Boss_full" : load_trans_image("max_HP_bar.png"),
-            "Boss_full" : load_trans_image("new_trans_full_blood.png"),
-            #"Boss_empty" : load_trans_image("empty_HP_bar.png"),
-            "Boss_empty" : load_trans_image("new_trans_empty_blood.png"),
-            "Boss_low" : load_trans_image("new_trans_low_warning.png"),
-            #"energy_max" : load_trans_image("max_SP_bar.png"),
-            "energy_max" : load_trans_image("new_trans_energy_hint.png"),
-            #"energy_empty" : load_trans_image("empty_SP_bar.png"),
-            "energy_empty" : load_trans_image("new_trans_empty_energy.png"),
-            "retry" : load_trans_image("buttons/retry_unchoose.png"),  
-            "pressed_retry" : load_trans_image("buttons/retry_choose.png"),
-            "enemy_portrait_1" : load_trans_image("紅美鈴_大招立繪.png"),
-            "continue" : load_trans_image("buttons/continue_1.png"),
-            "pressed_continue" : load_trans_image("buttons/continue_2.png"),
-            "menu" : load_trans_image("buttons/menu_1.png"),
-            "pressed_menu" : load_trans_image("buttons/menu_2.png"),
-
-        }
-
-        self.sfx = {
-            "jump" : load_sfx("jump.wav"),
-            "dash" : load_sfx("dash.wav"),
-            "shoot" : load_sfx("shoot.wav"),
-            "hit" : load_sfx("hit.wav"),
-            "got_hit" : load_sfx("player_take_damage.wav"),
-            "ambience" : load_sfx("ambience.wav"),
-            "swing" : load_sfx("swing.wav"),
-        }   
-        self.sfx["ambience"].set_volume(0.2)
-        self.sfx["shoot"].set_volume(0.5)
-        self.sfx["jump"].set_volume(0.7)
-        self.sfx["dash"].set_volume(0.7)
-        self.sfx["swing"].set_volume(0.7)
-        self.sfx["hit"].set_volume(0.8) 
-        self.sfx["got_hit"].set_volume(1)
+            "fireball" : lambda: Animation_Clip(load_images("entities/fireball"),duration=10,loop=True),
+            "projectile_1": lambda: load_image("projectile.png"),
+            "projectile_2": lambda: load_image("projectile_orange.png"),
+            "projectile_3": lambda: load_image("projectile_yellow.png"),
+            "projectile_4": lambda: load_image("projectile_green.png"),
+            "projectile_5": lambda: load_image("projectile_aqua.png"),
+            "projectile_6": lambda: load_image("projectile_blue.png"),
+            "projectile_7": lambda: load_image("projectile_purple.png"),
+            "Boss_full" : lambda: load_trans_image("new_trans_full_blood.png"),
+            "Boss_empty" : lambda: load_trans_image("new_trans_empty_blood.png"),
+            "Boss_low" : lambda: load_trans_image("new_trans_low_warning.png"),
+            "enemy_portrait_1" : lambda: load_trans_image("紅美鈴_大招立繪.png"),
+        })
+        self.assets.add_scene("level_1", {
+            "background_2": lambda: self.assets.cached("background_2", ["background3.jpg"], lambda: [load_image("background3.jpg")])[0],
+        })
+
+        self.sfx = Asset_Manager()
+        self.sfx.add_scene("game", {
+            "jump" : lambda: self.load_sound("jump.wav",0.7),
+            "dash" : lambda: self.load_sound("dash.wav",0.7),
+            "shoot" : lambda: self.load_sound("shoot.wav",0.5),
+            "hit" : lambda: self.load_sound("hit.wav",0.8),
+            "got_hit" : lambda: self.load_sound("player_take_damage.wav",1),
+            "ambience" : lambda: self.load_sound("ambience.wav",0.2),
+            "swing" : lambda: self.load_sound("swing.wav",0.7),
+        })
+
+        self.projectiles = Projectile_Pool(self) #every bullet, kept between levels so the arrays are only allocated once
+        self.sparks = Spark_System()
+        self.particles = Particle_Pool(self)
 
         self.bgm_factor = 5
         self.sfx_factor = 5
@@ -162,39 +224,45 @@ class main_game:
 
         self.player = Player(self, (100,100), (8,15) , HP = 5)
 
-        self.tilemap = Tilemap(self)
-
-        self.projectiles = []
-        self.special_projectiles = [] #object [pos,direction,speed,timer,img_name]
-        self.particles = []
-        self.sparks = []
+        self.projectiles.clear()
+        self.particles.clear()
+        self.sparks.clear()
+        self.outline.reset()
         self.buffer = []    
 
         self.camera = [0,0] #camera position = offset of everything
+        self.prev_camera = [0,0]
         self.min_max_camera = [0,1120] #min and max camera x position
         self.screen_shake_timer = 0
         self.screen_shake_offset = [0,0]
         self.dead = 0 #dead animation
         self.in_cutscene = False
         self.cutscene_timer = 0
+        self.preview_lines = [] #boss attack previews, drawn by render()
+        self.world_updated = False
+        self.render_camera = [0,0]
 
-        self.tilemap.load("game_testing/"+str(self.level)+".pickle")
-
-        self.fire_spawners = []
+        self.assets.load_scene(*SCENES.get(self.level, ("game",)))
+        self.sfx.load_scene("game")
+        snapshot = self.level_snapshots.get(self.level)
+        if snapshot is None:
+            #first time this level is loaded, after that it comes back from the snapshot without touching the disk
+            snapshot = self.preloader.take(self.level) or self.read_level(self.level)
+            self.level_snapshots[self.level] = snapshot
+        self.tilemap.restore(snapshot[0])
 
-        for fire in self.tilemap.extract([('large_decor',8)],keep=True):
-            self.fire_spawners.append(pygame.Rect(4+fire.pos[0], 4+fire.pos[1], 23, 13))
+        self.fire_spawners = [rect.copy() for rect in snapshot[1]]
 
-        self.enemy_spawners = []
-        for spawner in self.tilemap.extract([('spawners',0),('spawners',1),('spawners',2),('spawners',3)],keep=False):
-            if spawner.variant == 0:
-                self.player.position = spawner.pos #player start position
-            elif spawner.variant == 1:
-                self.enemy_spawners.append(Enemy(self,spawner.pos,(8,15),phase=1))
-            elif spawner.variant == 2:
-                self.enemy_spawners.append(Beam(self,spawner.pos,(22,144),duration=-1))
-            elif spawner.variant == 3:
-                self.enemy_spawners.append(Dummy(self,spawner.pos,(8,15)))
+        self.enemy_spawners = Entity_List()
+        for variant, pos in snapshot[2]:
+            if variant == 0:
+                self.player.position = list(pos) #player start position
+            elif variant == 1:
+                self.enemy_spawners.append(Enemy(self,pos,(8,15),phase=1))
+            elif variant == 2:
+                self.enemy_spawners.append(Beam(self,pos,(22,144),duration=-1))
+            elif variant == 3:
+                self.enemy_spawners.append(Dummy(self,pos,(8,15)))
 
 
         if self.level == 0:
@@ -210,9 +278,7 @@ class main_game:
 
         if self.level == -1:
             if new_level:
-                pygame.mixer.music.load("game_testing/data/sfx/music_0.wav")
-                pygame.mixer.music.set_volume(self.bgm_factor/5*0.2)
-                pygame.mixer.music.play(-1)
+                self.play_music("music_0.wav",0.2)
         if self.level == 0:
             if new_level:
                 self.in_cutscene = True
@@ -228,16 +294,38 @@ class main_game:
             
         elif self.level == 1:
             if new_level:
-                pygame.mixer.music.load("game_testing/data/sfx/Locked_girl.wav")
-                pygame.mixer.music.set_volume(self.bgm_factor/5*0.4)
-                pygame.mixer.music.play(-1)
+                self.play_music("Locked_girl.wav",0.4)
+
+    def read_level(self, level):
+        #also runs on the preloader's thread, so it only builds new objects and touches nothing on self
+        tilemap = Tilemap(self)
+        tilemap.load("game_testing/"+str(level)+".level")
+        fire_spawners = [pygame.Rect(4+fire.pos[0], 4+fire.pos[1], 23, 13) for fire in tilemap.extract([('large_decor',8)],keep=True)]
+        spawners = [(spawner.variant, spawner.pos) for spawner in tilemap.extract([('spawners',0),('spawners',1),('spawners',2),('spawners',3)],keep=False)]
+        return (tilemap.snapshot(), fire_spawners, spawners)
+
+    def preload(self, level):
+        music = LEVEL_MUSIC.get(level)
+        self.preloader.start(level, read=level not in self.level_snapshots, music_path=MUSIC_PATH+music if music and not self.headless else None)
+
+    def log_transition(self, seconds):
+        waited = self.preloader.waited
+        self.preloader.waited = 0
+        self.transition_stalls.append((self.level, seconds*1000, waited*1000))
+        if not self.headless:
+            log.info("level %d: main thread held up %.2f ms (%.2f ms waiting on the preloader)", *self.transition_stalls[-1])
 
     def run_game(self):
-        
+        self.lag = 0
+        self.clock.tick()
+        self.tick_error = 0
         while True:
+            if self.pause:
+                self.menu.start(self.draw_pause_background)
             while self.pause:
-                for event in pygame.event.get():
+                for event in self.menu.events(self.menu.idle() and not self.pause_select_cd):
                     if event.type == pygame.QUIT:
+                        self.stop_recording()
                         pygame.quit()
                         sys.exit()
                     if event.type == pygame.KEYDOWN:
@@ -257,7 +345,7 @@ class main_game:
                             elif self.pause_select == 1:
                                 self.pause = False
                                 pygame.mixer.music.set_volume(self.bgm_factor/5*0.2)
-                                self.dead = 10
+                                self.pending_inputs |= RETRY
                             elif self.pause_select == 2:
                                 pygame.mixer.music.stop()
                                 return
@@ -271,7 +359,7 @@ class main_game:
                                 pygame.mixer.music.set_volume(self.bgm_factor/5*0.2)  
                             elif self.pause_select == 1:
                                 self.pause = False
-                                self.dead = 10
+                                self.pending_inputs |= RETRY
                                 pygame.mixer.music.set_volume(self.bgm_factor/5*0.2)
                             elif self.pause_select == 2:
                                 return
@@ -285,481 +373,581 @@ class main_game:
                                 self.pause_select_cd = 10
                 
                 self.pause_select_cd = max(0,self.pause_select_cd-1)
-                
-                self.screen.blit(self.temp_screen, (0,0))
 
-                self.screen.blit(self.assets['continue'], (SCREEN_WIDTH//2 - self.assets['continue'].get_width()//2, SCREEN_HEIGHT//2-150 - self.assets['continue'].get_height()//2))
-                self.screen.blit(self.assets['retry'], (SCREEN_WIDTH//2 - self.assets['retry'].get_width()//2, SCREEN_HEIGHT//2 - self.assets['retry'].get_height()//2))
-                self.screen.blit(self.assets['menu'], (SCREEN_WIDTH//2 - self.assets['menu'].get_width()//2, SCREEN_HEIGHT//2+150 - self.assets['menu'].get_height()//2))
                 if self.pause_select == 0:
                     img = self.assets['pressed_continue']
-                    self.screen.blit(img, (SCREEN_WIDTH//2 - img.get_width()//2, SCREEN_HEIGHT//2-150 - img.get_height()//2))
+                    self.menu.show("pressed", img, (SCREEN_WIDTH//2 - img.get_width()//2, SCREEN_HEIGHT//2-150 - img.get_height()//2))
                 elif self.pause_select == 1:
                     img = self.assets['pressed_retry']
-                    self.screen.blit(img, (SCREEN_WIDTH//2 - img.get_width()//2, SCREEN_HEIGHT//2 - img.get_height()//2))
+                    self.menu.show("pressed", img, (SCREEN_WIDTH//2 - img.get_width()//2, SCREEN_HEIGHT//2 - img.get_height()//2))
                 elif self.pause_select == 2:
                     img = self.assets['pressed_menu']
-                    self.screen.blit(img, (SCREEN_WIDTH//2 - img.get_width()//2, SCREEN_HEIGHT//2+150 - img.get_height()//2))
-                self.screen.blit(self.display_brightness, (0, 0))
-                pygame.display.update()
+                    self.menu.show("pressed", img, (SCREEN_WIDTH//2 - img.get_width()//2, SCREEN_HEIGHT//2+150 - img.get_height()//2))
+                self.menu.flush()
                 self.clock.tick(FPS)
+                self.lag = 0
+                self.tick_error = 0
 
+            inputs = self.poll_inputs()
+            self.pending_inputs = (self.pending_inputs & ~HELD) | inputs
+            elapsed = self.clock.tick(self.render_fps)/1000 + self.tick_error
+            self.tick_error = 0
+            if abs(elapsed - STEP) < 0.002:
+                #tick only counts whole ms, so a frame this close to 60 Hz is one step and the difference goes into the next frame's time
+                self.tick_error = elapsed - STEP
+                elapsed = STEP
+            self.lag += elapsed
+            steps = 0
+            while self.lag >= STEP and steps < MAX_STEPS:
+                self.step(self.replay() if self.replay else self.pending_inputs)
+                self.pending_inputs &= HELD #a press only goes to one step
+                self.lag -= STEP
+                steps += 1
+            if self.lag >= STEP:
+                self.skipped_steps += int(self.lag/STEP)
+                self.lag %= STEP
+            self.report_lag()
+            self.alpha = self.lag/STEP
+            self.render()
+            self.profiler.render(self.screen)
+            with self.profiler.scope("display"):
+                pygame.display.update()
+            self.count_frame(steps)
+            if self.replay and self.replay.done():
+                return
 
-            self.display.fill((0,0,0,0))
-            if self.level <=0:
-                self.display_for_outline.blit(pygame.transform.scale(self.assets['background'],(self.assets['background'].get_width()/2,self.assets['background'].get_height()/2)), (0,0))
-            else:
-                self.display_for_outline.blit(pygame.transform.scale(self.assets['background_2'],(self.assets['background_2'].get_width()/2,self.assets['background_2'].get_height()/2)), (0,0))
-            #blit a half transparent black screen on top of the background
-            decrease_light = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-            decrease_light.fill((0, 0, 0, 64))  # RGBA: (0, 0, 0, 128) for half transparency
-            self.display_for_outline.blit(decrease_light, (0, 0))
+    def play(self, replay=None):
+        #start self.level from scratch and run it, taking input from replay if given
+        #the seed is picked here so --record can store it
+        self.replay = replay
+        if replay:
+            self.level = replay.level
+            seed = replay.seed
+        else:
+            seed = random.randrange(1 << 32)
+        random.seed(seed)
+        self.load_level()
+        if self.record_path and not replay:
+            self.recorder = Input_Recorder(self.record_path, seed, self.level)
+        self.run_game()
+        self.stop_recording()
+        self.replay = None
 
-            if self.transition < 0:
-                self.transition += 1
-            if self.win>0 and not self.in_cutscene:
-                self.win += 1
-                pygame.mixer.music.set_volume(self.bgm_factor/5*0.2*(90-self.win)/90)
-                if self.win == 90 and self.level == 0:
-                    self.first_phase_cutscene()
-                if self.win > 90:
-                    self.transition += 1
-                    if self.transition > 30:
-                        self.level += 1
-                        self.load_level()
-
-            if self.dead > 0:
-                self.dead += 1
-                if self.dead >=10:
-                    self.transition = min(30,self.transition+1)
-                if self.dead > 40:
-                    self.load_level(False)
-
-            self.camera[0] += (self.player.rect().centerx - self.display.get_width()/4 -self.camera[0])/20 #camera follow player x
-            self.camera[0] = max(self.min_max_camera[0],self.camera[0])
-            self.camera[0] = min(self.min_max_camera[1],self.camera[0])
-            #self.camera[1] += (self.player.rect().centery - self.display.get_height()/2 - self.camera[1])/20 #camera follow player y
-            self.render_camera = [int(self.camera[0]), int(self.camera[1])]
-
-            self.tilemap.render(self.display,offset=self.render_camera) #render background
-
-            if self.in_cutscene == False and self.cutscene_timer == 0:
-                #tutorial end
-                if self.player.position[0] > 1447 and self.level == -1 and self.win == 0:
-                    self.win = 1
-                for spawner in self.fire_spawners:
-                    if random.random() * 4999 < spawner.width* spawner.height:
-                        pos = (spawner.x + random.random()*spawner.width, spawner.y + random.random()*spawner.height-8)
-                        self.particles.append(Particle(self,'fire',pos,velocity=[-0.2,0.3],frame=random.randint(0,20)))
-                
+    def stop_recording(self):
+        if self.recorder:
+            log.info("recorded %d steps to %s", self.recorder.steps, self.record_path)
+            self.recorder.close()
+            self.recorder = None
 
-                for enemy in self.enemy_spawners.copy():
-                    kill = enemy.update((0,0),self.tilemap)
-                    if enemy.type == "beam":
-                        enemy.render(self.display,offset=self.render_camera)
-                    if kill and enemy.type == "boss":
-                        self.projectiles=[] 
-                        self.special_projectiles=[]
-                        phase = enemy.phase
-                        self.enemy_spawners.remove(enemy)
-                        for i in range(4):
-                            self.sparks.append(Flame((enemy.rect().center[0]+random.randint(-8,8),enemy.rect().center[1]), 1.5*math.pi, 3+random.random()))
-                            self.sparks.append(Flexible_Spark((enemy.rect().center[0]+random.randint(-8,8),enemy.rect().center[1]), 1.5*math.pi, 3+random.random(),(255,127,0)))
-                            self.sparks.append(Gold_Flame((enemy.rect().center[0]+random.randint(-8,8),enemy.rect().center[1]), 1.5*math.pi, 2+random.random()))
-                            self.sparks.append(Flexible_Spark((enemy.rect().center[0]+random.randint(-8,8),enemy.rect().center[1]), 1.5*math.pi, 1+random.random(),(0,255,0)))
-                            self.sparks.append(Ice_Flame((enemy.rect().center[0]+random.randint(-8,8),enemy.rect().center[1]), 1.5*math.pi, 5+random.random()))
-                            self.sparks.append(Flexible_Spark((enemy.rect().center[0]+random.randint(-8,8),enemy.rect().center[1]), 1.5*math.pi, 4+random.random(),(148,0,211)))
-                        if phase == 1:
-                            self.enemy_spawners.append(Enemy(self,[287,145],(8,15),phase=2,action_queue=[100,"jump()",40,"frozen_in_air()",10,"air_8_shoot(1)",30,"air_8_shoot(2)",30,"air_8_shoot(1)",30,"prepare_attack()",["attack_preview()",30],5,["dash_to()",1]]))
-                        elif phase == 2:
-                            self.enemy_spawners.append(Enemy(self,[287,90],(8,15),phase=3,action_queue=[60,"cut_in()",60,"prepare_attack(1)",60,["spell_card()",80],90,"air_dash()",40,"frozen_in_air()",10,["spell_card()",80],90,["spread()",15],90,"prepare_attack()",["attack_preview()",30],5,["dash_to()",1]]))                
-                        elif phase == 3:
-                            self.win = 1
-                    elif kill:
-                        self.enemy_spawners.remove(enemy)
-                        for i in range(4):
-                            self.sparks.append(Flame((enemy.rect().center[0]+random.randint(-8,8),enemy.rect().center[1]), 1.5*math.pi, 3+random.random()))
-                            self.sparks.append(Flexible_Spark((enemy.rect().center[0]+random.randint(-8,8),enemy.rect().center[1]), 1.5*math.pi, 3+random.random(),(255,127,0)))
-                            self.sparks.append(Gold_Flame((enemy.rect().center[0]+random.randint(-8,8),enemy.rect().center[1]), 1.5*math.pi, 2+random.random()))
-                            self.sparks.append(Flexible_Spark((enemy.rect().center[0]+random.randint(-8,8),enemy.rect().center[1]), 1.5*math.pi, 1+random.random(),(0,255,0)))
-                            self.sparks.append(Ice_Flame((enemy.rect().center[0]+random.randint(-8,8),enemy.rect().center[1]), 1.5*math.pi, 5+random.random()))
-                            self.sparks.append(Flexible_Spark((enemy.rect().center[0]+random.randint(-8,8),enemy.rect().center[1]), 1.5*math.pi, 4+random.random(),(148,0,211)))
-                        
-                if not self.dead:
-                    self.player.update((self.movements[1] - self.movements[0],0),self.tilemap) #update player
-                    #self.player.render(self.display,offset=self.render_camera) #render player
-
-                #[[x,y],direction,timer]
-                for projectile in self.projectiles.copy():
-                    projectile[0][0] += projectile[1]
-                    projectile[2] += 1
-                    img = self.assets['projectile']
-                    #img = pygame.transform.scale(img,(img.get_width()//8,img.get_height()//8))
-                    if projectile[1] > 0:
-                        self.display.blit(img,(projectile[0][0]-img.get_width()/2 -self.render_camera[0],projectile[0][1]-img.get_height()/2-self.render_camera[1]))
+    def count_frame(self, steps=1):
+        if self.profiler.enabled:
+            self.profiler.count("steps", steps)
+            self.profiler.count("lag_ms", round(self.lag*1000, 1))
+            self.profiler.count("enemies", len(self.enemy_spawners))
+            self.profiler.count("projectiles", len(self.projectiles))
+            self.profiler.count("sparks", len(self.sparks))
+            self.profiler.count("particles", len(self.particles))
+        self.profiler.end_frame()
+
+    def report_lag(self):
+        #once a second at most, say how much simulation time was dropped to keep drawing
+        now = time.perf_counter()
+        if self.skipped_steps and now - self.lag_report_time > 1:
+            log.warning("simulation behind: skipped %d steps (%.0f ms)", self.skipped_steps, self.skipped_steps*STEP*1000)
+            self.skipped_steps = 0
+            self.lag_report_time = now
+
+    def draw_pause_background(self, surface):
+        surface.blit(self.temp_screen, (0,0))
+        surface.blit(self.assets['continue'], (SCREEN_WIDTH//2 - self.assets['continue'].get_width()//2, SCREEN_HEIGHT//2-150 - self.assets['continue'].get_height()//2))
+        surface.blit(self.assets['retry'], (SCREEN_WIDTH//2 - self.assets['retry'].get_width()//2, SCREEN_HEIGHT//2 - self.assets['retry'].get_height()//2))
+        surface.blit(self.assets['menu'], (SCREEN_WIDTH//2 - self.assets['menu'].get_width()//2, SCREEN_HEIGHT//2+150 - self.assets['menu'].get_height()//2))
+
+    def poll_inputs(self):
+        #turn this frame's keyboard/joystick events into input bits for step()
+        inputs = 0
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.stop_recording()
+                pygame.quit()
+                sys.exit()
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_LEFT:
+                    self.movements[0] = True
+                if event.key == pygame.K_RIGHT:
+                    self.movements[1] = True
+                if event.key == pygame.K_UP:
+                    inputs |= JUMP
+                if event.key == pygame.K_SPACE:
+                    inputs |= DASH | CONFIRM
+                if event.key == pygame.K_z: 
+                    inputs |= ATTACK
+                if event.key == pygame.K_p and self.in_cutscene == False and self.cutscene_timer == 0:
+                    self.pause = True
+                    self.movements = [False,False]  
+                if event.key == pygame.K_F3:
+                    self.profiler.toggle_overlay()
+            if event.type == pygame.KEYUP:
+                if event.key == pygame.K_LEFT:
+                    self.movements[0] = False
+                if event.key == pygame.K_RIGHT:
+                    self.movements[1] = False
+
+            #joystick control
+            if event.type == pygame.JOYAXISMOTION:
+                if event.axis == 0:
+                    if event.value < -0.3:
+                        self.movements[0] = True
+                        self.movements[1] = False
+                    elif event.value > 0.3:
+                        self.movements[1] = True
+                        self.movements[0] = False
                     else:
-                        self.display.blit(pygame.transform.flip(img, True, False),(projectile[0][0]-img.get_width()/2 -self.render_camera[0],projectile[0][1]-img.get_height()/2-self.render_camera[1]))
-                    if self.tilemap.solid_check(projectile[0]):
-                        try:
-                            self.projectiles.remove(projectile) 
-                        except:
-                            pass
-                        for i in range(4):
-                            self.sparks.append(Spark(projectile[0],random.random()*math.pi*2,2+random.random()))
-                    elif projectile[2] > 360:
-                        try:
-                            self.projectiles.remove(projectile)
-                        except:
-                            pass
-                    elif abs(self.player.dashing) < 50:
-                        if self.player.rect().collidepoint(projectile[0]):
-                            try:
-                                self.projectiles.remove(projectile)
-                            except:
-                                pass
-                            self.player.take_damage(1,(list(self.player.rect().center).copy()[0]-projectile[0][0],0))
-                for special_projectile in self.special_projectiles.copy():
-                    special_projectile.update()
-                    
-                    img = self.assets[special_projectile.img_name]
-                    #rotate image according to its direction which is a vector
-                    angle = math.atan2(special_projectile.direction[1],special_projectile.direction[0]) * 180 / math.pi
-                    #img = pygame.transform.rotate(img,-1*angle)
-                    self.display.blit(img,(special_projectile.pos[0]-img.get_width()/2 -self.render_camera[0],special_projectile.pos[1]-img.get_height()/2-self.render_camera[1]))
-                    if self.tilemap.solid_check(special_projectile.pos):
-                        if special_projectile.reverse():
-                            try:
-                                self.special_projectiles.remove(special_projectile)
-                            except:
-                                pass
-                        for i in range(4):
-                            #match the spark's color with the projectile
-                            if special_projectile.img_name == 'projectile_1':
-                                self.sparks.append(Flame(special_projectile.pos,random.random()*math.pi*2,2+random.random()))
-                            elif special_projectile.img_name == 'projectile_2':
-                                self.sparks.append(Flexible_Spark(special_projectile.pos,random.random()*math.pi*2,2+random.random(),(255,127,0)))
-                            elif special_projectile.img_name == 'projectile_3':
-                                self.sparks.append(Gold_Flame(special_projectile.pos,random.random()*math.pi*2,2+random.random()))
-                            elif special_projectile.img_name == 'projectile_4':
-                                self.sparks.append(Flexible_Spark(special_projectile.pos,random.random()*math.pi*2,2+random.random(),(0,255,0)))
-                            elif special_projectile.img_name == 'projectile_5':
-                                self.sparks.append(Ice_Flame(special_projectile.pos,random.random()*math.pi*2,2+random.random()))
-                            elif special_projectile.img_name == 'projectile_6':
-                                self.sparks.append(Flexible_Spark(special_projectile.pos,random.random()*math.pi*2,2+random.random(),(148,0,211)))
-                            elif special_projectile.img_name == 'projectile_7':
-                                self.sparks.append(Flexible_Spark(special_projectile.pos,random.random()*math.pi*2,2+random.random(),(255,0,255)))
-                            else:
-                                self.sparks.append(Spark(special_projectile.pos,random.random()*math.pi*2,2+random.random()))   
-                    elif special_projectile.timer > 360:
-                        try:
-                            self.special_projectiles.remove(special_projectile) 
-                        except:
-                            pass    
-                    elif abs(self.player.dashing) < 50: 
-                        if self.player.rect().collidepoint(special_projectile.pos):
-                            try:
-                                self.special_projectiles.remove(special_projectile)
-                            except:
-                                pass
-                            self.player.take_damage(1,(list(self.player.rect().center).copy()[0]-special_projectile.pos[0],0))
-
-                for spark in self.sparks.copy():
-                    kill = spark.update()
-                    spark.render(self.display,offset=self.render_camera)
-                    if kill:
-                        self.sparks.remove(spark)   
-
-                display_mask = pygame.mask.from_surface(self.display)
-                display_sillouette = display_mask.to_surface(setcolor=(0,0,0,180),unsetcolor=(0,0,0,0))
-                #outline stuff but I dont like it
-                #for offset in [[-1,0],[1,0],[0,1],[0,-1]]:
-                #    self.display_for_outline.blit(display_sillouette,offset)
-                
-                for particle in self.particles.copy():
-                    kill = particle.update()
-                    if particle.p_type == 'fire':
-                        particle.pos[0] += math.sin(particle.animation.frame*0.035)*0.3
-                    particle.render(self.display,offset=self.render_camera)
-                    if kill:
-                        self.particles.remove(particle)
-                
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        pygame.quit()
-                        sys.exit()
-                    if event.type == pygame.KEYDOWN:
-                        if event.key == pygame.K_LEFT:
-                            self.movements[0] = True
-                        if event.key == pygame.K_RIGHT:
-                            self.movements[1] = True
-                        if event.key == pygame.K_UP:
-                            self.player.jump()
-                        if event.key == pygame.K_SPACE:
-                            self.player.dash()
-                        if event.key == pygame.K_z: 
-                            self.player.attack()
-                        if event.key == pygame.K_p:
-                            self.pause = True
-                            self.movements = [False,False]  
-                    if event.type == pygame.KEYUP:
-                        if event.key == pygame.K_LEFT:
-                            self.movements[0] = False
-                        if event.key == pygame.K_RIGHT:
-                            self.movements[1] = False
-
-                    #joystick control
-                    if event.type == pygame.JOYAXISMOTION:
-                        if event.axis == 0:
-                            if event.value < -0.3:
-                                self.movements[0] = True
-                                self.movements[1] = False
-                            elif event.value > 0.3:
-                                self.movements[1] = True
-                                self.movements[0] = False
-                            else:
-                                self.movements[0] = False
-                                self.movements[1] = False
+                        self.movements[0] = False
+                        self.movements[1] = False
 
-                    if event.type == pygame.JOYBUTTONDOWN:
-                        if event.button == 0:
-                            if not self.player.jump():
-                                self.buffer=["jump",6]
-                        if event.button == 7:
-                            if not self.player.dash():
-                                self.buffer=["dash",6]
-                        if event.button == 3:
-                            if not self.player.attack():
-                                self.buffer=["attack",6]
-                        if event.button == 4:
-                            self.player.charge_attack()
-                        if event.button == 11:
-                            self.pause = True
-                            self.movements = [False,False]  
-                    if event.type == pygame.JOYBUTTONUP:
-                        if event.button == 0 and "jump" in self.buffer:
-                            self.buffer=[]
-                            pass
-                        if event.button == 7 and "dash" in self.buffer:
-                            self.buffer=[]
-                            pass
-                        if event.button == 3 and "attack" in self.buffer:
-                            self.buffer=[]
-                            pass
-
-                if self.buffer:
-                    self.buffer[1] -= 1
-                    if self.buffer[1] == 0:
+            if event.type == pygame.JOYBUTTONDOWN:
+                if event.button == 0:
+                    inputs |= PAD_JUMP | CONFIRM | PAD_CONFIRM
+                if event.button == 7:
+                    inputs |= PAD_DASH
+                if event.button == 3:
+                    inputs |= PAD_ATTACK
+                if event.button == 4:
+                    inputs |= CHARGE
+                if event.button == 11 and self.in_cutscene == False and self.cutscene_timer == 0:
+                    self.pause = True
+                    self.movements = [False,False]  
+            if event.type == pygame.JOYBUTTONUP:
+                if event.button == 0:
+                    inputs |= JUMP_RELEASE
+                if event.button == 7:
+                    inputs |= DASH_RELEASE
+                if event.button == 3:
+                    inputs |= ATTACK_RELEASE
+        if self.movements[0]:
+            inputs |= LEFT
+        if self.movements[1]:
+            inputs |= RIGHT
+        return inputs
+
+    def step(self, inputs=0):
+        #advance the world by one fixed frame, nothing in here touches the screen
+        self.profiler.start()
+        if self.recorder:
+            self.recorder.add(inputs)
+        self.prev_camera = self.camera[:]
+        for entity in [self.player, *self.enemy_spawners]:
+            entity.prev_position = entity.position[:]
+        self.preview_lines = []
+        self.world_updated = False
+
+        if self.transition < 0:
+            self.transition += 1
+        if self.win>0 and not self.in_cutscene:
+            if self.win == 1:
+                self.preload(self.level+1) #read while the win animation plays
+            else:
+                #images can only be made on this thread, one per frame keeps the next level's scene from landing on a single frame
+                self.assets.load_one(*SCENES.get(self.level+1, ()))
+            self.win += 1
+            pygame.mixer.music.set_volume(self.bgm_factor/5*0.2*(90-self.win)/90)
+            if self.win == 90 and self.level == 0:
+                self.first_phase_cutscene()
+            if self.win > 90:
+                self.transition += 1
+                if self.transition > 30:
+                    start = time.perf_counter()
+                    self.level += 1
+                    self.load_level()
+                    self.log_transition(time.perf_counter() - start)
+
+        if inputs & RETRY:
+            self.dead = 10
+        if self.dead > 0:
+            self.dead += 1
+            if self.dead >=10:
+                self.transition = min(30,self.transition+1)
+            if self.dead > 40:
+                self.load_level(False)
+
+        self.camera[0] += (self.player.rect().centerx - self.display.get_width()/4 -self.camera[0])/20 #camera follow player x
+        self.camera[0] = max(self.min_max_camera[0],self.camera[0])
+        self.camera[0] = min(self.min_max_camera[1],self.camera[0])
+        #self.camera[1] += (self.player.rect().centery - self.display.get_height()/2 - self.camera[1])/20 #camera follow player y
+        self.render_camera = [int(self.camera[0]), int(self.camera[1])]
+
+        if self.in_cutscene == False and self.cutscene_timer == 0:
+            self.world_updated = True
+            #tutorial end
+            if self.player.position[0] > 1447 and self.level == -1 and self.win == 0:
+                self.win = 1
+            for spawner in self.fire_spawners:
+                if random.random() * 4999 < spawner.width* spawner.height:
+                    pos = (spawner.x + random.random()*spawner.width, spawner.y + random.random()*spawner.height-8)
+                    self.particles.spawn('fire',pos,velocity=[-0.2,0.3],frame=random.randint(0,20))
+            self.profiler.lap("step/world")
+
+            for enemy in self.enemy_spawners.each():
+                kill = enemy.update((0,0),self.tilemap)
+                if kill and enemy.type == "boss":
+                    self.projectiles.clear()
+                    phase = enemy.phase
+                    self.enemy_spawners.remove(enemy)
+                    for i in range(4):
+                        self.sparks.append(Flame((enemy.rect().center[0]+random.randint(-8,8),enemy.rect().center[1]), 1.5*math.pi, 3+random.random()))
+                        self.sparks.append(Flexible_Spark((enemy.rect().center[0]+random.randint(-8,8),enemy.rect().center[1]), 1.5*math.pi, 3+random.random(),(255,127,0)))
+                        self.sparks.append(Gold_Flame((enemy.rect().center[0]+random.randint(-8,8),enemy.rect().center[1]), 1.5*math.pi, 2+random.random()))
+                        self.sparks.append(Flexible_Spark((enemy.rect().center[0]+random.randint(-8,8),enemy.rect().center[1]), 1.5*math.pi, 1+random.random(),(0,255,0)))
+                        self.sparks.append(Ice_Flame((enemy.rect().center[0]+random.randint(-8,8),enemy.rect().center[1]), 1.5*math.pi, 5+random.random()))
+                        self.sparks.append(Flexible_Spark((enemy.rect().center[0]+random.randint(-8,8),enemy.rect().center[1]), 1.5*math.pi, 4+random.random(),(148,0,211)))
+                    if phase == 1:
+                        self.enemy_spawners.append(Enemy(self,[287,145],(8,15),phase=2,action_queue=load_script(PHASE_2_START)))
+                    elif phase == 2:
+                        self.enemy_spawners.append(Enemy(self,[287,90],(8,15),phase=3,action_queue=load_script(PHASE_3_START)))                
+                    elif phase == 3:
+                        self.win = 1
+                elif kill:
+                    self.enemy_spawners.remove(enemy)
+                    for i in range(4):
+                        self.sparks.append(Flame((enemy.rect().center[0]+random.randint(-8,8),enemy.rect().center[1]), 1.5*math.pi, 3+random.random()))
+                        self.sparks.append(Flexible_Spark((enemy.rect().center[0]+random.randint(-8,8),enemy.rect().center[1]), 1.5*math.pi, 3+random.random(),(255,127,0)))
+                        self.sparks.append(Gold_Flame((enemy.rect().center[0]+random.randint(-8,8),enemy.rect().center[1]), 1.5*math.pi, 2+random.random()))
+                        self.sparks.append(Flexible_Spark((enemy.rect().center[0]+random.randint(-8,8),enemy.rect().center[1]), 1.5*math.pi, 1+random.random(),(0,255,0)))
+                        self.sparks.append(Ice_Flame((enemy.rect().center[0]+random.randint(-8,8),enemy.rect().center[1]), 1.5*math.pi, 5+random.random()))
+                        self.sparks.append(Flexible_Spark((enemy.rect().center[0]+random.randint(-8,8),enemy.rect().center[1]), 1.5*math.pi, 4+random.random(),(148,0,211)))
+            self.profiler.lap("step/enemies")
+
+            if not self.dead:
+                self.player.update((bool(inputs & RIGHT) - bool(inputs & LEFT),0),self.tilemap) #update player
+            self.profiler.lap("step/player")
+
+            self.projectiles.update(self.tilemap)
+            if abs(self.player.dashing) < 50:
+                player_rect = self.player.rect()
+                for projectile in self.projectiles.collide_point(player_rect):
+                    self.projectiles.kill(projectile)
+                    self.player.take_damage(1,(player_rect.centerx-self.projectiles.position(projectile)[0],0))
+            self.profiler.lap("step/projectiles")
+
+            self.sparks.update()
+            self.profiler.lap("step/sparks")
+            
+            self.particles.update()
+            self.profiler.lap("step/particles")
+
+            if inputs & JUMP:
+                self.player.jump()
+            if inputs & DASH:
+                self.player.dash()
+            if inputs & ATTACK:
+                self.player.attack()
+            if inputs & PAD_JUMP:
+                if not self.player.jump():
+                    self.buffer=["jump",6]
+            if inputs & PAD_DASH:
+                if not self.player.dash():
+                    self.buffer=["dash",6]
+            if inputs & PAD_ATTACK:
+                if not self.player.attack():
+                    self.buffer=["attack",6]
+            if inputs & CHARGE:
+                self.player.charge_attack()
+            if inputs & JUMP_RELEASE and "jump" in self.buffer:
+                self.buffer=[]
+            if inputs & DASH_RELEASE and "dash" in self.buffer:
+                self.buffer=[]
+            if inputs & ATTACK_RELEASE and "attack" in self.buffer:
+                self.buffer=[]
+
+            if self.buffer:
+                self.buffer[1] -= 1
+                if self.buffer[1] == 0:
+                    self.buffer=[]
+                elif self.buffer[0] == "jump":
+                    if self.player.jump():
+                        self.buffer=[]
+                elif self.buffer[0] == "dash":
+                    if self.player.dash():
                         self.buffer=[]
-                    elif self.buffer[0] == "jump":
-                        if self.player.jump():
-                            self.buffer=[]
-                    elif self.buffer[0] == "dash":
-                        if self.player.dash():
-                            self.buffer=[]
-                    elif self.buffer[0] == "attack":
-                        if self.player.attack():
-                            self.buffer=[]
-                        
-
-    
-
-                self.screen_shake_timer = max(0,self.screen_shake_timer-1)
-                self.screen_shake_offset = [random.randint(-self.screen_shake_timer,self.screen_shake_timer),random.randint(-self.screen_shake_timer,self.screen_shake_timer)]  
+                elif self.buffer[0] == "attack":
+                    if self.player.attack():
+                        self.buffer=[]
+
+            self.screen_shake_timer = max(0,self.screen_shake_timer-1)
+            self.screen_shake_offset = [random.randint(-self.screen_shake_timer,self.screen_shake_timer),random.randint(-self.screen_shake_timer,self.screen_shake_timer)]  
+
+        if self.cutscene_timer > 0:
+            self.cutscene_timer -= 1
+            if self.cutscene_timer < 20:
+                self.cutscene_timer -= 1
+            if self.cutscene_timer == 0:
+                self.in_cutscene = False
+                self.phase_3_start = True
+
+        if self.in_cutscene == True and not self.transition and inputs & CONFIRM:
+            self.text_list.pop(0)
+            if inputs & PAD_CONFIRM:
+                self.order_list.pop(0)
+            self.text_counter = 0
+            if not self.text_list:
+                self.in_cutscene = False
+                self.play_music("music_1.wav",0.2)
+
+        if self.in_cutscene == True and not self.transition and self.text_list and self.text_counter < len(self.text_list[0])*TEXT_SPEED:
+            self.text_counter += 1
+
+        if self.battle_count_down > 0 and not self.in_cutscene:
+            self.battle_count_down -= 1
+        self.profiler.lap("step/rest")
+
+    def render(self):
+        self.profiler.start()
+        if self.alpha < 1:
+            self.render_camera = [int(self.prev_camera[0]+(self.camera[0]-self.prev_camera[0])*self.alpha), int(self.prev_camera[1]+(self.camera[1]-self.prev_camera[1])*self.alpha)]
+        self.display.fill((0,0,0,0))
+        if self.level <=0:
+            self.display_for_outline.blit(self.transforms.get(self.assets['background'],size=(self.assets['background'].get_width()/2,self.assets['background'].get_height()/2)), (0,0))
+        else:
+            self.display_for_outline.blit(self.transforms.get(self.assets['background_2'],size=(self.assets['background_2'].get_width()/2,self.assets['background_2'].get_height()/2)), (0,0))
+        #blit a half transparent black screen on top of the background
+        self.overlay.dim(self.display_for_outline, 64)
+        self.profiler.lap("render/background")
+
+        self.tilemap.render(self.display,offset=self.render_camera) #render background
+        self.profiler.lap("render/tilemap")
+
+        if self.world_updated:
+            for enemy in self.enemy_spawners:
+                if enemy.type == "beam":
+                    enemy.render(self.display,offset=self.render_camera)
+            for pos_a,pos_b in self.preview_lines:
+                pygame.draw.line(self.display,(255,0,0),(pos_a[0]-self.render_camera[0],pos_a[1]-self.render_camera[1]),(pos_b[0]-self.render_camera[0],pos_b[1]-self.render_camera[1]),1)
+
+            self.projectiles.render(self.display,offset=self.render_camera)
+            self.profiler.lap("render/projectiles")
+
+            self.sparks.render(self.display,offset=self.render_camera)
+            self.profiler.lap("render/sparks")
+
+            #outline stuff but I dont like it, off unless started with --outline
+            if self.outline.enabled:
+                #everything on self.display that can change while the camera stands still
+                dirty = [rect for rect in (self.projectiles.bounds(self.render_camera),self.sparks.bounds(self.render_camera)) if rect]
+                for enemy in self.enemy_spawners:
+                    if enemy.type == "beam":
+                        img = enemy.anim.img()
+                        dirty.append(pygame.Rect(enemy.position[0]-self.render_camera[0]+enemy.anim_offset[0],enemy.position[1]-self.render_camera[1]+enemy.anim_offset[1],img.get_width(),img.get_height()).inflate(2,2))
+                for pos_a,pos_b in self.preview_lines:
+                    dirty.append(pygame.Rect(min(pos_a[0],pos_b[0])-self.render_camera[0],min(pos_a[1],pos_b[1])-self.render_camera[1],abs(pos_a[0]-pos_b[0])+1,abs(pos_a[1]-pos_b[1])+1).inflate(2,2))
+                self.outline.update(self.display,self.render_camera,dirty)
+                self.outline.render(self.display_for_outline)
+                self.profiler.lap("render/outline")
+            
+            for particle in self.particles:
+                particle.render(self.display,offset=self.render_camera)
+            self.profiler.lap("render/particles")
+        
+        if not self.in_cutscene:
+            for i in range(self.player.HP):
+                self.display_for_outline.blit(self.assets['HP'],(i*18,20))
+        #ranering energy acording to player's energy
+        '''
+        if self.player.charge < self.player.max_charge:
+            ratio = self.player.charge/self.player.max_charge
+            pygame.draw.rect(self.display_for_outline,(255,194,14),(7,37,70*ratio,4))
+            self.display_for_outline.blit(pygame.transform.scale(self.assets['energy_empty'],(70,12)),(4,33))
+        else:
+            self.display_for_outline.blit(pygame.transform.scale(self.assets['energy_max'],(70,12)),(4,33))
+        '''
+        #rendering boss HP, scale the horizontal to 58
+        '''
+        for enemy in self.enemy_spawners:
+            if enemy.type == 'boss':
+                for i in range(4-enemy.phase):
+                    img = self.assets['star']
+                    img = pygame.transform.scale(img,(img.get_width()*0.9,img.get_height()*0.9))
+                    self.display_for_outline.blit(img,(270-i*20,15))
+                if enemy.phase != 3 and enemy.HP < enemy.max_HP:
+                    ratio = enemy.HP/enemy.max_HP
+                    pygame.draw.rect(self.display_for_outline,(255,0,0),(233+55*(1-ratio),34,55*ratio,4))
+                    self.display_for_outline.blit(pygame.transform.scale(self.assets['Boss_empty'],(58,12)),(230,30))
+                elif enemy.phase == 3 and enemy.timer_HP < enemy.max_HP:
+                    ratio = enemy.timer_HP/enemy.max_HP
+                    #orange
+                    pygame.draw.rect(self.display_for_outline,(255,127,0),(233+55*(1-ratio),34,55*ratio,4))
+                    self.display_for_outline.blit(pygame.transform.scale(self.assets['Boss_empty'],(58,12)),(230,30))
+                else:
+                    self.display_for_outline.blit(pygame.transform.scale(self.assets['Boss_full'],(58,12)),(230,30))
+        '''
             
-            if not self.in_cutscene:
-                for i in range(self.player.HP):
-                    self.display_for_outline.blit(self.assets['HP'],(i*18,20))
-            #ranering energy acording to player's energy
-            '''
+                  
+        self.display_for_outline.blit(self.display, (0,0))
+        self.render_target.present(self.display_for_outline, self.screen, self.screen_shake_offset)
+        self.profiler.lap("render/present")
+        #blit self.display_entity to screen without scaling
+        #if not self.dead and abs(self.player.dashing) < 50:
+        if not self.dead :
+            self.player.render_new(self.screen,offset=self.render_camera) #render player
+
+        if not self.in_cutscene:
             if self.player.charge < self.player.max_charge:
                 ratio = self.player.charge/self.player.max_charge
-                pygame.draw.rect(self.display_for_outline,(255,194,14),(7,37,70*ratio,4))
-                self.display_for_outline.blit(pygame.transform.scale(self.assets['energy_empty'],(70,12)),(4,33))
+                pygame.draw.rect(self.screen,(0,137,255),(21,171,390*ratio,20))
+                img = self.transforms.get(self.assets['energy_empty'],size=(58*8,12*8))
+                self.screen.blit(self.transforms.get(img,flip_y=True),(-20,130))
             else:
-                self.display_for_outline.blit(pygame.transform.scale(self.assets['energy_max'],(70,12)),(4,33))
-            '''
-            #rendering boss HP, scale the horizontal to 58
-            '''
+                img = self.transforms.get(self.assets['energy_max'],size=(58*8,12*8))
+                self.screen.blit(self.transforms.get(img,flip_y=True),(-20,130))
             for enemy in self.enemy_spawners:
+                if enemy.type != "beam":
+                    enemy.render_new(self.screen,offset=self.render_camera)
+                
                 if enemy.type == 'boss':
                     for i in range(4-enemy.phase):
                         img = self.assets['star']
-                        img = pygame.transform.scale(img,(img.get_width()*0.9,img.get_height()*0.9))
-                        self.display_for_outline.blit(img,(270-i*20,15))
+                        img = self.transforms.get(img,size=(img.get_width()*4,img.get_height()*4))
+                        self.screen.blit(img,(1150-i*80,90))
                     if enemy.phase != 3 and enemy.HP < enemy.max_HP:
                         ratio = enemy.HP/enemy.max_HP
-                        pygame.draw.rect(self.display_for_outline,(255,0,0),(233+55*(1-ratio),34,55*ratio,4))
-                        self.display_for_outline.blit(pygame.transform.scale(self.assets['Boss_empty'],(58,12)),(230,30))
+                        pygame.draw.rect(self.screen,(255,0,0),(847+376*(1-ratio),171,376*ratio,20))
+                        if ratio < 0.4:
+                            img = self.assets['Boss_low']
+                        else:
+                            img = self.assets['Boss_empty']
+                        img = self.transforms.get(img,size=(58*8,12*8))
+                        self.screen.blit(self.transforms.get(img,True,True),(800,130))
                     elif enemy.phase == 3 and enemy.timer_HP < enemy.max_HP:
                         ratio = enemy.timer_HP/enemy.max_HP
                         #orange
-                        pygame.draw.rect(self.display_for_outline,(255,127,0),(233+55*(1-ratio),34,55*ratio,4))
-                        self.display_for_outline.blit(pygame.transform.scale(self.assets['Boss_empty'],(58,12)),(230,30))
-                    else:
-                        self.display_for_outline.blit(pygame.transform.scale(self.assets['Boss_full'],(58,12)),(230,30))
-            '''
-                
-                      
-            self.display_for_outline.blit(self.display, (0,0))
-            self.screen.blit(pygame.transform.scale(self.display_for_outline, (2*SCREEN_WIDTH, 2*SCREEN_HEIGHT)), self.screen_shake_offset) 
-            #blit self.display_entity to screen without scaling
-            #if not self.dead and abs(self.player.dashing) < 50:
-            if not self.dead :
-                self.player.render_new(self.screen,offset=self.render_camera) #render player
-
-            if not self.in_cutscene:
-                if self.player.charge < self.player.max_charge:
-                    ratio = self.player.charge/self.player.max_charge
-                    pygame.draw.rect(self.screen,(0,137,255),(21,171,390*ratio,20))
-                    img = pygame.transform.scale(self.assets['energy_empty'],(58*8,12*8))
-                    self.screen.blit(pygame.transform.flip(img,False,True),(-20,130))
-                else:
-                    img = pygame.transform.scale(self.assets['energy_max'],(58*8,12*8))
-                    self.screen.blit(pygame.transform.flip(img,False,True),(-20,130))
-                for enemy in self.enemy_spawners:
-                    if enemy.type != "beam":
-                        enemy.render_new(self.screen,offset=self.render_camera)
-                    
-                    if enemy.type == 'boss':
-                        for i in range(4-enemy.phase):
-                            img = self.assets['star']
-                            img = pygame.transform.scale(img,(img.get_width()*4,img.get_height()*4))
-                            self.screen.blit(img,(1150-i*80,90))
-                        if enemy.phase != 3 and enemy.HP < enemy.max_HP:
-                            ratio = enemy.HP/enemy.max_HP
-                            pygame.draw.rect(self.screen,(255,0,0),(847+376*(1-ratio),171,376*ratio,20))
-                            if ratio < 0.4:
-                                img = self.assets['Boss_low']
-                            else:
-                                img = self.assets['Boss_empty']
-                            img = pygame.transform.scale(img,(58*8,12*8))
-                            self.screen.blit(pygame.transform.flip(img,True,True),(800,130))
-                        elif enemy.phase == 3 and enemy.timer_HP < enemy.max_HP:
-                            ratio = enemy.timer_HP/enemy.max_HP
-                            #orange
-                            pygame.draw.rect(self.screen,(255,127,0),(847+376*(1-ratio),171,376*ratio,20))
-                            if ratio < 0.4:
-                                img = self.assets['Boss_low']
-                            else:
-                                img = self.assets['Boss_empty']
-                            img = pygame.transform.scale(img,(58*8,12*8))
-                            self.screen.blit(pygame.transform.flip(img,True,True),(800,130))
+                        pygame.draw.rect(self.screen,(255,127,0),(847+376*(1-ratio),171,376*ratio,20))
+                        if ratio < 0.4:
+                            img = self.assets['Boss_low']
                         else:
-                            img = self.assets['Boss_full']
-                            img = pygame.transform.scale(img,(58*8,12*8))
-                            self.screen.blit(pygame.transform.flip(img,True,True),(800,130))
-                
-            if self.cutscene_timer > 0:    
-                self.cutscene_timer -= 1
-                decrease_light = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-                decrease_light.fill((0, 0, 0, 150))  # RGBA: (0, 0, 0, 128) for half transparency
-                self.screen.blit(decrease_light, (0, 0))
-                if self.cutscene_timer >= 100:
-                    #if self.cutscene_timer > 100
-                    self.cutscene_timer -= 0
-                    x = 960 + (740-960) * (self.cutscene_timer - 120)/ (100-120)-HALF_SCREEN_WIDTH
-                    y = 0 + (405-0) * (self.cutscene_timer - 120)/ (100-120)-HALF_SCREEN_HEIGHT
-                    self.screen.blit(pygame.transform.scale(self.assets["enemy_portrait_1"], (SCREEN_WIDTH, SCREEN_HEIGHT)),(x,y))
-                    #self.screen.blit(pygame.transform.scale(self.assets["enemy_portrait_1"], (SCREEN_WIDTH, SCREEN_HEIGHT)),(self.cutscene_timer*16-1120-HALF_SCREEN_WIDTH,self.cutscene_timer*-48+5760-HALF_SCREEN_HEIGHT))
-                elif self.cutscene_timer >= 20:
-                    x = 740 + (540-740) * (self.cutscene_timer - 100)/ (20-100)-HALF_SCREEN_WIDTH
-                    y = 405 + (555-405) * (self.cutscene_timer - 100)/ (20-100)-HALF_SCREEN_HEIGHT
-                    self.screen.blit(pygame.transform.scale(self.assets["enemy_portrait_1"], (SCREEN_WIDTH, SCREEN_HEIGHT)),(x,y))
-                    #self.screen.blit(pygame.transform.scale(self.assets["enemy_portrait_1"], (SCREEN_WIDTH, SCREEN_HEIGHT)),(0,0))
-                else:
-                    self.cutscene_timer -= 1
-                    x = 540 + 2*(320-540) * (self.cutscene_timer - 20)/ (0-20)-HALF_SCREEN_WIDTH
-                    y = 555 + 2*(960-555) * (self.cutscene_timer - 20)/ (0-20)-HALF_SCREEN_HEIGHT
-                    self.screen.blit(pygame.transform.scale(self.assets["enemy_portrait_1"], (SCREEN_WIDTH, SCREEN_HEIGHT)),(x,y))
-                    #self.screen.blit(pygame.transform.scale(self.assets["enemy_portrait_1"], (SCREEN_WIDTH, SCREEN_HEIGHT)),(self.cutscene_timer*16+480-HALF_SCREEN_WIDTH,self.cutscene_timer*-48+960-HALF_SCREEN_HEIGHT))
-                if self.cutscene_timer == 0:
-                    self.in_cutscene = False
-                    self.phase_3_start = True
-
-            if self.transition:
-                tran_surf=pygame.Surface(self.display.get_size())
-                pygame.draw.circle(tran_surf,(255,255,255),(self.display.get_width()//4,self.display.get_height()//4),(30-abs(self.transition))*8)
-                tran_surf.set_colorkey((255,255,255))
-                self.display.blit(tran_surf,(0,0)) 
-                self.screen.blit(pygame.transform.scale(self.display, (2*SCREEN_WIDTH, 2*SCREEN_HEIGHT)), (0,0)) 
+                            img = self.assets['Boss_empty']
+                        img = self.transforms.get(img,size=(58*8,12*8))
+                        self.screen.blit(self.transforms.get(img,True,True),(800,130))
+                    else:
+                        img = self.assets['Boss_full']
+                        img = self.transforms.get(img,size=(58*8,12*8))
+                        self.screen.blit(self.transforms.get(img,True,True),(800,130))
+            
+        if self.cutscene_timer > 0:    
+            self.overlay.dim(self.screen, 150)
+            if self.cutscene_timer >= 100:
+                x = 960 + (740-960) * (self.cutscene_timer - 120)/ (100-120)-HALF_SCREEN_WIDTH
+                y = 0 + (405-0) * (self.cutscene_timer - 120)/ (100-120)-HALF_SCREEN_HEIGHT
+                self.screen.blit(self.transforms.get(self.assets["enemy_portrait_1"],size=(SCREEN_WIDTH, SCREEN_HEIGHT)),(x,y))
+                #self.screen.blit(pygame.transform.scale(self.assets["enemy_portrait_1"], (SCREEN_WIDTH, SCREEN_HEIGHT)),(self.cutscene_timer*16-1120-HALF_SCREEN_WIDTH,self.cutscene_timer*-48+5760-HALF_SCREEN_HEIGHT))
+            elif self.cutscene_timer >= 20:
+                x = 740 + (540-740) * (self.cutscene_timer - 100)/ (20-100)-HALF_SCREEN_WIDTH
+                y = 405 + (555-405) * (self.cutscene_timer - 100)/ (20-100)-HALF_SCREEN_HEIGHT
+                self.screen.blit(self.transforms.get(self.assets["enemy_portrait_1"],size=(SCREEN_WIDTH, SCREEN_HEIGHT)),(x,y))
+                #self.screen.blit(pygame.transform.scale(self.assets["enemy_portrait_1"], (SCREEN_WIDTH, SCREEN_HEIGHT)),(0,0))
+            else:
+                x = 540 + 2*(320-540) * (self.cutscene_timer - 20)/ (0-20)-HALF_SCREEN_WIDTH
+                y = 555 + 2*(960-555) * (self.cutscene_timer - 20)/ (0-20)-HALF_SCREEN_HEIGHT
+                self.screen.blit(self.transforms.get(self.assets["enemy_portrait_1"],size=(SCREEN_WIDTH, SCREEN_HEIGHT)),(x,y))
+                #self.screen.blit(pygame.transform.scale(self.assets["enemy_portrait_1"], (SCREEN_WIDTH, SCREEN_HEIGHT)),(self.cutscene_timer*16+480-HALF_SCREEN_WIDTH,self.cutscene_timer*-48+960-HALF_SCREEN_HEIGHT))
 
+        if self.transition:
+            self.overlay.iris(self.display,(self.display.get_width()//4,self.display.get_height()//4),(30-abs(self.transition))*8)
+            self.render_target.present(self.display, self.screen)
 
-            if self.pause:
-                #pause screen: blit a half transparent black screen
-                pause_screen = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-                pause_screen.fill((0, 0, 0, 128))  # RGBA: (0, 0, 0, 128) for half transparency
-                self.screen.blit(pause_screen, (0, 0))
-                self.pause_select = 0
-                self.temp_screen = self.screen.copy()
-                pygame.mixer.music.set_volume(self.bgm_factor/5*0.1)
-
-            if self.in_cutscene == True and not self.transition: 
-                speed = 4
-                #blit the text box at the buttom of the screen
-                self.screen.blit(pygame.transform.scale(self.assets["text_box"], (SCREEN_WIDTH, SCREEN_HEIGHT//4)),(0,3*SCREEN_HEIGHT//4))
-                #blit headd_1 at the left of the text box while scale it up to 2x
-                if self.order_list[0]:
-                    self.screen.blit(pygame.transform.scale(pygame.transform.flip(self.assets["head_1"],True,False),(self.assets["head_1"].get_width()*1.8,self.assets["head_1"].get_height()*1.8-3)),(10,3*SCREEN_HEIGHT//4+7))
-                    img = self.assets["head_2"].copy()
-                    img.blit(self.assets["head_2_shadow"],(0,0))
-                    self.screen.blit(pygame.transform.scale(img,(self.assets["head_2"].get_width()*1.8,self.assets["head_2"].get_height()*1.8-3)),(SCREEN_WIDTH-10-self.assets["head_2"].get_width()*1.8,3*SCREEN_HEIGHT//4+7))
 
-                else:
-                    self.screen.blit(pygame.transform.scale(self.assets["head_2"],(self.assets["head_2"].get_width()*1.8,self.assets["head_2"].get_height()*1.8-3)),(SCREEN_WIDTH-10-self.assets["head_2"].get_width()*1.8,3*SCREEN_HEIGHT//4+7))
-                    img= self.assets["head_1"].copy()
-                    img.blit(self.assets["head_1_shadow"],(0,0))
-                    self.screen.blit(pygame.transform.scale(pygame.transform.flip(img,True,False),(self.assets["head_1"].get_width()*1.8,self.assets["head_1"].get_height()*1.8-3)),(10,3*SCREEN_HEIGHT//4+7))
-                #blit the text using font in the assets
-                if self.text_list:
-                    text = self.text_list[0]
-                    if self.text_counter < len(text)*speed:
-                        self.text_counter += 1
-                    elif self.text_counter >= speed*len(text):
-                        pass
-                    snip = text[0:self.text_counter//speed]
-                    text_font = self.assets["font"].render(snip, True, (255,255,255))
-                    self.screen.blit(text_font, (SCREEN_WIDTH//4, 3*SCREEN_HEIGHT//4 + SCREEN_HEIGHT//8 - text_font.get_height()//2))
-
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        pygame.quit()
-                        sys.exit()
-                    if event.type == pygame.KEYDOWN:
-                        if event.key == pygame.K_SPACE:
-                            self.text_list.pop(0)
-                            self.text_counter = 0
-                            if not self.text_list:
-                                self.in_cutscene = False
-                                pygame.mixer.music.load("game_testing/data/sfx/music_1.wav")
-                                pygame.mixer.music.set_volume(self.bgm_factor/5*0.2)
-                                pygame.mixer.music.play(-1)
-                    if event.type == pygame.JOYBUTTONDOWN:
-                        if event.button == 0:
-                            self.text_list.pop(0)
-                            self.order_list.pop(0)
-                            self.text_counter = 0
-                            if not self.text_list:
-                                self.in_cutscene = False
-                                pygame.mixer.music.load("game_testing/data/sfx/music_1.wav")
-                                pygame.mixer.music.set_volume(self.bgm_factor/5*0.2)
-                                pygame.mixer.music.play(-1)
-
-            if self.battle_count_down > 0 and not self.in_cutscene:
-                self.battle_count_down -= 1
-                #blit battle_start at the middle of the screen
-                #the img will first scale up and then shrink to its original size, and than fade out as the countdown goes down
-                if self.battle_count_down > 45:
-                    img = pygame.transform.scale(self.assets["battle_start"], (self.assets["battle_start"].get_width()*1.5*(self.battle_count_down)//45, self.assets["battle_start"].get_height()*1.5*(self.battle_count_down)//45))
-                    self.screen.blit(img, (HALF_SCREEN_WIDTH/2, HALF_SCREEN_HEIGHT/2-100))
-                elif self.battle_count_down > 0:
-                    img = pygame.transform.scale(self.assets["battle_start"], (self.assets["battle_start"].get_width()*1.5, self.assets["battle_start"].get_height()*1.5))
-                    img.set_alpha(255*(self.battle_count_down)/45)
-                    self.screen.blit(img, (HALF_SCREEN_WIDTH/2, HALF_SCREEN_HEIGHT/2-100))
-                else:
-                    self.battle_count_down = 0
-            self.screen.blit(self.display_brightness, (0, 0))
-            pygame.display.update()
-            self.clock.tick(FPS)
+        if self.pause:
+            #pause screen: blit a half transparent black screen
+            self.overlay.dim(self.screen, 128)
+            self.pause_select = 0
+            self.temp_screen.blit(self.screen, (0, 0))
+            pygame.mixer.music.set_volume(self.bgm_factor/5*0.1)
+
+        if self.in_cutscene == True and not self.transition: 
+            #blit the text box at the buttom of the screen
+            self.screen.blit(self.transforms.get(self.assets["text_box"],size=(SCREEN_WIDTH, SCREEN_HEIGHT//4)),(0,3*SCREEN_HEIGHT//4))
+            #blit headd_1 at the left of the text box while scale it up to 2x
+            if self.order_list[0]:
+                self.screen.blit(self.transforms.get(self.assets["head_1"],True,size=(self.assets["head_1"].get_width()*1.8,self.assets["head_1"].get_height()*1.8-3)),(10,3*SCREEN_HEIGHT//4+7))
+                self.screen.blit(self.transforms.get(self.assets["head_2_shaded"],size=(self.assets["head_2"].get_width()*1.8,self.assets["head_2"].get_height()*1.8-3)),(SCREEN_WIDTH-10-self.assets["head_2"].get_width()*1.8,3*SCREEN_HEIGHT//4+7))
+
+            else:
+                self.screen.blit(self.transforms.get(self.assets["head_2"],size=(self.assets["head_2"].get_width()*1.8,self.assets["head_2"].get_height()*1.8-3)),(SCREEN_WIDTH-10-self.assets["head_2"].get_width()*1.8,3*SCREEN_HEIGHT//4+7))
+                self.screen.blit(self.transforms.get(self.assets["head_1_shaded"],True,size=(self.assets["head_1"].get_width()*1.8,self.assets["head_1"].get_height()*1.8-3)),(10,3*SCREEN_HEIGHT//4+7))
+            #blit the text using font in the assets
+            if self.text_list:
+                text = self.text_list[0]
+                snip = text[0:self.text_counter//TEXT_SPEED]
+                text_font = self.assets["font"].render(snip, True, (255,255,255))
+                self.screen.blit(text_font, (SCREEN_WIDTH//4, 3*SCREEN_HEIGHT//4 + SCREEN_HEIGHT//8 - text_font.get_height()//2))
+
+        if self.battle_count_down > 0 and not self.in_cutscene:
+            #blit battle_start at the middle of the screen
+            #the img will first scale up and then shrink to its original size, and than fade out as the countdown goes down
+            if self.battle_count_down > 45:
+                img = self.transforms.get(self.assets["battle_start"],size=(self.assets["battle_start"].get_width()*1.5*(self.battle_count_down)//45, self.assets["battle_start"].get_height()*1.5*(self.battle_count_down)//45))
+                self.screen.blit(img, (HALF_SCREEN_WIDTH/2, HALF_SCREEN_HEIGHT/2-100))
+            else:
+                img = self.transforms.get(self.assets["battle_start"],size=(self.assets["battle_start"].get_width()*1.5, self.assets["battle_start"].get_height()*1.5),alpha=255*(self.battle_count_down)/45)
+                self.screen.blit(img, (HALF_SCREEN_WIDTH/2, HALF_SCREEN_HEIGHT/2-100))
+        self.overlay.finish(self.screen)
+        self.profiler.lap("render/hud")
+
+    def start_phase(self, phase):
+        #skip the level 0 cutscene and, for phase 2/3, swap the boss for the one its previous phase would leave behind
+        while self.in_cutscene or self.cutscene_timer:
+            self.step(CONFIRM)
+        if phase == 2:
+            self.enemy_spawners.clear()
+            self.enemy_spawners.append(Enemy(self,[287,145],(8,15),phase=2,action_queue=load_script(PHASE_2_START)))
+        elif phase == 3:
+            self.enemy_spawners.clear()
+            self.enemy_spawners.append(Enemy(self,[287,90],(8,15),phase=3,action_queue=load_script(PHASE_3_START)))
+
+    def run_headless(self, frames, bot=None, render=False, stop=True):
+        #play the current level without a window until it is won, lost or out of frames
+        #stop=False keeps going through deaths and level changes (replays)
+        bot = bot or (lambda game: 0)
+        self.alpha = 1
+        start_level = self.level
+        sim_time = render_time = 0
+        for frame in range(frames):
+            start = time.perf_counter()
+            self.step(bot(self))
+            sim_time += time.perf_counter() - start
+            if render:
+                start = time.perf_counter()
+                self.render()
+                render_time += time.perf_counter() - start
+            self.count_frame()
+            if not stop:
+                continue
+            if self.level != start_level:
+                return {"outcome": "win", "frames": frame+1, "sim_time": sim_time, "render_time": render_time}
+            if self.dead:
+                return {"outcome": "dead", "frames": frame+1, "sim_time": sim_time, "render_time": render_time}
+        return {"outcome": "timeout" if stop else "end", "frames": frames, "sim_time": sim_time, "render_time": render_time}
+
+    def load_shaded(self,name):
+        #head with its shadow on top, shown for whoever is not talking
+        img = self.assets[name].copy()
+        img.blit(self.assets[name+"_shadow"],(0,0))
+        return img
+
+    def load_sound(self,name,volume):
+        sound = load_sfx(name)
+        sound.set_volume(volume*self.sfx_factor/5)
+        return sound
+
+    def play_music(self,name,volume):
+        if self.headless:
+            return
+        music = self.preloader.take_music(MUSIC_PATH+name)
+        if music is not None:
+            pygame.mixer.music.load(music, name)
+        else:
+            pygame.mixer.music.load(MUSIC_PATH+name)
+        pygame.mixer.music.set_volume(self.bgm_factor/5*volume)
+        pygame.mixer.music.play(-1)
 
     def first_phase_cutscene(self):
         self.in_cutscene = True
@@ -767,68 +955,66 @@ class main_game:
         self.order_list = [False,False,True,True]
 
     def run_main_menu(self):
+        self.assets.load_scene("title")
         pygame.mixer.music.load("game_testing/data/sfx/Raise_the_Flag_of_Cheating.wav")
         pygame.mixer.music.set_volume(self.bgm_factor/5*0.3)
         pygame.mixer.music.play(-1)
+        title_shown = False
         while True:
-            #blit the title screen and scale it to the screen size
-            self.screen.blit(pygame.transform.scale(self.assets["title_screen"], (SCREEN_WIDTH, SCREEN_HEIGHT)),(0,0))
+            if not title_shown:
+                #again after the game or the setting screen drew over it
+                self.menu.start(self.draw_title_background)
+                title_shown = True
             self.clock.tick(FPS)
-            #blit a half transparent background for the button
-            button_bg = self.assets["button_background"].copy()
-            button_bg.set_alpha(128)  # Set transparency level (0-255)
-            self.screen.blit(pygame.transform.scale(button_bg,(650,600)), (-30, 350))
-            self.screen.blit(pygame.transform.scale(self.assets["title"],(450,450)),(65,-20))
+            idle = self.menu.idle() and not self.title_select_cd
             #blit the buttons
             if self.title_select[0]:
-                self.screen.blit(pygame.transform.scale(self.assets["title_start_selected"],(450,450)),(70,300))
+                self.menu.show("start",self.transforms.get(self.assets["title_start_selected"],size=(450,450)),(70,300))
             else:
-                self.screen.blit(pygame.transform.scale(self.assets["title_start"],(450,450)),(70,300))
+                self.menu.show("start",self.transforms.get(self.assets["title_start"],size=(450,450)),(70,300))
             if self.title_select[2]:
-                self.screen.blit(pygame.transform.scale(self.assets["title_setting_selected"],(450,450)),(70,420))
+                self.menu.show("setting",self.transforms.get(self.assets["title_setting_selected"],size=(450,450)),(70,420))
             else:
-                self.screen.blit(pygame.transform.scale(self.assets["title_setting"],(450,450)),(70,420))
+                self.menu.show("setting",self.transforms.get(self.assets["title_setting"],size=(450,450)),(70,420))
             if self.title_select[1]:
-                self.screen.blit(pygame.transform.scale(self.assets["title_quit_selected"],(450,450)),(70,540))
+                self.menu.show("quit",self.transforms.get(self.assets["title_quit_selected"],size=(450,450)),(70,540))
             else:
-                self.screen.blit(pygame.transform.scale(self.assets["title_quit"],(450,450)),(70,540))
-            for event in pygame.event.get():
+                self.menu.show("quit",self.transforms.get(self.assets["title_quit"],size=(450,450)),(70,540))
+            for event in self.menu.events(idle):
                 if event.type == pygame.QUIT:
                     pygame.quit()
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_SPACE:
                         for i in range(60):
-                            decrease_light = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-                            decrease_light.fill((0, 0, 0, 10))  # RGBA: (0, 0, 0, 128) for half transparency
-                            self.screen.blit(decrease_light, (0, 0))
+                            #fade step and brightness in one blit
+                            self.overlay.finish(self.screen, 10)
                             pygame.mixer.music.set_volume(self.bgm_factor/5*0.3*i/60)
                             self.clock.tick(60)
-                            self.screen.blit(self.display_brightness, (0, 0))
                             pygame.display.flip()
                         self.level = 0
-                        self.load_level()
-                        self.run_game()
+                        self.play()
+                        title_shown = False
                         pygame.mixer.music.load("game_testing/data/sfx/Raise_the_Flag_of_Cheating.wav")
                         pygame.mixer.music.set_volume(self.bgm_factor/5*0.3)
                         pygame.mixer.music.play(-1)
                 if event.type == pygame.JOYBUTTONDOWN:
                     if event.button == 0 and self.title_select[0]:  
                         for i in range(100):
-                            decrease_light = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA).copy()
-                            decrease_light.fill((0, 0, 0, 5))  # RGBA: (0, 0, 0, 128) for half transparency
-                            self.screen.blit(decrease_light, (0, 0))
+                            if not i:
+                                self.overlay.finish(self.screen, 5)
+                            else:
+                                self.overlay.dim(self.screen, 5)
                             pygame.mixer.music.set_volume(self.bgm_factor/5*0.3*(60-i)/60)
                             self.clock.tick(60)
-                            if not i:
-                                self.screen.blit(self.display_brightness, (0, 0))
                             pygame.display.flip()
-                        self.load_level()
-                        self.run_game()
+                        self.play()
+                        title_shown = False
                         pygame.mixer.music.load("game_testing/data/sfx/Raise_the_Flag_of_Cheating.wav")
                         pygame.mixer.music.set_volume(self.bgm_factor/5*0.3)
                         pygame.mixer.music.play(-1)
                     elif event.button == 0 and self.title_select[2]:
                         self.run_setting()
+                        title_shown = False
                     elif event.button == 0 and self.title_select[1]:
                         pygame.quit()
                 if event.type == pygame.JOYAXISMOTION:
@@ -857,76 +1043,47 @@ class main_game:
                                 self.title_select[0] = True
                             self.title_select_cd = 10
             self.title_select_cd = max(0,self.title_select_cd-1)
-            self.screen.blit(self.display_brightness, (0, 0))
-            pygame.display.flip()
+            self.menu.flush()
+
+    def draw_title_background(self, surface):
+        #blit the title screen and scale it to the screen size
+        surface.blit(self.transforms.get(self.assets["title_screen"],size=(SCREEN_WIDTH, SCREEN_HEIGHT)),(0,0))
+        #blit a half transparent background for the button
+        button_bg = self.transforms.get(self.assets["button_background"],size=(650,600),alpha=128)  # Set transparency level (0-255)
+        surface.blit(button_bg, (-30, 350))
+        surface.blit(self.transforms.get(self.assets["title"],size=(450,450)),(65,-20))
+
     def run_setting(self):
         self.setting_select = [[True,False],[False,False],[False,False],[False,False]]
         self.setting_index = [1,1]
-        decrease_light = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        decrease_light.fill((0, 0, 0, 128))  # RGBA: (0, 0, 0, 128) for half transparency
-        self.screen.blit(decrease_light, (0, 0))
+        self.overlay.dim(self.screen, 128)
 
-        self.temp_screen = self.screen.copy()
+        self.temp_screen.blit(self.screen, (0, 0))
+        self.menu.start(self.draw_setting_background)
 
         while True:
             self.setting_select_cd = max(0,self.setting_select_cd-1)
-            self.screen.blit(self.temp_screen, (0,0))
-            #blit setting_bg in the middle of the screen
-            #self.screen.blit(pygame.transform.scale(self.assets["setting_screen"], (2*SCREEN_WIDTH/3, 2*SCREEN_HEIGHT/3)),(SCREEN_WIDTH/6, SCREEN_HEIGHT/6))
-            self.screen.blit(pygame.transform.scale(self.assets["setting_screen"], (7*SCREEN_WIDTH/8, 12*SCREEN_HEIGHT/8)),(SCREEN_WIDTH/16-40, SCREEN_HEIGHT/16-300))
-            
-            
-            text_font = self.assets["font_setting"].render("BGM音量", True, (255,255,255))
-            self.screen.blit(text_font, (SCREEN_WIDTH/3-120, SCREEN_HEIGHT/6+100))
-            self.screen.blit(pygame.transform.scale(self.assets["music"], (50,50)),(SCREEN_WIDTH/3+90, SCREEN_HEIGHT/6+105))
-            text = str(self.bgm_factor)
-            text_font = self.assets["font_setting"].render(text, True, (255,255,255))
-            self.screen.blit(text_font, (SCREEN_WIDTH/3+335, SCREEN_HEIGHT/6+95))
-
-            text_font = self.assets["font_setting"].render("SFX音量", True, (255,255,255))
-            self.screen.blit(text_font, (SCREEN_WIDTH/3-120, SCREEN_HEIGHT/6+250))
-            self.screen.blit(pygame.transform.scale(self.assets["music"], (50,50)),(SCREEN_WIDTH/3+90, SCREEN_HEIGHT/6+255))
-            text = str(self.sfx_factor)
-            text_font = self.assets["font_setting"].render(text, True, (255,255,255))
-            self.screen.blit(text_font, (SCREEN_WIDTH/3+335, SCREEN_HEIGHT/6+250))
-
-            text_font = self.assets["font_setting"].render("畫面亮度", True, (255,255,255))
-            self.screen.blit(text_font, (SCREEN_WIDTH/3-130, SCREEN_HEIGHT/6+400))
-            self.screen.blit(pygame.transform.scale(self.assets["sun"], (50,50)),(SCREEN_WIDTH/3+95, SCREEN_HEIGHT/6+405))
-            text = str(self.brightness)
-            text_font = self.assets["font_setting"].render(text, True, (255,255,255))
-            self.screen.blit(text_font, (SCREEN_WIDTH/3+335, SCREEN_HEIGHT/6+400))
-
-            if self.setting_select[0][0]:
-                self.screen.blit(pygame.transform.scale(self.assets["tri_left_selected"], (50,50)),(SCREEN_WIDTH/3+200, SCREEN_HEIGHT/6+100))
-            else:
-                self.screen.blit(pygame.transform.scale(self.assets["tri_left"], (50,50)),(SCREEN_WIDTH/3+200, SCREEN_HEIGHT/6+100))
-            if self.setting_select[0][1]:
-                self.screen.blit(pygame.transform.scale(self.assets["tri_right_selected"], (50,50)),(SCREEN_WIDTH/3+450, SCREEN_HEIGHT/6+100))
-            else:
-                self.screen.blit(pygame.transform.scale(self.assets["tri_right"], (50,50)),(SCREEN_WIDTH/3+450, SCREEN_HEIGHT/6+100))
-            if self.setting_select[1][0]:
-                self.screen.blit(pygame.transform.scale(self.assets["tri_left_selected"], (50,50)),(SCREEN_WIDTH/3+200, SCREEN_HEIGHT/6+250))
-            else:
-                self.screen.blit(pygame.transform.scale(self.assets["tri_left"], (50,50)),(SCREEN_WIDTH/3+200, SCREEN_HEIGHT/6+250))
-            if self.setting_select[1][1]:
-                self.screen.blit(pygame.transform.scale(self.assets["tri_right_selected"], (50,50)),(SCREEN_WIDTH/3+450, SCREEN_HEIGHT/6+250))
-            else:
-                self.screen.blit(pygame.transform.scale(self.assets["tri_right"], (50,50)),(SCREEN_WIDTH/3+450, SCREEN_HEIGHT/6+250))
-            if self.setting_select[2][0]:
-                self.screen.blit(pygame.transform.scale(self.assets["tri_left_selected"], (50,50)),(SCREEN_WIDTH/3+200, SCREEN_HEIGHT/6+400))
-            else:
-                self.screen.blit(pygame.transform.scale(self.assets["tri_left"], (50,50)),(SCREEN_WIDTH/3+200, SCREEN_HEIGHT/6+400))
-            if self.setting_select[2][1]:
-                self.screen.blit(pygame.transform.scale(self.assets["tri_right_selected"], (50,50)),(SCREEN_WIDTH/3+450, SCREEN_HEIGHT/6+400))
-            else:
-                self.screen.blit(pygame.transform.scale(self.assets["tri_right"], (50,50)),(SCREEN_WIDTH/3+450, SCREEN_HEIGHT/6+400))
+            idle = self.menu.idle() and not self.setting_select_cd
+            self.menu.show_text("bgm",self.assets["font_setting"],str(self.bgm_factor),(SCREEN_WIDTH/3+335, SCREEN_HEIGHT/6+95))
+            self.menu.show_text("sfx",self.assets["font_setting"],str(self.sfx_factor),(SCREEN_WIDTH/3+335, SCREEN_HEIGHT/6+250))
+            self.menu.show_text("brightness",self.assets["font_setting"],str(self.brightness),(SCREEN_WIDTH/3+335, SCREEN_HEIGHT/6+400))
+
+            for row in range(3):
+                y = SCREEN_HEIGHT/6+100+150*row
+                if self.setting_select[row][0]:
+                    self.menu.show(("left",row),self.transforms.get(self.assets["tri_left_selected"],size=(50,50)),(SCREEN_WIDTH/3+200, y))
+                else:
+                    self.menu.show(("left",row),self.transforms.get(self.assets["tri_left"],size=(50,50)),(SCREEN_WIDTH/3+200, y))
+                if self.setting_select[row][1]:
+                    self.menu.show(("right",row),self.transforms.get(self.assets["tri_right_selected"],size=(50,50)),(SCREEN_WIDTH/3+450, y))
+                else:
+                    self.menu.show(("right",row),self.transforms.get(self.assets["tri_right"],size=(50,50)),(SCREEN_WIDTH/3+450, y))
             if self.setting_select[3][0] or self.setting_select[3][1]:
-                self.screen.blit(self.assets["pressed_menu"],(SCREEN_WIDTH/2-200, 4*SCREEN_HEIGHT/6-100))
+                self.menu.show("menu",self.assets["pressed_menu"],(SCREEN_WIDTH/2-200, 4*SCREEN_HEIGHT/6-100))
             else:
-                self.screen.blit(self.assets["menu"],(SCREEN_WIDTH/2-200, 4*SCREEN_HEIGHT/6-100))
+                self.menu.show("menu",self.assets["menu"],(SCREEN_WIDTH/2-200, 4*SCREEN_HEIGHT/6-100))
             
-            for event in pygame.event.get():
+            for event in self.menu.events(idle):
                 if event.type == pygame.QUIT:
                     pygame.quit()
                     return
@@ -982,9 +1139,102 @@ class main_game:
             self.sfx["hit"].set_volume(0.8*self.sfx_factor/5) 
             self.sfx["got_hit"].set_volume(1*self.sfx_factor/5)
             self.clock.tick(FPS)
-            self.display_brightness.fill((0, 0, 0, 40*(3-self.brightness)))  # RGBA: (0, 0, 0, 128) for half transparency
-            self.screen.blit(self.display_brightness, (0, 0))
-            pygame.display.flip()
+            self.overlay.darkness = 40*(3-self.brightness)
+            self.menu.flush()
+
+    def draw_setting_background(self, surface):
+        surface.blit(self.temp_screen, (0,0))
+        #blit setting_bg in the middle of the screen
+        #surface.blit(pygame.transform.scale(self.assets["setting_screen"], (2*SCREEN_WIDTH/3, 2*SCREEN_HEIGHT/3)),(SCREEN_WIDTH/6, SCREEN_HEIGHT/6))
+        surface.blit(self.transforms.get(self.assets["setting_screen"],size=(7*SCREEN_WIDTH/8, 12*SCREEN_HEIGHT/8)),(SCREEN_WIDTH/16-40, SCREEN_HEIGHT/16-300))
+
+        text_font = self.assets["font_setting"].render("BGM音量", True, (255,255,255))
+        surface.blit(text_font, (SCREEN_WIDTH/3-120, SCREEN_HEIGHT/6+100))
+        surface.blit(self.transforms.get(self.assets["music"],size=(50,50)),(SCREEN_WIDTH/3+90, SCREEN_HEIGHT/6+105))
+
+        text_font = self.assets["font_setting"].render("SFX音量", True, (255,255,255))
+        surface.blit(text_font, (SCREEN_WIDTH/3-120, SCREEN_HEIGHT/6+250))
+        surface.blit(self.transforms.get(self.assets["music"],size=(50,50)),(SCREEN_WIDTH/3+90, SCREEN_HEIGHT/6+255))
+
+        text_font = self.assets["font_setting"].render("畫面亮度", True, (255,255,255))
+        surface.blit(text_font, (SCREEN_WIDTH/3-130, SCREEN_HEIGHT/6+400))
+        surface.blit(self.transforms.get(self.assets["sun"],size=(50,50)),(SCREEN_WIDTH/3+95, SCREEN_HEIGHT/6+405))
 
 if __name__ == "__main__":
-    main_game().run_main_menu()
+    parser = argparse.ArgumentParser(description="Devil's Dash")
+    parser.add_argument("--headless", action="store_true", help="soak-test a level without a window")
+    parser.add_argument("--level", type=int, default=0)
+    #a whole boss fight is about 5000 steps (phase 3 is a 2200 step spell card), so --phase 1 --bot fight --hp 1000
+    #wins about 120 fights a minute at ~0.1 ms a step, --phase 3 about 200, losing fights end far sooner
+    parser.add_argument("--fights", type=int, default=1)
+    parser.add_argument("--frames", type=int, default=FPS*60*5, help="frame limit per fight")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--hp", type=int, default=0, help="override the player's HP so the bot survives to later phases")
+    parser.add_argument("--phase", type=int, choices=(1,2,3), help="start each fight at this boss phase, past the cutscene (level 0 only)")
+    parser.add_argument("--bot", choices=sorted(BOTS), default="soak", help="soak walks at enemies and swings at random, fight plays to clear the boss phases")
+    parser.add_argument("--render", action="store_true", help="also render every frame offscreen and time it")
+    parser.add_argument("--outline", action="store_true", help="draw a dark outline around tiles and bullets")
+    parser.add_argument("--profile", help="write per-stage frame timings to this .csv or .jsonl file")
+    parser.add_argument("--record", help="write the input of each run started from the title screen to this file")
+    parser.add_argument("--replay", help="play back a file written by --record instead of reading input")
+    parser.add_argument("--fps", type=int, default=FPS, help="how often the screen is drawn, the game itself always runs at %d steps a second" % FPS)
+    args = parser.parse_args()
+    if args.phase and args.level != 0:
+        parser.error("--phase needs --level 0, the boss level")
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if not args.headless:
+        game = main_game()
+        game.outline.enabled = args.outline
+        game.render_fps = args.fps
+        game.record_path = args.record
+        if args.profile:
+            game.profiler.export(args.profile)
+        if args.replay:
+            game.play(Input_Replay(args.replay))
+            game.profiler.close()
+        else:
+            game.run_main_menu()
+    else:
+        game = main_game(headless=True)
+        game.outline.enabled = args.outline
+        if args.profile:
+            game.profiler.export(args.profile)
+        outcomes = {}
+        total_frames = sim_time = render_time = 0
+        start = time.perf_counter()
+        for fight in range(args.fights):
+            if args.replay:
+                #the same recorded run every fight, --level/--seed/--hp would make it play out differently
+                replay = Input_Replay(args.replay)
+                random.seed(replay.seed)
+                game.level = replay.level
+                game.load_level()
+                result = game.run_headless(len(replay),replay,render=args.render,stop=False)
+            else:
+                random.seed(args.seed+fight)
+                game.level = args.level
+                game.load_level()
+                if args.phase:
+                    game.start_phase(args.phase)
+                if args.hp:
+                    game.player.HP = args.hp
+                result = game.run_headless(args.frames,BOTS[args.bot](args.seed+fight),render=args.render)
+            outcomes[result["outcome"]] = outcomes.get(result["outcome"],0)+1
+            total_frames += result["frames"]
+            sim_time += result["sim_time"]
+            render_time += result["render_time"]
+        elapsed = time.perf_counter() - start
+        print("fights:",args.fights,outcomes)
+        print("fights per minute: %.1f" % (args.fights/elapsed*60))
+        print("frames per fight: %.0f" % (total_frames/max(1,args.fights)))
+        print("sim ms/frame: %.4f" % (sim_time/max(1,total_frames)*1000))
+        if args.render:
+            print("render ms/frame: %.4f" % (render_time/max(1,total_frames)*1000))
+        for name, pool in (("particles", game.particles), ("sparks", game.sparks), ("projectiles", game.projectiles)):
+            stats = pool.stats()
+            print("%s pool: size %d, spawned %d, high water %d, reused %.1f%%" % (name, stats["size"], stats["spawned"], stats["high_water"], stats["reuse"]*100))
+        if game.transition_stalls:
+            print("level transitions: %d, main thread held up %.2f ms at most (%.2f ms waiting on the preloader)" % (len(game.transition_stalls), max(stall[1] for stall in game.transition_stalls), max(stall[2] for stall in game.transition_stalls)))
+        if args.profile:
+            print("\n".join(game.profiler.summary_lines()))
+            game.profiler.close()
@@ -0,0 +1,46 @@
+import ast
+
+#boss scripts, run one entry at a time by Enemy.update
+#int: wait that many frames
+#["name", frames]: a timed state that Enemy.update handles every frame until frames runs out
+#"method(args)": call an Enemy method once, compiled to (method name, args) when this module loads
+
+COMPILED = {}
+
+def compile_action(text):
+    #"air_8_shoot(1)" -> ("air_8_shoot", (1,)), every distinct string is only parsed once
+    if text not in COMPILED:
+        call = ast.parse(text, mode="eval").body
+        COMPILED[text] = (call.func.id, tuple(ast.literal_eval(arg) for arg in call.args))
+    return COMPILED[text]
+
+def compile_script(script):
+    return [compile_action(entry) if isinstance(entry, str) else entry for entry in script]
+
+def load_script(script):
+    #timed states count down in place, so every run gets its own copy of them
+    return [list(entry) if isinstance(entry, list) else entry for entry in script]
+
+#phase 1
+PHASE_1_START = compile_script([['empty',60],300])
+PHASE_1_NEXT_COMBO = compile_script([["empty",30],"combo()"])
+PHASE_1_CLOSE = compile_script(["prepare_attack()",["empty",30],"ground_smash()",["empty",5],"screen_shake(20)",["empty",30]])
+PHASE_1_SHOOT = compile_script(["normal_shoot()",["empty_walk",80],["empty",20]])
+PHASE_1_COMBO_1 = compile_script(["jump()",["empty",30],"frozen_in_air()","air_dash()",["aim_drop",30],"drop_attack()",["land_detect",60],"land_shoot()",["empty",30],["empty_walk",60],300])
+PHASE_1_COMBO_2 = compile_script(["prepare_attack()",["empty",55],"dash()",["empty",10],"frozen_in_air()","normal_shoot()",["empty",20],"normal_shoot()",["empty",20],"normal_shoot()",["empty",20],"normal_shoot()",["empty",140],["empty_walk",60],300])
+PHASE_1_COMBO_2_AGAIN = compile_script(["prepare_attack()",["empty",55],"dash()",["empty",10],"frozen_in_air()","normal_shoot()",["empty",20],"normal_shoot()",["empty",20],"normal_shoot()",["empty",20],"normal_shoot()",["empty",100],"combo()"])
+
+#phase 2
+PHASE_2_START = compile_script([100,"jump()",40,"frozen_in_air()",10,"air_8_shoot(1)",30,"air_8_shoot(2)",30,"air_8_shoot(1)",30,"prepare_attack()",["attack_preview()",30],5,["dash_to()",1]])
+PHASE_2_LOOP = compile_script([60,"jump()",40,"frozen_in_air()",10,"air_8_shoot(1)",30,"air_8_shoot(2)",30,"air_8_shoot(1)",30,"prepare_attack()",["attack_preview()",30],5,["dash_to()",1]])
+PHASE_2_WALL_SMASH = compile_script([60,"prepare_attack()",40,"dash()",20,"frozen_in_air()",3,"ground_smash()",5,"screen_shake(20)"])
+PHASE_2_WALL_SHOOT = compile_script([60,"jump()",20,"direction_shoot()",40,"direction_shoot()",80])
+PHASE_2_LANDED = compile_script([15,"frozen_in_air()",20]) #after dash_back(player x), which ground_8_shoot puts in front
+PHASE_2_LANDED_EXPLODE = compile_script(["diag_explode_shoot()",40])
+PHASE_2_LANDED_DASH = compile_script(["prepare_attack()",40,"furiously_dash()"])
+PHASE_2_EXPLODE_SMASH = compile_script([80,"prepare_attack()",40,"dash()",20,"frozen_in_air()",10,"ground_smash()",5,"screen_shake(20)"])
+PHASE_2_EXPLODE_SHOOT = compile_script([80,"jump()",20,"direction_shoot()",40,"direction_shoot()",80])
+
+#phase 3
+PHASE_3_START = compile_script([60,"cut_in()",60,"prepare_attack(1)",60,["spell_card()",80],90,"air_dash()",40,"frozen_in_air()",10,["spell_card()",80],90,["spread()",15],90,"prepare_attack()",["attack_preview()",30],5,["dash_to()",1]])
+PHASE_3_LOOP = compile_script([60,"jump()",20,"frozen_in_air()",10,"prepare_attack(1)",60,["spell_card()",80],90,"air_dash()",25,"frozen_in_air()",10,["spell_card()",80],90,["spread()",15],90,"prepare_attack()",["attack_preview()",30],5,["dash_to()",1]])
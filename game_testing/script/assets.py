@@ -0,0 +1,133 @@
+import os
+import pickle
+import pygame
+from script.utils import BASE_IMAGE_PATH
+
+CACHE_VERSION = 1
+
+class Asset_Manager:
+    #main_game.assets, each entry is loaded the first time it is used or when its scene is preloaded
+    def __init__(self, cache_dir=None):
+        self.loaders = {} #name -> (scene, function that loads it)
+        self.loaded = {}
+        self.cache = Atlas_Cache(cache_dir) if cache_dir else None
+
+    def add_scene(self, scene, loaders):
+        for name, loader in loaders.items():
+            self.loaders[name] = (scene, loader)
+
+    def __getitem__(self, name):
+        if name not in self.loaded:
+            self.loaded[name] = self.loaders[name][1]()
+        return self.loaded[name]
+
+    def __contains__(self, name):
+        return name in self.loaders
+
+    def load_scene(self, *scenes):
+        for name, (scene, loader) in self.loaders.items():
+            if scene in scenes:
+                self[name]
+        if self.cache:
+            self.cache.save()
+
+    def load_one(self, *scenes):
+        #loads the next entry of these scenes that is not loaded yet, so a scene can be spread over several frames
+        #False once they are all loaded
+        for name, (scene, loader) in self.loaders.items():
+            if scene in scenes and name not in self.loaded:
+                self[name]
+                return True
+        return False
+
+    def cached(self, key, sources, build):
+        #images that take work to make (scaled, rotated, flipped, jpg) come from the disk cache while their files are unchanged
+        #build returns a list of surfaces
+        if self.cache is None:
+            return build()
+        return self.cache.images(key, sources, build)
+
+class Atlas_Cache:
+    #every cached image list is packed side by side into one strip and kept in a single file
+    #entries are thrown away when the mtime of any source file changes
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, "atlas.cache")
+        self.entries = None
+        self.dirty = False
+
+    def stamp(self, sources):
+        stamp = []
+        for source in sources:
+            path = BASE_IMAGE_PATH + source
+            if os.path.isdir(path):
+                for name in sorted(os.listdir(path)):
+                    stamp.append((source + "/" + name, os.path.getmtime(path + "/" + name)))
+            else:
+                stamp.append((source, os.path.getmtime(path)))
+        return stamp
+
+    def read(self):
+        self.entries = {}
+        try:
+            with open(self.path, 'rb') as f:
+                data = pickle.load(f)
+            if data.get("version") == CACHE_VERSION:
+                self.entries = data["entries"]
+        except Exception:
+            pass #missing or unreadable cache, everything gets rebuilt
+
+    def images(self, key, sources, build):
+        if self.entries is None:
+            self.read()
+        stamp = self.stamp(sources)
+        entry = self.entries.get(key)
+        if entry is not None and entry["stamp"] == stamp:
+            return self.unpack(entry)
+        images = build()
+        self.entries[key] = self.pack(images, stamp)
+        self.dirty = True
+        return images
+
+    def pack(self, images, stamp):
+        alpha = bool(images[0].get_flags() & pygame.SRCALPHA)
+        atlas = pygame.Surface((sum(img.get_width() for img in images), max(img.get_height() for img in images)), pygame.SRCALPHA if alpha else 0)
+        rects = []
+        x = 0
+        for img in images:
+            if alpha:
+                atlas.blit(img, (x, 0), special_flags=pygame.BLEND_RGBA_MAX) #copy the alpha channel as it is
+            else:
+                img = img.copy()
+                img.set_colorkey(None)
+                atlas.blit(img, (x, 0))
+            rects.append((x, 0, img.get_width(), img.get_height()))
+            x += img.get_width()
+        mode = "RGBA" if alpha else "RGB"
+        return {"stamp": stamp, "alpha": alpha, "colorkey": images[0].get_colorkey(), "rects": rects,
+                "size": atlas.get_size(), "pixels": pygame.image.tobytes(atlas, mode)}
+
+    def unpack(self, entry):
+        if entry["alpha"]:
+            atlas = pygame.image.frombytes(entry["pixels"], entry["size"], "RGBA").convert_alpha()
+        else:
+            atlas = pygame.image.frombytes(entry["pixels"], entry["size"], "RGB").convert()
+        images = []
+        for rect in entry["rects"]:
+            img = atlas.subsurface(rect).copy()
+            if entry["colorkey"] is not None:
+                img.set_colorkey(entry["colorkey"])
+            images.append(img)
+        return images
+
+    def save(self):
+        if not self.dirty:
+            return
+        self.dirty = False
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.path + ".tmp", 'wb') as f:
+                pickle.dump({"version": CACHE_VERSION, "entries": self.entries}, f)
+            os.replace(self.path + ".tmp", self.path)
+        except OSError:
+            pass #read-only install, the images are just rebuilt next launch
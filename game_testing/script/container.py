@@ -0,0 +1,78 @@
+class Entity_List:
+    #objects kept in order that can be removed from or added to while each() is walking them
+    #a remove() during each() only marks the object, the marked ones are dropped in one pass when the walk ends
+    #an append() during each() is held back until then too, so new objects are first visited next time
+    #iterating or len() during a walk already sees the list as it will be when the walk ends
+    def __init__(self, items=()):
+        self.items = list(items)
+        self.removed = set() #ids of objects removed during the walk
+        self.added = []
+        self.walking = False
+
+    def each(self):
+        #removed objects are skipped for the rest of the walk
+        self.walking = True
+        try:
+            for item in self.items:
+                if id(item) not in self.removed:
+                    yield item
+        finally:
+            self.walking = False
+            self.compact()
+
+    def compact(self):
+        if self.removed:
+            removed = self.removed
+            self.items = [item for item in self.items if id(item) not in removed]
+            self.removed = set()
+        if self.added:
+            self.items.extend(self.added)
+            self.added = []
+
+    def append(self, item):
+        if self.walking:
+            self.added.append(item)
+        else:
+            self.items.append(item)
+
+    def remove(self, item):
+        if self.walking:
+            if item in self.added:
+                self.added.remove(item)
+            elif item in self.items and id(item) not in self.removed:
+                self.removed.add(id(item))
+            else:
+                raise ValueError("Entity_List.remove(x): x not in list") #same as list.remove outside a walk
+        else:
+            self.items.remove(item)
+
+    def clear(self):
+        self.items = []
+        self.removed = set()
+        self.added = []
+
+    def __iter__(self):
+        if not self.walking:
+            return iter(self.items)
+        return iter([item for item in self.items if id(item) not in self.removed] + self.added)
+
+    def __len__(self):
+        return len(self.items) - len(self.removed) + len(self.added)
+
+class Pool_Counters:
+    #spawn counters for the pools (Particle_Pool, Spark_System, Projectile_Pool), each one calls counted() from its spawn
+    #and has a capacity: how many objects or slots it holds, used or not
+    def init_counters(self):
+        self.spawned = 0
+        self.reused = 0 #spawns handed an object or slot that an earlier spawn had used
+        self.high_water = 0 #most alive at once
+
+    def counted(self, reused):
+        self.spawned += 1
+        if reused:
+            self.reused += 1
+        self.high_water = max(self.high_water, len(self))
+
+    def stats(self):
+        return {"size": self.capacity, "spawned": self.spawned, "high_water": self.high_water,
+                "reuse": self.reused/self.spawned if self.spawned else 0}
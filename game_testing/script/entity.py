@@ -1,81 +1,18 @@
 import pygame
-from script.particle import Particle
+from script.utils import Animation
 from script.spark import Spark, Flame, Gold_Flame, Ice_Flame, Flexible_Spark
+from script.projectile import PLAIN, SPIN, EXPLODE, SMALL_EXPLODE
+from script.actions import load_script
+from script.actions import PHASE_1_CLOSE, PHASE_1_COMBO_1, PHASE_1_COMBO_2, PHASE_1_COMBO_2_AGAIN, PHASE_1_NEXT_COMBO, PHASE_1_SHOOT, PHASE_1_START, PHASE_2_EXPLODE_SHOOT, PHASE_2_EXPLODE_SMASH, PHASE_2_LANDED, PHASE_2_LANDED_DASH, PHASE_2_LANDED_EXPLODE, PHASE_2_LOOP, PHASE_2_WALL_SHOOT, PHASE_2_WALL_SMASH, PHASE_3_LOOP
 import math
 import random
 
-class Diagnal_Projectile:
-    def __init__(self,pos=[0,0],direction=[1,0],speed=1,img_name=""):
-        self.pos = list(pos)
-        self.direction = direction
-        self.speed = speed
-        self.timer = 0
-        self.img_name = img_name
-        self.length_of_direction = math.sqrt(self.direction[0]**2 + self.direction[1]**2)
-    def update(self):
-        self.pos[0] += self.direction[0] * self.speed / self.length_of_direction
-        self.pos[1] += self.direction[1] * self.speed / self.length_of_direction
-        self.timer += 1
-    def reverse(self):
-        return True
-
-class Special_Projectile(Diagnal_Projectile):
-    def __init__(self,pos=[0,0],direction=[1,0],speed=1,img_name="",max_timer=180,type="normal",main_game=None,reverse=False):
-        super().__init__(pos,direction,speed,img_name)
-        self.max_timer = max_timer
-        self.type = type
-        self.main_game = main_game
-        self.can_reverse = reverse
-
-    def update(self):
-        if self.type == ("two_stage_spin" or "two_stage_random") and self.timer < self.max_timer:
-            self.speed *= 0.9
-        if self.timer == self.max_timer:
-            if self.type == "explode_shoot":
-                self.explode()
-            elif self.type == "two_stage_spin" or self.type == "two_stage_random":    
-                self.second_stage()
-            elif self.type == "small_explode":
-                self.small_explode()
-        super().update()
-
-    def second_stage(self):
-        self.speed = 3 if self.type == "two_stage_spin" else 2
-    
-    def explode(self):
-        #boss will shoot 8 special projectiles in all directions
-        self.velocity = [0,0]
-        for i in range(12):
-            angle = i * math.pi / 6
-            self.main_game.special_projectiles.append(Diagnal_Projectile(self.pos,[math.cos(angle),math.sin(angle)],1.5,"projectile_"+str(random.randint(1,7))))
-            for i in range(4):
-                self.main_game.sparks.append(Ice_Flame(self.main_game.special_projectiles[-1].pos,random.random()*math.pi*2,1+random.random()))
-        self.main_game.special_projectiles.remove(self)
-    
-    def small_explode(self):
-        #boss will shoot 8 special projectiles in all directions
-        self.velocity = [0,0]
-        random_angle = random.random()*math.pi*2
-        for i in range(6):
-            angle = i * math.pi / 3 + random_angle  
-            self.main_game.special_projectiles.append(Diagnal_Projectile(self.pos,[math.cos(angle),math.sin(angle)],3,"projectile_"+str(random.randint(1,7))))
-            for i in range(4):
-                self.main_game.sparks.append(Ice_Flame(self.main_game.special_projectiles[-1].pos,random.random()*math.pi*2,1+random.random()))
-        self.main_game.special_projectiles.remove(self)
-
-    def reverse(self):
-        if self.can_reverse:
-            self.direction = [-self.direction[0],-self.direction[1]]
-            self.can_reverse = False
-            return False
-        return True
-
-
 class physics_entity:
     def __init__(self,main_game,entity_type,position,size):
         self.main_game = main_game
         self.entity_type = entity_type
         self.position = list(position)  
+        self.prev_position = list(position) #position before the last step, see draw_position
         self.size = size
         self.velocity = [0,0]
         self.dashing = 0
@@ -90,46 +27,48 @@ class physics_entity:
     def set_action(self,action):
         if self.action != action:
             self.action = action
-            self.anim = self.main_game.assets[self.entity_type + "/" + action].copy()
+            self.anim = Animation(self.main_game.assets[self.entity_type + "/" + action])
 
     def rect(self):
         return pygame.Rect(self.position[0], self.position[1], self.size[0], self.size[1])
 
+    def draw_position(self):
+        #between the last two steps when the display runs faster than the simulation
+        alpha = self.main_game.alpha
+        if alpha >= 1:
+            return self.position
+        return [self.prev_position[0]+(self.position[0]-self.prev_position[0])*alpha, self.prev_position[1]+(self.position[1]-self.prev_position[1])*alpha]
+
     def update(self, movement=(0,0),tilemap=None):
         self.check_collision = {'up':False, 'down':False, 'left':False, 'right':False}
         frame_movement = [movement[0] + self.velocity[0], movement[1] + self.velocity[1]]
 
+        #each axis is swept from where the entity is to where it is going, so a fast dash stops at the first wall instead of passing it
+        edge = tilemap.sweep(self.position, self.size, frame_movement[0], 0) if frame_movement[0] else None
         self.position[0] += frame_movement[0]
-        entity_rect = self.rect()
-
-        for rect in tilemap.tile_collision(self.position):
-            if entity_rect.colliderect(rect):
-                if frame_movement[0] > 0:
-                    entity_rect.right = rect.left
-                    self.check_collision['right'] = True
-                if frame_movement[0] < 0:
-                    entity_rect.left = rect.right
-                    self.check_collision['left'] = True
-                self.position[0] = entity_rect.x
+        if edge is not None:
+            if frame_movement[0] > 0:
+                self.position[0] = edge - self.size[0]
+                self.check_collision['right'] = True
+            else:
+                self.position[0] = edge
+                self.check_collision['left'] = True
 
         if movement[0] > 0:
             self.flip = False
         if movement[0] < 0:
             self.flip = True
 
+        edge = tilemap.sweep(self.position, self.size, frame_movement[1], 1) if frame_movement[1] else None
         self.position[1] += frame_movement[1]
-        entity_rect = self.rect()
-
-        for rect in tilemap.tile_collision(self.position):
-            if entity_rect.colliderect(rect):
-                if frame_movement[1] > 0:
-                    entity_rect.bottom = rect.top
-                    self.check_collision['down'] = True
-                    self.jumping = False
-                if frame_movement[1] < 0:
-                    entity_rect.top = rect.bottom
-                    self.check_collision['up'] = True
-                self.position[1] = entity_rect.y
+        if edge is not None:
+            if frame_movement[1] > 0:
+                self.position[1] = edge - self.size[1]
+                self.check_collision['down'] = True
+                self.jumping = False
+            else:
+                self.position[1] = edge
+                self.check_collision['up'] = True
 
 
         if self.check_collision['down'] or self.check_collision['up']:
@@ -138,14 +77,16 @@ class physics_entity:
         self.anim.update()  
 
     def render(self,surface,offset=[0,0]):
-        surface.blit(pygame.transform.flip(self.anim.img(),self.flip,False),(self.position[0]-offset[0]+self.anim_offset[0],self.position[1]-offset[1]+self.anim_offset[1]))
+        position = self.draw_position()
+        surface.blit(self.main_game.transforms.get(self.anim.img(),self.flip),(position[0]-offset[0]+self.anim_offset[0],position[1]-offset[1]+self.anim_offset[1]))
         #surface.blit(self.main_game.assets['player'],(self.position[0]-offset[0],self.position[1]-offset[1])    )
     def render_new(self,surface,offset=[0,0]):
+        position = self.draw_position()
         if self.entity_type == "player" or self.type == "boss":
-            surface.blit(pygame.transform.scale(pygame.transform.flip(self.anim.img(),not self.flip,False),(80,100)),(4*int(self.position[0]-offset[0]+self.anim_offset[0]),4*int(self.position[1]-offset[1]+self.anim_offset[1]+1))) #+1 for visually reg
+            surface.blit(self.main_game.transforms.get(self.anim.img(),not self.flip,size=(80,100)),(4*int(position[0]-offset[0]+self.anim_offset[0]),4*int(position[1]-offset[1]+self.anim_offset[1]+1))) #+1 for visually reg
             #surface.blit(pygame.transform.scale(pygame.transform.flip(self.anim.img(),not self.flip,False),(56,70)),(4*int(self.position[0]-offset[0]+self.anim_offset[0]),4*int(self.position[1]-offset[1]+self.anim_offset[1]+1))) #+1 for visually reg
         elif self.entity_type == "dummy":
-            surface.blit(pygame.transform.scale(pygame.transform.flip(self.anim.img(),not self.flip,False),(120,150)),(4*int(self.position[0]-offset[0]+self.anim_offset[0]),4*int(self.position[1]-offset[1]+self.anim_offset[1]+1)))
+            surface.blit(self.main_game.transforms.get(self.anim.img(),not self.flip,size=(120,150)),(4*int(position[0]-offset[0]+self.anim_offset[0]),4*int(position[1]-offset[1]+self.anim_offset[1]+1)))
 
 
 class Player(physics_entity):
@@ -248,7 +189,7 @@ class Player(physics_entity):
             if abs(self.dashing) == 51:
                 self.velocity[0] *= 0.1
             pv = [math.cos(random.random()*math.pi*2)*random.random()*0.5+0.5,math.sin(random.random()*math.pi*2)*random.random()*0.5+0.5]
-            self.main_game.particles.append(Particle(self.main_game,'particle',self.rect().center,pv,frame=random.randint(0,7)))
+            self.main_game.particles.spawn('particle',self.rect().center,pv,frame=random.randint(0,7))
         if self.velocity[0] > 0:
             self.velocity[0] = max(0,self.velocity[0]-0.1)
         if self.velocity[0] < 0:
@@ -287,10 +228,10 @@ class Player(physics_entity):
                 #if charge is full, attack will deal additional damage
                 if self.flip:
                     hitbox = pygame.Rect(self.rect().centerx -36,self.rect().centery,28,16)
-                    self.main_game.particles.append(Particle(self.main_game,'slash',(self.rect().centerx -18,self.rect().centery),velocity=[0,0],frame=10))
+                    self.main_game.particles.spawn('slash',(self.rect().centerx -18,self.rect().centery),velocity=[0,0],frame=10)
                 else:
                     hitbox = pygame.Rect(self.rect().centerx +8,self.rect().centery,28,16) 
-                    self.main_game.particles.append(Particle(self.main_game,'slash',(self.rect().centerx +18,self.rect().centery),velocity=[0,0],frame=10,flip=True))  
+                    self.main_game.particles.spawn('slash',(self.rect().centerx +18,self.rect().centery),velocity=[0,0],frame=10,flip=True)  
                 for enemy in self.main_game.enemy_spawners:
                     if hitbox.colliderect(enemy.rect()) and enemy.type != 'beam':
                         enemy.HP -= 1.5*self.damage if self.charge_effect else self.damage
@@ -300,7 +241,7 @@ class Player(physics_entity):
                             angle = random.random()*math.pi*2
                             speed = random.random() *5
                             self.main_game.sparks.append(Gold_Flame(enemy.rect().center,angle,2+random.random()))  
-                            self.main_game.particles.append(Particle(self.main_game,'particle',enemy.rect().center,[math.cos(angle+math.pi)*speed*0.5,math.sin(angle+math.pi)*speed*0.5],frame=random.randint(0,7)))  
+                            self.main_game.particles.spawn('particle',enemy.rect().center,[math.cos(angle+math.pi)*speed*0.5,math.sin(angle+math.pi)*speed*0.5],frame=random.randint(0,7))  
                         self.main_game.sparks.append(Gold_Flame(enemy.rect().center, 0, 5+random.random()))
                         self.main_game.sparks.append(Gold_Flame(enemy.rect().center, math.pi, 5+random.random()))
                 if self.extra_attack and not is_extra:
@@ -315,10 +256,10 @@ class Player(physics_entity):
             elif self.weapon == "貪欲的叉勺":
                 if self.flip:
                     hitbox = pygame.Rect(self.position[0]-36,self.position[1],28,22)
-                    self.main_game.particles.append(Particle(self.main_game,'slash',(self.rect().centerx -18,self.rect().centery),velocity=[0,0],frame=10))
+                    self.main_game.particles.spawn('slash',(self.rect().centerx -18,self.rect().centery),velocity=[0,0],frame=10)
                 else:
                     hitbox = pygame.Rect(self.position[0]+8,self.position[1],28,22)   
-                    self.main_game.particles.append(Particle(self.main_game,'slash',(self.rect().centerx +18,self.rect().centery),velocity=[0,0],frame=10,flip=True))  
+                    self.main_game.particles.spawn('slash',(self.rect().centerx +18,self.rect().centery),velocity=[0,0],frame=10,flip=True)  
                 for enemy in self.main_game.enemy_spawners:
                     if hitbox.colliderect(enemy.rect()):
                         enemy.HP -= self.damage
@@ -327,26 +268,19 @@ class Player(physics_entity):
                             angle = random.random()*math.pi*2
                             speed = random.random() *5
                             self.main_game.sparks.append(Gold_Flame(enemy.rect().center,angle,2+random.random()))  
-                            self.main_game.particles.append(Particle(self.main_game,'particle',enemy.rect().center,[math.cos(angle+math.pi)*speed*0.5,math.sin(angle+math.pi)*speed*0.5],frame=random.randint(0,7)))  
+                            self.main_game.particles.spawn('particle',enemy.rect().center,[math.cos(angle+math.pi)*speed*0.5,math.sin(angle+math.pi)*speed*0.5],frame=random.randint(0,7))  
                         self.main_game.sparks.append(Gold_Flame(enemy.rect().center, 0, 5+random.random()))
                         self.main_game.sparks.append(Gold_Flame(enemy.rect().center, math.pi, 5+random.random()))
-                for bullet in self.main_game.projectiles.copy():
-                    if hitbox.colliderect(pygame.Rect(bullet[0][0]-4,bullet[0][1]-4,8,8)):
-                        self.charge = min(self.charge+self.charge_per_hit,self.max_charge)
-                        self.main_game.projectiles.remove(bullet)
+                for bullet in self.main_game.projectiles.collide_rect(hitbox):
+                    self.charge = min(self.charge+self.charge_per_hit,self.max_charge)
+                    pos = self.main_game.projectiles.position(bullet)
+                    if self.main_game.projectiles.kind[bullet] == PLAIN:
                         self.attack_cool_down = 1
-                        for i in range(10):
-                            angle = random.random()*math.pi*2
-                            speed = random.random() *5
-                            self.main_game.sparks.append(Spark(bullet[0],angle,2+random.random()))  
-                for bullet in self.main_game.special_projectiles:
-                    if hitbox.colliderect(pygame.Rect(bullet.pos[0]-4,bullet.pos[1]-4,8,8)):
-                        self.charge = min(self.charge+self.charge_per_hit,self.max_charge)
-                        self.main_game.special_projectiles.remove(bullet)
-                        for i in range(10):
-                            angle = random.random()*math.pi*2
-                            speed = random.random() *5
-                            self.main_game.sparks.append(Spark(bullet.pos,angle,2+random.random()))
+                    self.main_game.projectiles.kill(bullet)
+                    for i in range(10):
+                        angle = random.random()*math.pi*2
+                        speed = random.random() *5
+                        self.main_game.sparks.append(Spark(pos,angle,2+random.random()))  
                 if self.extra_attack and not is_extra:
                     self.extra_attack_frame = 11
             return True
@@ -366,7 +300,7 @@ class Player(physics_entity):
                     angle = random.random()*math.pi*2
                     speed = random.random() *3
                     #self.main_game.sparks.append(Flexible_Spark(self.rect().center,angle,2+random.random(),(0,255,0)))
-                    self.main_game.particles.append(Particle(self.main_game,'hp',(self.rect().centerx+random.randint(-10,10),self.rect().centery+random.randint(-3,3)),[math.cos(angle+math.pi)*speed*0.5*0,-1*abs(math.sin(angle+math.pi)*speed*0.5)],frame=random.randint(0,7)))
+                    self.main_game.particles.spawn('hp',(self.rect().centerx+random.randint(-10,10),self.rect().centery+random.randint(-3,3)),[math.cos(angle+math.pi)*speed*0.5*0,-1*abs(math.sin(angle+math.pi)*speed*0.5)],frame=random.randint(0,7))
 
                 #self.main_game.sfx['heal'].play()
                 self.HP = min(self.HP+1,6)
@@ -407,7 +341,7 @@ class Player(physics_entity):
                 angle = random.random()*math.pi*2
                 speed = random.random() *5
                 self.main_game.sparks.append(Flexible_Spark(self.rect().center,angle,2+random.random(),(0,0,0)))  
-                self.main_game.particles.append(Particle(self.main_game,'particle',self.rect().center,[math.cos(angle+math.pi)*speed*0.5,math.sin(angle+math.pi)*speed*0.5],frame=random.randint(0,7)))
+                self.main_game.particles.spawn('particle',self.rect().center,[math.cos(angle+math.pi)*speed*0.5,math.sin(angle+math.pi)*speed*0.5],frame=random.randint(0,7))
             if self.HP <= 0:
                 self.main_game.dead += 1    
 
@@ -415,6 +349,8 @@ class Player(physics_entity):
         if abs(self.dashing) <= 50:
             super().render(surface,offset)
 
+ACTION_TABLE = {} #method name -> Enemy method, filled in as run_action meets them
+
 class Enemy(physics_entity):
     def __init__(self,main_game,position,size,phase=1,action_queue=[]):
         super().__init__(main_game,'enemy',position,size)
@@ -442,7 +378,7 @@ class Enemy(physics_entity):
 
         if self.phase == 1:
             self.HP = 35
-            self.action_queue = [['empty',60],300]
+            self.action_queue = load_script(PHASE_1_START)
             self.p1_shoot_count = 0
             #self.HP = 1
         elif self.phase == 2:
@@ -463,6 +399,13 @@ class Enemy(physics_entity):
         #self.HP=25
         pass
 
+    def run_action(self, action):
+        #action is (method name, args) from script.actions, methods are looked up once per name
+        method = ACTION_TABLE.get(action[0])
+        if method is None:
+            method = ACTION_TABLE[action[0]] = getattr(Enemy, action[0])
+        method(self, *action[1])
+
     def update(self, movement=(0,0),tilemap=None):
 
         if self.check_player_pos()[0] > 0:
@@ -481,29 +424,20 @@ class Enemy(physics_entity):
                     self.action_queue.pop(0)
                     self.p1_shoot_count = 0
                     self.attack_combo = random.choice([1,2])
-                    self.action_queue.insert(0,["empty",30])
-                    self.action_queue.insert(1,"combo()")
+                    self.action_queue[0:0] = load_script(PHASE_1_NEXT_COMBO)
                 #normal detection
                 movement = (movement[0] - 0.5 if self.flip else 0.5, movement[1])
                 if self.p1_shoot_count > 2:
                     self.action_queue.pop(0)
                     self.attack_combo = random.choice([1,2])
                     self.p1_shoot_count = 0
-                    self.action_queue.insert(0,["empty",30])
-                    self.action_queue.insert(1,"combo()")
+                    self.action_queue[0:0] = load_script(PHASE_1_NEXT_COMBO)
                 elif abs(self.check_player_pos()[0])<32:
                     self.p1_shoot_count +=1
-                    self.action_queue.insert(0,"prepare_attack()")
-                    self.action_queue.insert(1,["empty",30])
-                    self.action_queue.insert(2,"ground_smash()")
-                    self.action_queue.insert(3,["empty",5])
-                    self.action_queue.insert(4,"screen_shake(20)")
-                    self.action_queue.insert(5,["empty",30])
+                    self.action_queue[0:0] = load_script(PHASE_1_CLOSE)
                 elif abs(self.check_player_pos()[0])<144:
                     self.p1_shoot_count +=1
-                    self.action_queue.insert(0,"normal_shoot()")
-                    self.action_queue.insert(1,["empty",20])
-                    self.action_queue.insert(1,["empty_walk",80])
+                    self.action_queue[0:0] = load_script(PHASE_1_SHOOT)
 
             elif len(self.action_queue)>0 and isinstance(self.action_queue[0],list):
                 if self.action_queue[0][0] == "empty_walk":
@@ -531,7 +465,7 @@ class Enemy(physics_entity):
                         self.action_queue.pop(0)
                 
             elif len(self.action_queue)>0:
-                exec("self."+self.action_queue.pop(0))
+                self.run_action(self.action_queue.pop(0))
             else:
                 pass
 
@@ -556,7 +490,7 @@ class Enemy(physics_entity):
                 if self.action_queue[0][1] == 0:
                     self.action_queue.pop(0) 
             elif len(self.action_queue)>0:
-                exec("self."+self.action_queue.pop(0))
+                self.run_action(self.action_queue.pop(0))
             else:
                 if self.dashing_towards_player:
                     if self.check_collision['down']:
@@ -583,14 +517,14 @@ class Enemy(physics_entity):
                             speed = random.random() *3
                             self.main_game.sparks.append(Flame(self.rect().center,angle,2+random.random()))
                         if random.choice([True,False]):
-                            self.action_queue=[60,"prepare_attack()",40,"dash()",20,"frozen_in_air()",3,"ground_smash()",5,"screen_shake(20)"]
+                            self.action_queue = load_script(PHASE_2_WALL_SMASH)
                         else:
                             self.froze_in_air = False
-                            self.action_queue=[60,"jump()",20,"direction_shoot()",40,"direction_shoot()",80]
+                            self.action_queue = load_script(PHASE_2_WALL_SHOOT)
 
                 else:
                     self.froze_in_air = False
-                    self.action_queue=[60,"jump()",40,"frozen_in_air()",10,"air_8_shoot(1)",30,"air_8_shoot(2)",30,"air_8_shoot(1)",30,"prepare_attack()",["attack_preview()",30],5,["dash_to()",1]]
+                    self.action_queue = load_script(PHASE_2_LOOP)
         elif self.phase == 3:
             if self.main_game.phase_3_start:
                 self.timer_HP -= 1
@@ -618,7 +552,7 @@ class Enemy(physics_entity):
                 if self.action_queue[0][1] == 0:
                     self.action_queue.pop(0) 
             elif len(self.action_queue)>0:
-                exec("self."+self.action_queue.pop(0))
+                self.run_action(self.action_queue.pop(0))
             else:
                 if self.dashing_towards_player:
                     if self.check_collision['down']:
@@ -641,7 +575,7 @@ class Enemy(physics_entity):
                 angle = random.random()*math.pi*2
                 speed = random.random() *5
                 self.main_game.sparks.append(Gold_Flame(self.rect().center,angle,2+random.random()))  
-                self.main_game.particles.append(Particle(self.main_game,'particle',self.rect().center,[math.cos(angle+math.pi)*speed*0.5,math.sin(angle+math.pi)*speed*0.5],frame=random.randint(0,7)))  
+                self.main_game.particles.spawn('particle',self.rect().center,[math.cos(angle+math.pi)*speed*0.5,math.sin(angle+math.pi)*speed*0.5],frame=random.randint(0,7))  
             if self.HP <= 0:
                 return True
         if self.dashing_towards_player or self.furiously_dashing or self.air_dashing or self.dashing:
@@ -698,10 +632,10 @@ class Enemy(physics_entity):
             self.velocity[0] = -5
         self.air_dashing = True
     def land_shoot(self):
-        self.main_game.projectiles.append([[self.rect().centerx-7,self.rect().centery],-1.5,0])
-        self.main_game.projectiles.append([[self.rect().centerx-7,self.rect().centery-7],-1.5,-1.5])
-        self.main_game.projectiles.append([[self.rect().centerx+7,self.rect().centery-7],1.5,1.5])
-        self.main_game.projectiles.append([[self.rect().centerx+7,self.rect().centery],1.5,0])
+        self.main_game.projectiles.shoot((self.rect().centerx-7,self.rect().centery),-1.5)
+        self.main_game.projectiles.shoot((self.rect().centerx-7,self.rect().centery-7),-1.5,-1.5)
+        self.main_game.projectiles.shoot((self.rect().centerx+7,self.rect().centery-7),1.5,1.5)
+        self.main_game.projectiles.shoot((self.rect().centerx+7,self.rect().centery),1.5)
         for i in range(30):
             angle = random.random()*math.pi*2
             self.main_game.sparks.append(Flame(self.rect().center,angle,2+random.random()))  
@@ -711,13 +645,13 @@ class Enemy(physics_entity):
         distance = (self.main_game.player.rect().centerx - self.rect().centerx, self.main_game.player.rect().centery - self.rect().centery)
         if True:  
             if(self.flip and distance[0] < 0): #player is to the left and enemy is facing left
-                self.main_game.projectiles.append([[self.rect().centerx-7,self.rect().centery],-1.5,0])
+                self.main_game.projectiles.shoot((self.rect().centerx-7,self.rect().centery),-1.5)
                 for i in range(4):
-                    self.main_game.sparks.append(Spark(self.main_game.projectiles[-1][0],random.random()+math.pi-0.5,2+random.random()))
+                    self.main_game.sparks.append(Spark((self.rect().centerx-7,self.rect().centery),random.random()+math.pi-0.5,2+random.random()))
             elif(not self.flip and distance[0] > 0): #player is to the right and enemy is facing right
-                self.main_game.projectiles.append([[self.rect().centerx+7,self.rect().centery],1.5,0])
+                self.main_game.projectiles.shoot((self.rect().centerx+7,self.rect().centery),1.5)
                 for i in range(4):
-                    self.main_game.sparks.append(Spark(self.main_game.projectiles[-1][0],random.random()-0.5,2+random.random()+2))
+                    self.main_game.sparks.append(Spark((self.rect().centerx+7,self.rect().centery),random.random()-0.5,2+random.random()+2))
             
                         
     def jump(self):
@@ -732,13 +666,13 @@ class Enemy(physics_entity):
 
     def combo(self):
         if self.attack_combo == 1:
-            self.action_queue = ["jump()",["empty",30],"frozen_in_air()","air_dash()",["aim_drop",30],"drop_attack()",["land_detect",60],"land_shoot()",["empty",30],["empty_walk",60],300]
+            self.action_queue = load_script(PHASE_1_COMBO_1)
         elif self.attack_combo == 2:
             if random.random() > 0.7:
-                self.action_queue = ["prepare_attack()",["empty",55],"dash()",["empty",10],"frozen_in_air()","normal_shoot()",["empty",20],"normal_shoot()",["empty",20],"normal_shoot()",["empty",20],"normal_shoot()",["empty",140],["empty_walk",60],300]
+                self.action_queue = load_script(PHASE_1_COMBO_2)
             else:   
                 self.attack_combo = 1
-                self.action_queue = ["prepare_attack()",["empty",55],"dash()",["empty",10],"frozen_in_air()","normal_shoot()",["empty",20],"normal_shoot()",["empty",20],"normal_shoot()",["empty",20],"normal_shoot()",["empty",100],"combo()"]
+                self.action_queue = load_script(PHASE_1_COMBO_2_AGAIN)
 
     def frozen_in_air(self):
         self.velocity = [0,0]
@@ -757,64 +691,61 @@ class Enemy(physics_entity):
         if variant == 1:
             for i in range(8):
                 angle = i * math.pi / 4
-                self.main_game.special_projectiles.append(Diagnal_Projectile(self.rect().center,[math.cos(angle),math.sin(angle)],1.5,"projectile"))
+                self.main_game.projectiles.spawn(self.rect().center,[math.cos(angle),math.sin(angle)],1.5,"projectile")
                 for i in range(4):
-                    self.main_game.sparks.append(Spark(self.main_game.special_projectiles[-1].pos,random.random()*math.pi*2,2+random.random()))
+                    self.main_game.sparks.append(Spark(self.rect().center,random.random()*math.pi*2,2+random.random()))
         elif variant == 2: #rotate 22.5 degree
             for i in range(8):
                 angle = i * math.pi / 4 + math.pi/8
-                self.main_game.special_projectiles.append(Diagnal_Projectile(self.rect().center,[math.cos(angle),math.sin(angle)],1.5,"projectile"))
+                self.main_game.projectiles.spawn(self.rect().center,[math.cos(angle),math.sin(angle)],1.5,"projectile")
                 for i in range(4):
-                    self.main_game.sparks.append(Spark(self.main_game.special_projectiles[-1].pos,random.random()*math.pi*2,2+random.random()))
+                    self.main_game.sparks.append(Spark(self.rect().center,random.random()*math.pi*2,2+random.random()))
     
     def ground_8_shoot(self):
         if self.phase == 2:
             for i in range(16):
                 angle = i * math.pi / 8
-                self.main_game.special_projectiles.append(Diagnal_Projectile((self.rect().centerx,self.rect().centery-7),[math.cos(angle),math.sin(angle)],1.5,"projectile"))
+                self.main_game.projectiles.spawn((self.rect().centerx,self.rect().centery-7),[math.cos(angle),math.sin(angle)],1.5,"projectile")
             x_pos = self.check_player_pos()[0]
-            self.action_queue = [120,"dash_back("+str(x_pos)+")",15,"frozen_in_air()",20]
+            self.action_queue = [120,("dash_back",(x_pos,))] + load_script(PHASE_2_LANDED)
             if random.choice([True,False]):
-                self.action_queue.append("diag_explode_shoot()")
-                self.action_queue.append(40)
+                self.action_queue += load_script(PHASE_2_LANDED_EXPLODE)
             else:
-                self.action_queue.append("prepare_attack()")
-                self.action_queue.append(40)
-                self.action_queue.append("furiously_dash()")
+                self.action_queue += load_script(PHASE_2_LANDED_DASH)
         else:
             for i in range(16):
                 angle = i * math.pi / 8
-                self.main_game.special_projectiles.append(Special_Projectile((self.rect().centerx,self.rect().centery-7),[math.cos(angle),math.sin(angle)],1.5,"projectile",max_timer=30,type="small_explode",main_game=self.main_game))
-            self.action_queue=[60,"jump()",20,"frozen_in_air()",10,"prepare_attack(1)",60,["spell_card()",80],90,"air_dash()",25,"frozen_in_air()",10,["spell_card()",80],90,["spread()",15],90,"prepare_attack()",["attack_preview()",30],5,["dash_to()",1]]
+                self.main_game.projectiles.spawn((self.rect().centerx,self.rect().centery-7),[math.cos(angle),math.sin(angle)],1.5,"projectile",max_timer=30,kind=SMALL_EXPLODE)
+            self.action_queue = load_script(PHASE_3_LOOP)
             self.set_action('jump')
 
     def diag_explode_shoot(self):
         relavtive_pos = self.check_player_pos()
         relavtive_pos[1] = -60
-        self.main_game.special_projectiles.append(Special_Projectile(self.rect().center,[relavtive_pos[0],relavtive_pos[1]],3,"projectile",max_timer=50,type="explode_shoot",main_game=self.main_game))
+        self.main_game.projectiles.spawn(self.rect().center,[relavtive_pos[0],relavtive_pos[1]],3,"projectile",max_timer=50,kind=EXPLODE)
         relavtive_pos[1] = -40
-        self.main_game.special_projectiles.append(Special_Projectile(self.rect().center,[relavtive_pos[0],relavtive_pos[1]],3.5,"projectile",max_timer=50,type="explode_shoot",main_game=self.main_game))
+        self.main_game.projectiles.spawn(self.rect().center,[relavtive_pos[0],relavtive_pos[1]],3.5,"projectile",max_timer=50,kind=EXPLODE)
         relavtive_pos[1] = -20
-        self.main_game.special_projectiles.append(Special_Projectile(self.rect().center,[relavtive_pos[0],relavtive_pos[1]],4,"projectile",max_timer=50,type="explode_shoot",main_game=self.main_game))
+        self.main_game.projectiles.spawn(self.rect().center,[relavtive_pos[0],relavtive_pos[1]],4,"projectile",max_timer=50,kind=EXPLODE)
         if True:  
             if(self.flip): #player is to the left and enemy is facing left
                 for i in range(4):
-                    self.main_game.sparks.append(Flame(self.main_game.special_projectiles[-1].pos,random.random()+math.pi-0.5,2+random.random()))
+                    self.main_game.sparks.append(Flame(self.rect().center,random.random()+math.pi-0.5,2+random.random()))
             else: #player is to the right and enemy is facing right
                 for i in range(4):
-                    self.main_game.sparks.append(Flame(self.main_game.special_projectiles[-1].pos,random.random()-0.5,2+random.random()+2))    
+                    self.main_game.sparks.append(Flame(self.rect().center,random.random()-0.5,2+random.random()+2))    
 
         if random.choice([True,False]):
-            self.action_queue=[80,"prepare_attack()",40,"dash()",20,"frozen_in_air()",10,"ground_smash()",5,"screen_shake(20)"]
+            self.action_queue = load_script(PHASE_2_EXPLODE_SMASH)
         else:
             self.froze_in_air = False
-            self.action_queue=[80,"jump()",20,"direction_shoot()",40,"direction_shoot()",80]
+            self.action_queue = load_script(PHASE_2_EXPLODE_SHOOT)
     
     def direction_shoot(self,direction=[0,0]):
         #boss will shoot a projectile towards player's direction
         if direction==[0,0]:
             direction = self.check_player_pos()
-        self.main_game.special_projectiles.append(Special_Projectile(self.rect().center,direction,2,"projectile",max_timer=30,type="explode_shoot",main_game=self.main_game))
+        self.main_game.projectiles.spawn(self.rect().center,direction,2,"projectile",max_timer=30,kind=EXPLODE)
         for i in range(4):
             self.main_game.sparks.append(Spark(self.position,random.random()-0.5,2+random.random()+2))
 
@@ -840,7 +771,7 @@ class Enemy(physics_entity):
         #draw a red line from pos_a to pos_b
         if pos_a == (0,0) and pos_b == (0,0):
             pos_a,pos_b =(self.rect().centerx,self.rect().centery),(self.main_game.player.rect().centerx,self.main_game.player.rect().centery+7)
-        pygame.draw.line(self.main_game.display,(255,0,0),(pos_a[0]-self.main_game.render_camera[0],pos_a[1]-self.main_game.render_camera[1]),(pos_b[0]-self.main_game.render_camera[0],pos_b[1]-self.main_game.render_camera[1]),1)
+        self.main_game.preview_lines.append((pos_a,pos_b)) #drawn by main_game.render
         return pos_a,pos_b
 
     def dash_towards_player(self,end_pos=(0,0)):
@@ -866,25 +797,25 @@ class Enemy(physics_entity):
             if self.timer_HP > 1500:
                 for i in range(4):
                     angle = math.pi*2/32*(97-count_down_timer)+math.pi*i/2
-                    self.main_game.special_projectiles.append(Special_Projectile(self.rect().center,[math.cos(angle),math.sin(angle)],3,"projectile_"+str(count_down_timer%7+1),max_timer=40,type="two_stage_spin",main_game=self.main_game))
+                    self.main_game.projectiles.spawn(self.rect().center,[math.cos(angle),math.sin(angle)],3,"projectile_"+str(count_down_timer%7+1),max_timer=40,kind=SPIN)
             elif self.timer_HP > 800:
                 for i in range(6):
                     angle = math.pi*2/36*(97-count_down_timer)+math.pi*i/3
-                    self.main_game.special_projectiles.append(Special_Projectile(self.rect().center,[math.cos(angle),math.sin(angle)],3,"projectile_"+str(count_down_timer%7+1),max_timer=40,type="two_stage_spin",main_game=self.main_game))
+                    self.main_game.projectiles.spawn(self.rect().center,[math.cos(angle),math.sin(angle)],3,"projectile_"+str(count_down_timer%7+1),max_timer=40,kind=SPIN)
             else:
                 for i in range(6):
                     angle = math.pi*2/32*(97-count_down_timer)+math.pi*i/3
-                    self.main_game.special_projectiles.append(Special_Projectile(self.rect().center,[math.cos(angle),math.sin(angle)],3,"projectile_"+str(count_down_timer%7+1),max_timer=40,type="two_stage_spin",main_game=self.main_game))
+                    self.main_game.projectiles.spawn(self.rect().center,[math.cos(angle),math.sin(angle)],3,"projectile_"+str(count_down_timer%7+1),max_timer=40,kind=SPIN)
                 
         else:
             #shoot a completely random direction projectile
             for i in range(2):
-                self.main_game.special_projectiles.append(Special_Projectile(self.rect().center,[random.random()*2-1,random.random()*2-1],1,"projectile_"+str(count_down_timer%7+1),max_timer=70,type="two_stage_",main_game=self.main_game))
+                self.main_game.projectiles.spawn(self.rect().center,[random.random()*2-1,random.random()*2-1],1,"projectile_"+str(count_down_timer%7+1),max_timer=70)
 
     def spell_card_spread(self):
         for i in range(3):
-            self.main_game.special_projectiles.append(Special_Projectile(self.rect().center,[random.random()*2-1,random.random()*2-1],1,"projectile",max_timer=30,type="small_explode",main_game=self.main_game))
-            #self.main_game.special_projectiles.append(Special_Projectile(self.rect().center,[random.random()*2-1,random.random()*2-1],1,"fireball",max_timer=30,type="small_explode",main_game=self.main_game))
+            self.main_game.projectiles.spawn(self.rect().center,[random.random()*2-1,random.random()*2-1],1,"projectile",max_timer=30,kind=SMALL_EXPLODE)
+            #self.main_game.projectiles.spawn(self.rect().center,[random.random()*2-1,random.random()*2-1],1,"fireball",max_timer=30,kind=SMALL_EXPLODE)
 
     def cut_in(self):
         self.main_game.cutscene_timer = 120
@@ -0,0 +1,78 @@
+import random
+
+#one frame of player input, packed into bits and fed to main_game.step
+LEFT = 1
+RIGHT = 2
+JUMP = 4
+DASH = 8
+ATTACK = 16
+CHARGE = 32
+PAD_JUMP = 64 #joystick presses get buffered for a few frames if they fail
+PAD_DASH = 128
+PAD_ATTACK = 256
+JUMP_RELEASE = 512
+DASH_RELEASE = 1024
+ATTACK_RELEASE = 2048
+CONFIRM = 4096 #skip to the next line of a cutscene
+RETRY = 8192 #retry picked in the pause menu
+PAD_CONFIRM = 16384 #CONFIRM from the joystick, which also moves order_list on (the keyboard only moves text_list)
+HELD = LEFT | RIGHT #bits that stay set while a key is down, the rest are single presses
+
+class Soak_Bot:
+    #stand-in player for headless soak tests, walks at the closest enemy and swings/dodges at random
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        self.hold = 0
+        self.movement = 0
+
+    def __call__(self, game):
+        if game.in_cutscene:
+            return CONFIRM if self.rng.random() < 0.1 else 0
+        inputs = 0
+        targets = [enemy for enemy in game.enemy_spawners if enemy.type != 'beam']
+        if self.hold > 0:
+            self.hold -= 1
+        elif targets:
+            distance = targets[0].rect().centerx - game.player.rect().centerx
+            if abs(distance) > 20:
+                self.movement = RIGHT if distance > 0 else LEFT
+            else:
+                self.movement = 0
+            self.hold = self.rng.randint(5,30)
+        else:
+            self.movement = RIGHT
+        inputs |= self.movement
+        roll = self.rng.random()
+        if roll < 0.08:
+            inputs |= ATTACK
+        elif roll < 0.11:
+            inputs |= JUMP
+        elif roll < 0.13:
+            inputs |= DASH
+        return inputs
+
+class Fight_Bot:
+    #stand-in player that plays to win: stays a swing away from the boss, faces it, swings off cooldown and jumps at it when it is above
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+
+    def __call__(self, game):
+        if game.in_cutscene:
+            return CONFIRM
+        targets = [enemy for enemy in game.enemy_spawners if enemy.type != 'beam']
+        if not targets:
+            return RIGHT
+        player = game.player.rect()
+        target = targets[0].rect()
+        distance = target.centerx - player.centerx
+        inputs = 0
+        #the swing hits 8 to 36 px in front of the player's centre and from its centre down
+        if abs(distance) > 24 or (distance > 0) == game.player.flip:
+            inputs |= RIGHT if distance > 0 else LEFT
+        if target.bottom < player.centery:
+            inputs |= JUMP
+        elif abs(distance) < 36 and not game.player.attack_cool_down:
+            inputs |= ATTACK
+        elif self.rng.random() < 0.02:
+            inputs |= JUMP
+        return inputs
@@ -0,0 +1,40 @@
+import pygame
+
+class Outline_Pass:
+    #dark outline around everything drawn on main_game.display, blitted onto the layer below it
+    #off by default (--outline), when off nothing here runs
+    #the silhouette is kept between frames and only rebuilt where something moved,
+    #the whole of it is rebuilt when the camera moves or after reset()
+    def __init__(self, size, color=(0,0,0,180), offsets=((-1,0),(1,0),(0,1),(0,-1))):
+        self.rect = pygame.Rect((0,0), size)
+        self.color = color
+        self.offsets = offsets
+        self.silhouette = pygame.Surface(size, pygame.SRCALPHA)
+        self.enabled = False
+        self.camera = None
+        self.last_dirty = None
+
+    def reset(self):
+        self.camera = None
+        self.last_dirty = None
+
+    def update(self, display, camera, dirty):
+        #dirty: rects of display that changed since last frame apart from the camera scrolling
+        if self.camera != tuple(camera):
+            self.camera = tuple(camera)
+            area = self.rect
+        else:
+            area = None
+            for rect in dirty + ([self.last_dirty] if self.last_dirty else []):
+                area = rect.copy() if area is None else area.union(rect)
+            if area is None:
+                return
+            area = area.clip(self.rect) #things that left the screen still have to be wiped
+        self.last_dirty = dirty[0].unionall(dirty[1:]) if dirty else None
+        if area.width and area.height:
+            mask = pygame.mask.from_surface(display.subsurface(area))
+            mask.to_surface(self.silhouette, setcolor=self.color, unsetcolor=(0,0,0,0), dest=area.topleft)
+
+    def render(self, surface):
+        for offset in self.offsets:
+            surface.blit(self.silhouette, offset)
@@ -0,0 +1,37 @@
+import pygame
+
+class Overlay:
+    #full screen layers drawn on top of the game (dimming, fades, brightness, the iris transition)
+    #they are made once, a dim is an opaque black layer blitted with a surface alpha
+    #which gives the same pixels as a (0,0,0,alpha) SRCALPHA layer without filling one every frame
+    def __init__(self, size):
+        self.dim_layer = pygame.Surface(size)
+        self.iris_layer = None
+        self.iris_shape = None
+        self.darkness = 0 #alpha of the brightness setting, 0 is full brightness
+
+    def dim(self, surface, *alphas):
+        #one blit that darkens as much as one black layer for each alpha in turn
+        keep = 1
+        for alpha in alphas:
+            keep *= (255-alpha)/255
+        alpha = round(255*(1-keep))
+        if alpha:
+            self.dim_layer.set_alpha(alpha)
+            surface.blit(self.dim_layer, (0, 0))
+
+    def finish(self, surface, *alphas):
+        #last blit of a frame: the brightness setting, with any dims right before it folded in
+        self.dim(surface, *alphas, self.darkness)
+
+    def iris(self, surface, center, radius):
+        #black everywhere outside the circle, only redrawn when the circle changes
+        if self.iris_layer is None or self.iris_layer.get_size() != surface.get_size():
+            self.iris_layer = pygame.Surface(surface.get_size())
+            self.iris_layer.set_colorkey((255,255,255))
+            self.iris_shape = None
+        if (center, radius) != self.iris_shape:
+            self.iris_layer.fill((0,0,0))
+            pygame.draw.circle(self.iris_layer, (255,255,255), center, radius)
+            self.iris_shape = (center, radius)
+        surface.blit(self.iris_layer, (0, 0))
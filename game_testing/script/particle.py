@@ -1,14 +1,32 @@
-import pygame
+
+import math
+import itertools
+from script.utils import Animation, update_animations
+from script.container import Pool_Counters
 
 class Particle:
+    __slots__ = ("game", "flip", "p_type", "pos", "velocity", "animation")
     def __init__(self, game, p_type,pos,velocity=[0,0],frame=0,flip=False):
         self.game = game
+        self.pos = [0,0]
+        self.velocity = [0,0]
+        self.animation = None
+        self.reset(p_type,pos,velocity,frame,flip)
+
+    def reset(self, p_type,pos,velocity=[0,0],frame=0,flip=False):
+        #make a used particle look like a new one, the lists and the Animation are kept and refilled
+        clip = self.game.assets['particle/'+p_type]
+        if self.animation is None:
+            self.animation = Animation(clip, frame)
+        else:
+            self.animation.clip = clip
+            self.animation.frame = frame
+            self.animation.done = False
         self.flip = flip    
         self.p_type = p_type
-        self.pos = list(pos)
-        self.velocity = list(velocity)
-        self.animation = self.game.assets['particle/'+p_type].copy()
-        self.animation.frame = frame
+        self.pos[0], self.pos[1] = pos
+        self.velocity[0], self.velocity[1] = velocity
+
     def update(self):
         kill = False
         if self.animation.done:
@@ -16,14 +34,73 @@ class Particle:
         self.pos[0] += self.velocity[0]
         self.pos[1] += self.velocity[1]
         self.animation.update()     
+        if self.p_type == 'fire':
+            self.pos[0] += math.sin(self.animation.frame*0.035)*0.3
 
         return kill 
     
     def render(self, surface, offset = [0,0]):  
-        img = self.animation.img() if not self.flip else pygame.transform.flip(self.animation.img(), True, False)
+        img = self.game.transforms.get(self.animation.img(), self.flip)
         surface.blit(img, (self.pos[0]-offset[0]-img.get_width()//2, self.pos[1]-offset[1]-img.get_height()//2))   
 
     def render_new(self, surface, offset = [0,0]):  
-        img = self.animation.img() if not self.flip else pygame.transform.flip(self.animation.img(), True, False)
+        img = self.game.transforms.get(self.animation.img(), self.flip)
         #img = pygame.transform.scale(img, (int(img.get_width()*2), int(img.get_height()*2)))
-        surface.blit(img, (2*int(self.pos[0]-offset[0]-img.get_width()//2), 2*int(self.pos[1]-offset[1]-img.get_height()//2)))
\ No newline at end of file
+        surface.blit(img, (2*int(self.pos[0]-offset[0]-img.get_width()//2), 2*int(self.pos[1]-offset[1]-img.get_height()//2)))
+
+class Particle_Pool(Pool_Counters):
+    #every particle in the level, finished ones are kept and handed out again by spawn()
+    #removal swaps the last live particle into the hole, so the live list is unordered
+    def __init__(self, game):
+        self.game = game
+        self.live = []
+        self.dying = [] #finished last step, moved and drawn once more like the old particle list did, then freed
+        self.free = []
+        self.init_counters()
+
+    def spawn(self, p_type, pos, velocity=[0,0], frame=0, flip=False):
+        reused = bool(self.free)
+        if reused:
+            particle = self.free.pop()
+            particle.reset(p_type, pos, velocity, frame, flip)
+        else:
+            particle = Particle(self.game, p_type, pos, velocity, frame, flip)
+        self.live.append(particle)
+        self.counted(reused)
+        return particle
+
+    def update(self):
+        #Particle.update for every particle, with the animations stepped in one batch
+        #a particle whose animation finished last step moves to dying, backwards so the one swapped into a hole is checked too
+        live = self.live
+        dying = self.dying
+        self.free.extend(dying)
+        dying.clear()
+        for i in range(len(live)-1, -1, -1):
+            if live[i].animation.done:
+                dying.append(live[i])
+                live[i] = live[-1]
+                live.pop()
+        update_animations([particle.animation for particle in live]) #a finished animation stays on its last frame anyway
+        for particle in itertools.chain(live, dying):
+            pos = particle.pos
+            pos[0] += particle.velocity[0]
+            pos[1] += particle.velocity[1]
+            if particle.p_type == 'fire':
+                pos[0] += math.sin(particle.animation.frame*0.035)*0.3
+
+    def clear(self):
+        self.free.extend(self.live)
+        self.free.extend(self.dying)
+        self.live.clear()
+        self.dying.clear()
+
+    def __len__(self):
+        return len(self.live) #the dying ones are already gone as far as the game is concerned
+
+    def __iter__(self):
+        return itertools.chain(self.live, self.dying)
+
+    @property
+    def capacity(self):
+        return len(self.live) + len(self.dying) + len(self.free)
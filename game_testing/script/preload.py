@@ -0,0 +1,61 @@
+import io
+import os
+import threading
+import time
+
+class Level_Preloader:
+    #reads the next level file and its music on a worker thread while the win animation plays
+    #the worker only fills in its own fields, the main thread picks them up after join() so nothing is shared half done
+    def __init__(self, read_level):
+        self.read_level = read_level #level -> what load_level keeps in level_snapshots, also called on the worker
+        self.thread = None
+        self.level = None
+        self.snapshot = None
+        self.music_path = None
+        self.music = None #bytes of the music file
+        self.error = None
+        self.waited = 0 #seconds the main thread spent in join() since the last transition was logged
+
+    def start(self, level, read=True, music_path=None):
+        if self.thread is not None and self.level == level:
+            return
+        self.wait()
+        self.level = level
+        self.snapshot = self.music = self.error = None
+        self.music_path = music_path
+        self.thread = threading.Thread(target=self.work, args=(level, read, music_path), daemon=True)
+        self.thread.start()
+
+    def work(self, level, read, music_path):
+        try:
+            if read:
+                self.snapshot = self.read_level(level)
+            if music_path and os.path.exists(music_path):
+                with open(music_path, 'rb') as f:
+                    self.music = f.read()
+        except Exception as error:
+            #load_level reads the level again on the main thread and gets the error there
+            self.error = error
+
+    def wait(self):
+        if self.thread is not None:
+            start = time.perf_counter()
+            self.thread.join()
+            self.waited += time.perf_counter() - start
+            self.thread = None
+
+    def take(self, level):
+        #the preloaded level, None if it was not preloaded or failed
+        if self.level != level:
+            return None
+        self.wait()
+        snapshot, self.snapshot = self.snapshot, None
+        return snapshot
+
+    def take_music(self, path):
+        #the music file as a file object for pygame.mixer.music.load, None if it was not preloaded
+        if self.music_path != path:
+            return None
+        self.wait()
+        music, self.music, self.music_path = self.music, None, None
+        return io.BytesIO(music) if music is not None else None
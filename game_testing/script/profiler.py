@@ -0,0 +1,139 @@
+import csv
+import json
+import time
+from collections import deque
+import pygame
+
+class Null_Scope:
+    def __enter__(self):
+        return self
+    def __exit__(self, *args):
+        return False
+
+NULL_SCOPE = Null_Scope()
+
+class Scope:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    def __exit__(self, *args):
+        self.profiler.add(self.name, time.perf_counter() - self.start)
+        return False
+
+class Profiler:
+    #per-frame timings of each stage of step()/render() plus counts of what is alive
+    #off unless the overlay is up (F3) or an export file is open, when off every call returns straight away
+    #lap(name) times everything since the previous lap()/start(), scope(name) times a with block
+    def __init__(self, columns=(), window=300):
+        self.columns = list(columns) #every scope and count name, the .csv header
+        self.window = window #frames kept for the percentiles
+        self.enabled = False
+        self.overlay = False
+        self.history = {} #name -> deque of ms, one entry per frame
+        self.frame = {}
+        self.counts = {}
+        self.last = 0
+        self.frame_start = None
+        self.frames = 0
+        self.export_file = None
+        self.writer = None
+        self.text = []
+        self.images = None #self.text rendered, redone every 30 frames
+        self.font = None
+
+    def toggle_overlay(self):
+        self.overlay = not self.overlay
+        self.enabled = self.overlay or self.export_file is not None
+
+    def export(self, path):
+        #one row per frame, .csv has the columns given to Profiler(), .jsonl keeps everything
+        self.export_file = open(path, 'w', newline='')
+        self.enabled = True
+
+    def close(self):
+        if self.export_file:
+            self.export_file.close()
+            self.export_file = None
+            self.writer = None
+        self.enabled = self.overlay
+
+    def start(self):
+        if self.enabled:
+            self.last = time.perf_counter()
+
+    def lap(self, name):
+        if self.enabled:
+            now = time.perf_counter()
+            self.frame[name] = self.frame.get(name, 0) + now - self.last
+            self.last = now
+
+    def scope(self, name):
+        if not self.enabled:
+            return NULL_SCOPE
+        return Scope(self, name)
+
+    def add(self, name, seconds):
+        self.frame[name] = self.frame.get(name, 0) + seconds
+
+    def count(self, name, value):
+        if self.enabled:
+            self.counts[name] = value
+
+    def end_frame(self):
+        if not self.enabled:
+            self.frame_start = None
+            return
+        now = time.perf_counter()
+        self.frame["frame"] = now - self.frame_start if self.frame_start is not None else 0
+        self.frame_start = now
+        row = {name: seconds*1000 for name, seconds in self.frame.items()}
+        for name in set(self.history) | set(row):
+            if name not in self.history:
+                self.history[name] = deque(maxlen=self.window)
+            self.history[name].append(row.get(name, 0))
+        self.frames += 1
+        if self.export_file:
+            self.write_row(row)
+        if self.overlay and self.frames % 30 == 0:
+            self.text = self.summary_lines()
+            self.images = None
+        self.frame = {}
+
+    def write_row(self, row):
+        row = dict(row, index=self.frames, **self.counts)
+        if self.export_file.name.endswith(".csv"):
+            if self.writer is None:
+                self.writer = csv.DictWriter(self.export_file, ["index", "frame"] + self.columns, restval=0, extrasaction="ignore")
+                self.writer.writeheader()
+            self.writer.writerow(row)
+        else:
+            self.export_file.write(json.dumps(row) + "\n")
+
+    def percentiles(self, name):
+        values = sorted(self.history.get(name, ()))
+        if not values:
+            return (0, 0, 0)
+        return tuple(values[min(len(values)-1, int(len(values)*p))] for p in (0.5, 0.95, 0.99))
+
+    def summary_lines(self):
+        lines = ["%-20s %6s %6s %6s" % ("ms", "p50", "p95", "p99")]
+        names = sorted(self.history, key=lambda name: (name != "frame", name))
+        for name in names:
+            lines.append("%-20s %6.2f %6.2f %6.2f" % ((name,) + self.percentiles(name)))
+        lines.append("  ".join("%s %s" % (name, value) for name, value in self.counts.items()))
+        return lines
+
+    def render(self, surface):
+        if not self.overlay:
+            return
+        if self.images is None:
+            if self.font is None:
+                self.font = pygame.font.Font(None, 22)
+            self.images = [self.font.render(line, True, (255,255,255), (0,0,0)) for line in self.text]
+        y = 4
+        for img in self.images:
+            surface.blit(img, (4, y))
+            y += img.get_height()
@@ -0,0 +1,229 @@
+import math
+import random
+import numpy as np
+import pygame
+from script.container import Pool_Counters
+from script.spark import Spark, Flame, Gold_Flame, Ice_Flame, Flexible_Spark
+
+#behaviour of a bullet, stored per slot in Projectile_Pool.kind
+PLAIN = 0 #horizontal boss shot, parrying it resets the attack cool down
+NORMAL = 1 #straight line in any direction
+SPIN = 2 #slows down until max_timer, then speeds back up
+EXPLODE = 3 #splits into 12 bullets at max_timer
+SMALL_EXPLODE = 4 #splits into 6 bullets at a random angle at max_timer
+
+SPRITES = ['projectile'] + ['projectile_'+str(i) for i in range(1,8)]
+SPRITE_IDS = {name: i for i, name in enumerate(SPRITES)}
+
+#spark that matches the color of each sprite when a bullet hits a wall
+HIT_SPARKS = [(Spark, None), (Flame, None), (Flexible_Spark, (255,127,0)), (Gold_Flame, None),
+              (Flexible_Spark, (0,255,0)), (Ice_Flame, None), (Flexible_Spark, (148,0,211)), (Flexible_Spark, (255,0,255))]
+
+MAX_LIFETIME = 360
+HALF_BOX = 4 #bullets are an 8x8 box for melee parries and a point for the player
+
+class Projectile_Pool(Pool_Counters):
+    #every bullet on screen lives in one slot of these arrays, dead slots go back to the free list
+    def __init__(self, main_game, capacity=512):
+        self.main_game = main_game
+        self.capacity = 0
+        self.pos = np.zeros((0,2))
+        self.prev_pos = np.zeros((0,2)) #pos before the last update, render() draws in between when main_game.alpha < 1
+        self.direction = np.zeros((0,2))
+        self.length = np.zeros(0) #length of direction, kept so the step matches dir*speed/length exactly
+        self.speed = np.zeros(0)
+        self.timer = np.zeros(0)
+        self.max_timer = np.zeros(0)
+        self.sprite = np.zeros(0, dtype=np.int8)
+        self.kind = np.zeros(0, dtype=np.int8)
+        self.can_reverse = np.zeros(0, dtype=bool)
+        self.alive = np.zeros(0, dtype=bool)
+        self.used = np.zeros(0, dtype=bool) #slot has held a bullet before
+        self.dying = np.zeros(0, dtype=bool) #killed this step, drawn once more like the old bullet loop did, freed by the next update()
+        self.free_slots = []
+        self.dead_slots = []
+        self.count = 0
+        self.init_counters()
+        self.grow(capacity)
+
+    def grow(self, capacity):
+        extra = capacity - self.capacity
+        self.pos = np.concatenate((self.pos, np.zeros((extra,2))))
+        self.prev_pos = np.concatenate((self.prev_pos, np.zeros((extra,2))))
+        self.direction = np.concatenate((self.direction, np.zeros((extra,2))))
+        self.length = np.concatenate((self.length, np.ones(extra)))
+        self.speed = np.concatenate((self.speed, np.zeros(extra)))
+        self.timer = np.concatenate((self.timer, np.zeros(extra)))
+        self.max_timer = np.concatenate((self.max_timer, np.zeros(extra)))
+        self.sprite = np.concatenate((self.sprite, np.zeros(extra, dtype=np.int8)))
+        self.kind = np.concatenate((self.kind, np.zeros(extra, dtype=np.int8)))
+        self.can_reverse = np.concatenate((self.can_reverse, np.zeros(extra, dtype=bool)))
+        self.alive = np.concatenate((self.alive, np.zeros(extra, dtype=bool)))
+        self.used = np.concatenate((self.used, np.zeros(extra, dtype=bool)))
+        self.dying = np.concatenate((self.dying, np.zeros(extra, dtype=bool)))
+        #pop() hands out the lowest slots first
+        self.free_slots = list(range(capacity-1, self.capacity-1, -1)) + self.free_slots
+        self.capacity = capacity
+
+    def add(self, pos, direction, length, speed, sprite, kind, max_timer, reverse, timer):
+        if not self.free_slots:
+            self.grow(self.capacity*2)
+        slot = self.free_slots.pop()
+        self.pos[slot] = pos
+        self.prev_pos[slot] = pos
+        self.direction[slot] = direction
+        self.length[slot] = length
+        self.speed[slot] = speed
+        self.timer[slot] = timer
+        self.max_timer[slot] = max_timer
+        self.sprite[slot] = SPRITE_IDS[sprite]
+        self.kind[slot] = kind
+        self.can_reverse[slot] = reverse
+        self.alive[slot] = True
+        self.count += 1
+        self.counted(self.used[slot])
+        self.used[slot] = True
+        return slot
+
+    def shoot(self, pos, dx, timer=0):
+        #plain horizontal shot moving dx pixels a frame
+        return self.add(pos, (dx,0), 1, 1, 'projectile', PLAIN, 0, False, timer)
+
+    def spawn(self, pos, direction, speed=1, sprite='projectile', kind=NORMAL, max_timer=180, reverse=False):
+        length = math.sqrt(direction[0]**2 + direction[1]**2)
+        return self.add(pos, direction, length, speed, sprite, kind, max_timer, reverse, 0)
+
+    def kill(self, slot):
+        #the slot is drawn once more by render() and only handed out again by the next update()
+        if self.alive[slot]:
+            self.alive[slot] = False
+            self.dying[slot] = True
+            self.count -= 1
+            self.dead_slots.append(slot)
+
+    def release(self):
+        self.dying[self.dead_slots] = False
+        self.free_slots.extend(reversed(self.dead_slots))
+        self.dead_slots = []
+
+    def clear(self):
+        self.alive[:] = False
+        self.dying[:] = False
+        self.count = 0
+        self.dead_slots = []
+        self.free_slots = list(range(self.capacity-1, -1, -1))
+
+    def live(self):
+        return np.flatnonzero(self.alive)
+
+    def drawn(self):
+        #the live bullets and the ones killed since the last update()
+        if not self.dead_slots:
+            return self.live()
+        return np.flatnonzero(self.alive | self.dying)
+
+    def update(self, tilemap):
+        self.release()
+        if not self.count:
+            return
+        live = self.live()
+        kind = self.kind[live]
+        timer = self.timer[live]
+        max_timer = self.max_timer[live]
+
+        slowing = live[(kind == SPIN) & (timer < max_timer)]
+        self.speed[slowing] *= 0.9
+        at_max = (timer == max_timer)
+        self.speed[live[at_max & (kind == SPIN)]] = 3
+        #bullets spawned by an explosion take slots that are not in live, so they start moving next frame
+        for slot in live[at_max & (kind == EXPLODE)]:
+            self.explode(slot, 12, 0, 1.5)
+        for slot in live[at_max & (kind == SMALL_EXPLODE)]:
+            self.explode(slot, 6, random.random()*math.pi*2, 3)
+
+        #a bullet that just exploded still moves this step so render() draws it where the old loop did
+        self.prev_pos[live] = self.pos[live]
+        self.pos[live] += self.direction[live] * self.speed[live][:,None] / self.length[live][:,None]
+        live = live[self.alive[live]]
+        self.timer[live] += 1
+
+        solid = tilemap.solid_check_many(self.pos[live])
+        for slot in live[solid]:
+            if self.can_reverse[slot]:
+                self.direction[slot] = -self.direction[slot]
+                self.can_reverse[slot] = False
+            else:
+                self.kill(slot)
+            self.hit_sparks(slot)
+        for slot in live[~solid & (self.timer[live] > MAX_LIFETIME)]:
+            self.kill(slot)
+
+    def explode(self, slot, count, start_angle, speed):
+        pos = self.position(slot)
+        self.kill(slot)
+        for i in range(count):
+            angle = i * math.pi / (count//2) + start_angle
+            self.spawn(pos, (math.cos(angle),math.sin(angle)), speed, 'projectile_'+str(random.randint(1,7)))
+            for i in range(4):
+                self.main_game.sparks.append(Ice_Flame(pos,random.random()*math.pi*2,1+random.random()))
+
+    def hit_sparks(self, slot):
+        pos = self.position(slot)
+        spark, color = HIT_SPARKS[self.sprite[slot]] if self.kind[slot] != PLAIN else (Spark, None)
+        for i in range(4):
+            if color:
+                self.main_game.sparks.append(spark(pos,random.random()*math.pi*2,2+random.random(),color))
+            else:
+                self.main_game.sparks.append(spark(pos,random.random()*math.pi*2,2+random.random()))
+
+    def collide_point(self, rect):
+        #slots whose position is inside rect, positions truncate like Rect.collidepoint
+        #every live bullet is tested: one masked pass costs less than keeping a cell index in step with bullets that all move
+        if not self.count:
+            return []
+        live = self.live()
+        pos = self.pos[live].astype(int)
+        inside = (pos[:,0] >= rect.left) & (pos[:,0] < rect.right) & (pos[:,1] >= rect.top) & (pos[:,1] < rect.bottom)
+        return live[inside]
+
+    def collide_rect(self, rect):
+        #slots whose 8x8 box overlaps rect, same test as rect.colliderect(pygame.Rect(x-4,y-4,8,8))
+        if not self.count:
+            return []
+        live = self.live()
+        corner = (self.pos[live] - HALF_BOX).astype(int)
+        overlap = (corner[:,0] < rect.right) & (corner[:,0] + HALF_BOX*2 > rect.left) & (corner[:,1] < rect.bottom) & (corner[:,1] + HALF_BOX*2 > rect.top)
+        return live[overlap]
+
+    def position(self, slot):
+        return (float(self.pos[slot,0]), float(self.pos[slot,1]))
+
+    def render(self, surface, offset=(0,0)):
+        if not self.count and not self.dead_slots:
+            return
+        assets = self.main_game.assets
+        images = [assets[name] for name in SPRITES]
+        flipped = self.main_game.transforms.get(images[0], True)
+        half_sizes = np.array([(img.get_width()/2, img.get_height()/2) for img in images])
+        live = self.drawn()
+        sprite = self.sprite[live]
+        left = ((self.kind[live] == PLAIN) & (self.direction[live,0] <= 0)).tolist()
+        pos = self.pos[live]
+        alpha = self.main_game.alpha
+        if alpha < 1:
+            pos = self.prev_pos[live] + (pos - self.prev_pos[live]) * alpha
+        corner = (pos - half_sizes[sprite] - offset).astype(int).tolist()
+        surface.blits([(flipped if left[i] else images[sprite_id], corner[i]) for i, sprite_id in enumerate(sprite.tolist())], False)
+
+    def bounds(self, offset=(0,0)):
+        #rect on the display that holds every bullet sprite render() draws, None when there are none
+        if not self.count and not self.dead_slots:
+            return None
+        margin = max(max(self.main_game.assets[name].get_size()) for name in SPRITES)//2 + 1
+        pos = self.pos[self.drawn()] - offset
+        left, top = np.floor(pos.min(axis=0) - margin).astype(int).tolist()
+        right, bottom = np.ceil(pos.max(axis=0) + margin).astype(int).tolist()
+        return pygame.Rect(left, top, right-left, bottom-top)
+
+    def __len__(self):
+        return self.count
@@ -0,0 +1,26 @@
+import pygame
+
+class Render_Target:
+    #upscales the visible part of a low-res surface onto the screen
+    #the scaled copy is allocated once per source surface and then scaled into every frame
+    def __init__(self, view_size, scale, margin=8):
+        self.view_size = view_size #source pixels that are visible on screen
+        self.scale = scale
+        self.margin = margin #extra source pixels so a screen shake never uncovers the edge
+        self.targets = {}
+
+    def target_for(self, source):
+        entry = self.targets.get(id(source))
+        if entry is None or entry[0] is not source:
+            width = min(source.get_width(), self.view_size[0] + self.margin)
+            height = min(source.get_height(), self.view_size[1] + self.margin)
+            area = source.subsurface((0, 0, width, height))
+            target = pygame.Surface((width*self.scale, height*self.scale), source.get_flags() & pygame.SRCALPHA, source)
+            entry = (source, area, target)
+            self.targets[id(source)] = entry
+        return entry
+
+    def present(self, source, screen, offset=(0,0)):
+        source, area, target = self.target_for(source)
+        pygame.transform.scale(area, target.get_size(), target)
+        screen.blit(target, offset)
@@ -0,0 +1,65 @@
+import struct
+import sys
+from array import array
+
+#a recorded run: header then the input bits main_game.step got, one uint16 per step
+#step() only takes its input bits and the global random, so the same seed, level and bits play the same run again
+MAGIC = b"DDRP"
+VERSION = 1
+HEADER = struct.Struct("<4sBIb") #magic, version, random seed, level
+
+class Input_Recorder:
+    def __init__(self, path, seed, level, flush_every=600):
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, seed, level))
+        self.inputs = array('H')
+        self.flush_every = flush_every #steps kept in memory before they are written out
+        self.steps = 0
+
+    def add(self, inputs):
+        self.inputs.append(inputs)
+        self.steps += 1
+        if len(self.inputs) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if sys.byteorder == "big":
+            self.inputs.byteswap()
+        self.file.write(self.inputs.tobytes())
+        self.file.flush()
+        self.inputs = array('H')
+
+    def close(self):
+        if self.file:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+class Input_Replay:
+    #called like a bot, each call gives the bits of the next recorded step (0 once it has run out)
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if len(data) < HEADER.size:
+            raise ValueError("%s is not a replay" % path)
+        magic, version, self.seed, self.level = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("%s is not a replay" % path)
+        if version != VERSION:
+            raise ValueError("%s is replay version %d, expected %d" % (path, version, VERSION))
+        self.inputs = array('H', data[HEADER.size:HEADER.size + (len(data)-HEADER.size)//2*2])
+        if sys.byteorder == "big":
+            self.inputs.byteswap()
+        self.index = 0
+
+    def __len__(self):
+        return len(self.inputs)
+
+    def done(self):
+        return self.index >= len(self.inputs)
+
+    def __call__(self, game=None):
+        if self.done():
+            return 0
+        self.index += 1
+        return self.inputs[self.index-1]
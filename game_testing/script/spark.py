@@ -1,7 +1,12 @@
 import math
+import numpy as np
 import pygame
+from script.container import Pool_Counters
 
 class Spark:
+    #one spark on its own, main_game.sparks.append() copies it into the Spark_System
+    __slots__ = ("pos", "angle", "speed")
+    color = (255, 255, 255)
     def __init__(self, pos, angle, speed):
         self.pos = list(pos)
         self.angle = angle
@@ -20,108 +25,127 @@ class Spark:
             (self.pos[0] + math.cos(self.angle+math.pi) * self.speed * 3 - offset[0], self.pos[1] + math.sin(self.angle+math.pi) * self.speed * 3 - offset[1]),
             (self.pos[0] + math.cos(self.angle-math.pi*0.5) * self.speed * 0.5 - offset[0], self.pos[1] + math.sin(self.angle-math.pi*0.5) * self.speed * 0.5 - offset[1]),
         ]
-        pygame.draw.polygon(surface, (255, 255, 255), render_points)
+        pygame.draw.polygon(surface, self.color, render_points)
 
-class Flame:
-    def __init__(self, pos, angle, speed):
-        self.pos = list(pos)
-        self.angle = angle
-        self.speed = speed
-
-    def update(self):
-        self.pos[0] += math.cos(self.angle) * self.speed
-        self.pos[1] += math.sin(self.angle) * self.speed
-
-        self.speed = max(0, self.speed - 0.1)
-        return not self.speed
-    def render(self, surface, offset=[0,0]):
-        render_points = [
-            (self.pos[0] + math.cos(self.angle) * self.speed * 3 - offset[0], self.pos[1] + math.sin(self.angle) * self.speed * 3 - offset[1]),
-            (self.pos[0] + math.cos(self.angle+math.pi*0.5) * self.speed * 0.5 - offset[0], self.pos[1] + math.sin(self.angle+math.pi*0.5) * self.speed * 0.5 - offset[1]),
-            (self.pos[0] + math.cos(self.angle+math.pi) * self.speed * 3 - offset[0], self.pos[1] + math.sin(self.angle+math.pi) * self.speed * 3 - offset[1]),
-            (self.pos[0] + math.cos(self.angle-math.pi*0.5) * self.speed * 0.5 - offset[0], self.pos[1] + math.sin(self.angle-math.pi*0.5) * self.speed * 0.5 - offset[1]),
-        ]
-        pygame.draw.polygon(surface, (255, 0, 0), render_points)
-
-
-class Gold_Flame:
-    def __init__(self, pos, angle, speed):
-        self.pos = list(pos)
-        self.angle = angle
-        self.speed = speed
+class Flame(Spark):
+    __slots__ = ()
+    color = (255, 0, 0)
 
-    def update(self):
-        self.pos[0] += math.cos(self.angle) * self.speed
-        self.pos[1] += math.sin(self.angle) * self.speed
+class Gold_Flame(Spark):
+    __slots__ = ()
+    color = (255, 255, 0)
 
-        self.speed = max(0, self.speed - 0.1)
-        return not self.speed
-    def render(self, surface, offset=[0,0]):
-        render_points = [
-            (self.pos[0] + math.cos(self.angle) * self.speed * 3 - offset[0], self.pos[1] + math.sin(self.angle) * self.speed * 3 - offset[1]),
-            (self.pos[0] + math.cos(self.angle+math.pi*0.5) * self.speed * 0.5 - offset[0], self.pos[1] + math.sin(self.angle+math.pi*0.5) * self.speed * 0.5 - offset[1]),
-            (self.pos[0] + math.cos(self.angle+math.pi) * self.speed * 3 - offset[0], self.pos[1] + math.sin(self.angle+math.pi) * self.speed * 3 - offset[1]),
-            (self.pos[0] + math.cos(self.angle-math.pi*0.5) * self.speed * 0.5 - offset[0], self.pos[1] + math.sin(self.angle-math.pi*0.5) * self.speed * 0.5 - offset[1]),
-        ]
-        pygame.draw.polygon(surface, (255, 255, 0), render_points)
+class Ice_Flame(Spark):
+    __slots__ = ()
+    color = (0, 255, 255)
 
-class Ice_Flame:
-    def __init__(self, pos, angle, speed):
-        self.pos = list(pos)
-        self.angle = angle
-        self.speed = speed
-    def update(self):
-        self.pos[0] += math.cos(self.angle) * self.speed
-        self.pos[1] += math.sin(self.angle) * self.speed
+class Dark_Blue_Flame(Spark):
+    __slots__ = ()
+    color = (0, 0, 139)
 
-        self.speed = max(0, self.speed - 0.1)
-        return not self.speed
-    def render(self, surface, offset=[0,0]):
-        render_points = [
-            (self.pos[0] + math.cos(self.angle) * self.speed * 3 - offset[0], self.pos[1] + math.sin(self.angle) * self.speed * 3 - offset[1]),
-            (self.pos[0] + math.cos(self.angle+math.pi*0.5) * self.speed * 0.5 - offset[0], self.pos[1] + math.sin(self.angle+math.pi*0.5) * self.speed * 0.5 - offset[1]),
-            (self.pos[0] + math.cos(self.angle+math.pi) * self.speed * 3 - offset[0], self.pos[1] + math.sin(self.angle+math.pi) * self.speed * 3 - offset[1]),
-            (self.pos[0] + math.cos(self.angle-math.pi*0.5) * self.speed * 0.5 - offset[0], self.pos[1] + math.sin(self.angle-math.pi*0.5) * self.speed * 0.5 - offset[1]),
-        ]
-        pygame.draw.polygon(surface, (0, 255, 255), render_points)
-
-class Dark_Blue_Flame:
-    def __init__(self, pos, angle, speed):
-        self.pos = list(pos)
-        self.angle = angle
-        self.speed = speed
-    def update(self):
-        self.pos[0] += math.cos(self.angle) * self.speed
-        self.pos[1] += math.sin(self.angle) * self.speed
-
-        self.speed = max(0, self.speed - 0.1)
-        return not self.speed
-    def render(self, surface, offset=[0,0]):
-        render_points = [
-            (self.pos[0] + math.cos(self.angle) * self.speed * 3 - offset[0], self.pos[1] + math.sin(self.angle) * self.speed * 3 - offset[1]),
-            (self.pos[0] + math.cos(self.angle+math.pi*0.5) * self.speed * 0.5 - offset[0], self.pos[1] + math.sin(self.angle+math.pi*0.5) * self.speed * 0.5 - offset[1]),
-            (self.pos[0] + math.cos(self.angle+math.pi) * self.speed * 3 - offset[0], self.pos[1] + math.sin(self.angle+math.pi) * self.speed * 3 - offset[1]),
-            (self.pos[0] + math.cos(self.angle-math.pi*0.5) * self.speed * 0.5 - offset[0], self.pos[1] + math.sin(self.angle-math.pi*0.5) * self.speed * 0.5 - offset[1]),
-        ]
-        pygame.draw.polygon(surface, (0, 0, 139), render_points)
-
-class Flexible_Spark:
+class Flexible_Spark(Spark):
+    __slots__ = ("color",)
     def __init__(self, pos, angle, speed, color_code):
-        self.pos = list(pos)
-        self.angle = angle
-        self.speed = speed
-        self.color_code = color_code
-    def update(self):
-        self.pos[0] += math.cos(self.angle) * self.speed
-        self.pos[1] += math.sin(self.angle) * self.speed
+        super().__init__(pos, angle, speed)
+        self.color = color_code
+
+class Spark_System(Pool_Counters):
+    #every spark in the level, stored in arrays and updated together
+    #cos/sin of the angle are worked out once when a spark is added
+    def __init__(self, capacity=256):
+        self.capacity = 0
+        self.pos = np.zeros((0,2))
+        self.cos_sin = np.zeros((0,2))
+        self.speed = np.zeros(0)
+        self.color = np.zeros((0,3), dtype=np.uint8)
+        self.alive = np.zeros(0, dtype=bool)
+        self.used = np.zeros(0, dtype=bool) #slot has held a spark before
+        self.dying = np.zeros(0, dtype=bool) #stopped last step, drawn once more at speed 0 like the Spark objects were
+        self.dying_slots = []
+        self.free_slots = []
+        self.count = 0
+        self.init_counters()
+        self.grow(capacity)
+
+    def grow(self, capacity):
+        extra = capacity - self.capacity
+        self.pos = np.concatenate((self.pos, np.zeros((extra,2))))
+        self.cos_sin = np.concatenate((self.cos_sin, np.zeros((extra,2))))
+        self.speed = np.concatenate((self.speed, np.zeros(extra)))
+        self.color = np.concatenate((self.color, np.zeros((extra,3), dtype=np.uint8)))
+        self.alive = np.concatenate((self.alive, np.zeros(extra, dtype=bool)))
+        self.used = np.concatenate((self.used, np.zeros(extra, dtype=bool)))
+        self.dying = np.concatenate((self.dying, np.zeros(extra, dtype=bool)))
+        self.free_slots = list(range(capacity-1, self.capacity-1, -1)) + self.free_slots
+        self.capacity = capacity
+
+    def spawn(self, pos, angle, speed, color=(255, 255, 255)):
+        if not self.free_slots:
+            self.grow(self.capacity*2)
+        slot = self.free_slots.pop()
+        self.pos[slot] = pos
+        self.cos_sin[slot] = (math.cos(angle), math.sin(angle))
+        self.speed[slot] = speed
+        self.color[slot] = color
+        self.alive[slot] = True
+        self.count += 1
+        self.counted(self.used[slot])
+        self.used[slot] = True
+        return slot
+
+    def append(self, spark):
+        #keeps main_game.sparks.append(Flame(...)) working
+        self.spawn(spark.pos, spark.angle, spark.speed, spark.color)
+
+    def clear(self):
+        self.alive[:] = False
+        self.dying[:] = False
+        self.dying_slots = []
+        self.count = 0
+        self.free_slots = list(range(self.capacity-1, -1, -1))
 
-        self.speed = max(0, self.speed - 0.1)
-        return not self.speed
-    def render(self, surface, offset=[0,0]):
-        render_points = [
-            (self.pos[0] + math.cos(self.angle) * self.speed * 3 - offset[0], self.pos[1] + math.sin(self.angle) * self.speed * 3 - offset[1]),
-            (self.pos[0] + math.cos(self.angle+math.pi*0.5) * self.speed * 0.5 - offset[0], self.pos[1] + math.sin(self.angle+math.pi*0.5) * self.speed * 0.5 - offset[1]),
-            (self.pos[0] + math.cos(self.angle+math.pi) * self.speed * 3 - offset[0], self.pos[1] + math.sin(self.angle+math.pi) * self.speed * 3 - offset[1]),
-            (self.pos[0] + math.cos(self.angle-math.pi*0.5) * self.speed * 0.5 - offset[0], self.pos[1] + math.sin(self.angle-math.pi*0.5) * self.speed * 0.5 - offset[1]),
-        ]
-        pygame.draw.polygon(surface, self.color_code, render_points)
+    def update(self):
+        if self.dying_slots:
+            self.dying[self.dying_slots] = False
+            self.free_slots.extend(self.dying_slots)
+            self.dying_slots = []
+        if not self.count:
+            return
+        live = np.flatnonzero(self.alive)
+        speed = self.speed[live]
+        self.pos[live] += self.cos_sin[live] * speed[:,None]
+        speed = np.maximum(0, speed - 0.1)
+        self.speed[live] = speed
+        dead = live[speed == 0]
+        self.alive[dead] = False
+        self.dying[dead] = True
+        self.count -= len(dead)
+        self.dying_slots = dead.tolist()
+
+    def render(self, surface, offset=(0,0)):
+        if not self.count and not self.dying_slots:
+            return
+        live = np.flatnonzero(self.alive | self.dying)
+        center = self.pos[live] - offset
+        speed = self.speed[live][:,None]
+        forward = self.cos_sin[live] * speed * 3
+        side = self.cos_sin[live][:,::-1] * speed * 0.5
+        side[:,0] = -side[:,0] #(cos, sin) turned by 90 degrees is (-sin, cos)
+        points = np.stack((center + forward, center + side, center - forward, center - side), axis=1).tolist()
+        colors = self.color[live].tolist()
+        for i in range(len(points)):
+            pygame.draw.polygon(surface, colors[i], points[i])
+
+    def bounds(self, offset=(0,0)):
+        #rect on the display that holds every spark, None when there are none
+        if not self.count and not self.dying_slots:
+            return None
+        live = np.flatnonzero(self.alive | self.dying)
+        pos = self.pos[live] - offset
+        reach = self.speed[live].max()*3 + 1 #the tips are speed*3 from the center
+        left, top = np.floor(pos.min(axis=0) - reach).astype(int).tolist()
+        right, bottom = np.ceil(pos.max(axis=0) + reach).astype(int).tolist()
+        return pygame.Rect(left, top, right-left+1, bottom-top+1)
+
+    def __len__(self):
+        return self.count
@@ -1,27 +1,50 @@
 import pygame
-import pickle
+import struct
+import numpy as np
+from array import array
 
 NEIGHBORS = [(0,0),(0,1), (0,-1), (1,0), (-1,0), (1,1), (-1,-1), (1,-1), (-1,1)]
 HAVE_COLLISION = {'stone', 'grass', 'block'}
 
+CHUNK_SHIFT = 4
+CHUNK_SIZE = 1 << CHUNK_SHIFT #chunks are 16x16 tiles
+CHUNK_MASK = CHUNK_SIZE - 1
+EMPTY = -1
+
+#.level files: header, tile type table, then int16 (x, y, type id) rows for on-grid tiles and for offgrid tiles
+#the rows are read straight out of the file with numpy.frombuffer, convert_levels.py turns old .pickle saves into these
+LEVEL_MAGIC = b"DDLV"
+LEVEL_VERSION = 1
+LEVEL_HEADER = struct.Struct("<4sHHHHH") #magic, version, tile size, type count, on-grid count, offgrid count
+LEVEL_TYPE = struct.Struct("<Bh") #name length, variant, then the name
+OFFGRID_SCALE = 2 #offgrid positions are stored in half pixels, the old json maps have .5 positions
+
 class small_tile:
+    #offgrid tiles, on-grid tiles are stored as ids in chunks (old .pickle levels hold both as these)
     def __init__(self, type, variant, pos=[0,0]):
         self.type = type
         self.variant = variant
         self.pos = list(pos)
     def copy(self):
-        return small_tile(self.type, self.variant, list(self.pos)) 
+        return small_tile(self.type, self.variant, list(self.pos))
 class Tilemap:
     def __init__(self, game, size=16):
         self.game = game
         self.tile_size = size
-        self.tilemap = {} #floor that has collision
-        self.offgrid_tiles = [] #decorative tiles   
+        self.chunks = {} #(chunk x, chunk y) -> array of tile ids, row by row
+        self.tile_types = [] #tile id -> (type, variant)
+        self.tile_ids = {} #(type, variant) -> tile id
+        self.solid_ids = [] #tile id -> has collision
+        self.offgrid_tiles = [] #decorative tiles
+        self.solid_grid = None #numpy copy of the solid tiles for solid_check_many, rebuilt after any change
+        self.collision = None #(merged rects, chunk key -> rects reaching into it) for sweep, rebuilt after any change
+        self.baked = {} #chunk key -> surface with every tile drawn over that chunk (None if empty), made on first render
+        self.baked_shared = False #self.baked also belongs to a snapshot, copied before anything is dropped from it
 
         for i in range(10):
             #setup floor
-            self.tilemap[str(3+i) + ";10"] = small_tile('grass', 1, (3+i,10))
-            self.tilemap["10;" + str(i+5)] = small_tile('stone', 1, (10,i+5))
+            self.set_tile(3+i, 10, 'grass', 1)
+            self.set_tile(10, i+5, 'stone', 1)
 
         for i in range(10):
             #setup offgrid tiles
@@ -30,69 +53,343 @@ class Tilemap:
             self.offgrid_tiles.append(small_tile('decor', 2, (i*16, 32)))
             self.offgrid_tiles.append(small_tile('decor', 3, (i*16, 48)))
 
+    def type_id(self, tile_type, variant):
+        key = (tile_type, variant)
+        if key not in self.tile_ids:
+            self.tile_ids[key] = len(self.tile_types)
+            self.tile_types.append(key)
+            self.solid_ids.append(tile_type in HAVE_COLLISION)
+        return self.tile_ids[key]
+
+    def tile_id(self, x, y):
+        #x, y in tiles, EMPTY if there is nothing there
+        chunk = self.chunks.get((x >> CHUNK_SHIFT, y >> CHUNK_SHIFT))
+        if chunk is None:
+            return EMPTY
+        return chunk[((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)]
+
+    def get_tile(self, x, y):
+        tile_id = self.tile_id(x, y)
+        if tile_id != EMPTY:
+            return self.tile_types[tile_id]
+
+    def set_tile(self, x, y, tile_type, variant):
+        key = (x >> CHUNK_SHIFT, y >> CHUNK_SHIFT)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk = self.chunks[key] = array('h', [EMPTY]) * (CHUNK_SIZE*CHUNK_SIZE)
+        index = ((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)
+        tile_id = self.type_id(tile_type, variant)
+        if chunk[index] == tile_id:
+            return #the editor sets the same tile every frame while the mouse is held
+        chunk[index] = tile_id
+        self.solid_grid = None
+        self.collision = None
+        self.unbake(key, 1)
+
+    def remove_tile(self, x, y):
+        chunk = self.chunks.get((x >> CHUNK_SHIFT, y >> CHUNK_SHIFT))
+        index = ((y & CHUNK_MASK) << CHUNK_SHIFT) | (x & CHUNK_MASK)
+        if chunk is None or chunk[index] == EMPTY:
+            return False
+        chunk[index] = EMPTY
+        self.solid_grid = None
+        self.collision = None
+        self.unbake((x >> CHUNK_SHIFT, y >> CHUNK_SHIFT), 1)
+        return True
+
+    def add_offgrid(self, tile):
+        self.offgrid_tiles.append(tile)
+        self.unbake_offgrid(tile)
+
+    def remove_offgrid(self, tile):
+        self.offgrid_tiles.remove(tile)
+        self.unbake_offgrid(tile)
+
+    def unbake(self, key, spread=0):
+        #drop the baked surfaces around key, spread 1 also covers big tiles that hang into the next chunk (tiles are at most a chunk wide)
+        if self.baked_shared:
+            self.baked = dict(self.baked)
+            self.baked_shared = False
+        for chunk_x in range(key[0]-spread, key[0]+spread+1):
+            for chunk_y in range(key[1]-spread, key[1]+spread+1):
+                self.baked.pop((chunk_x, chunk_y), None)
+
+    def unbake_offgrid(self, tile):
+        chunk_pixels = CHUNK_SIZE*self.tile_size
+        self.unbake((int(tile.pos[0]//chunk_pixels), int(tile.pos[1]//chunk_pixels)), 1)
+
+    def tiles(self):
+        #every on-grid tile as (x, y, type, variant)
+        for (chunk_x, chunk_y), chunk in list(self.chunks.items()):
+            for index, tile_id in enumerate(chunk):
+                if tile_id != EMPTY:
+                    tile_type, variant = self.tile_types[tile_id]
+                    yield (chunk_x << CHUNK_SHIFT) + (index & CHUNK_MASK), (chunk_y << CHUNK_SHIFT) + (index >> CHUNK_SHIFT), tile_type, variant
+
     def extract(self,id_pairs,keep=False):
         matchs = []
         for tile in self.offgrid_tiles.copy():
             if (tile.type, tile.variant) in id_pairs:
                 matchs.append(tile.copy())
                 if not keep:
-                    self.offgrid_tiles.remove(tile)
-        for loc in self.tilemap.copy():
-            tile = self.tilemap[loc]
-            if (tile.type, tile.variant) in id_pairs:
-                matchs.append(tile.copy())
-                matchs[-1].pos = matchs[-1].pos.copy()
-                matchs[-1].pos[0] *= self.tile_size
-                matchs[-1].pos[1] *= self.tile_size
+                    self.remove_offgrid(tile)
+        wanted = [self.tile_ids[pair] for pair in id_pairs if pair in self.tile_ids]
+        if not wanted:
+            return matchs
+        for (chunk_x, chunk_y), chunk in list(self.chunks.items()):
+            #same order as tiles(), without looking at every cell in python
+            for index in np.flatnonzero(np.isin(np.frombuffer(chunk, dtype=np.int16), wanted)).tolist():
+                x = (chunk_x << CHUNK_SHIFT) + (index & CHUNK_MASK)
+                y = (chunk_y << CHUNK_SHIFT) + (index >> CHUNK_SHIFT)
+                tile_type, variant = self.tile_types[chunk[index]]
+                matchs.append(small_tile(tile_type, variant, (x*self.tile_size, y*self.tile_size)))
                 if not keep:
-                    del self.tilemap[loc]   
+                    self.remove_tile(x, y)
         return matchs
 
-    def render(self, surface, offset = [0,0]):
-
-        for x in range(offset[0]//self.tile_size, (offset[0]+surface.get_width())//self.tile_size + 1):
-            for y in range(offset[1]//self.tile_size, (offset[1]+surface.get_height())//self.tile_size + 1):
-                if str(x) + ";" + str(y) in self.tilemap:
-                    tile = self.tilemap[str(x) + ";" + str(y)]
-                    surface.blit(self.game.assets[tile.type][tile.variant], (x*self.tile_size - offset[0], y*self.tile_size-offset[1]))
-
+    def bake(self, key):
+        #draw everything that covers this chunk once, in the same order render used to draw it tile by tile
+        chunk_pixels = CHUNK_SIZE*self.tile_size
+        left = key[0]*chunk_pixels
+        top = key[1]*chunk_pixels
+        area = pygame.Rect(left, top, chunk_pixels, chunk_pixels)
+        surface = None
+        grid_tiles = []
+        for chunk_x in range(key[0]-1, key[0]+1):
+            for chunk_y in range(key[1]-1, key[1]+1):
+                chunk = self.chunks.get((chunk_x, chunk_y))
+                if chunk is None:
+                    continue
+                for index, tile_id in enumerate(chunk):
+                    if tile_id != EMPTY:
+                        grid_tiles.append(((chunk_x << CHUNK_SHIFT) + (index & CHUNK_MASK), (chunk_y << CHUNK_SHIFT) + (index >> CHUNK_SHIFT), tile_id))
+        grid_tiles.sort()
+        for x, y, tile_id in grid_tiles:
+            tile_type, variant = self.tile_types[tile_id]
+            img = self.game.assets[tile_type][variant]
+            if area.colliderect((x*self.tile_size, y*self.tile_size, img.get_width(), img.get_height())):
+                if surface is None:
+                    surface = pygame.Surface((chunk_pixels, chunk_pixels), pygame.SRCALPHA)
+                surface.blit(img, (x*self.tile_size - left, y*self.tile_size - top))
         for tile in self.offgrid_tiles:
-            surface.blit(self.game.assets[tile.type][tile.variant], (tile.pos[0]-offset[0], tile.pos[1]-offset[1]))
+            img = self.game.assets[tile.type][tile.variant]
+            if area.colliderect((tile.pos[0], tile.pos[1], img.get_width(), img.get_height())):
+                if surface is None:
+                    surface = pygame.Surface((chunk_pixels, chunk_pixels), pygame.SRCALPHA)
+                surface.blit(img, (tile.pos[0] - left, tile.pos[1] - top))
+        self.baked[key] = surface
+        return surface
 
-        #for location in self.tilemap:
-        #    tile = self.tilemap[location]
-        #    surface.blit(self.game.assets[tile.type][tile.variant], (tile.pos[0]*self.tile_size - offset[0], tile.pos[1]*self.tile_size-offset[1]))
+    def render(self, surface, offset = [0,0]):
+        chunk_pixels = CHUNK_SIZE*self.tile_size
+        for chunk_x in range(int(offset[0]//chunk_pixels), int((offset[0]+surface.get_width())//chunk_pixels) + 1):
+            for chunk_y in range(int(offset[1]//chunk_pixels), int((offset[1]+surface.get_height())//chunk_pixels) + 1):
+                key = (chunk_x, chunk_y)
+                baked = self.baked[key] if key in self.baked else self.bake(key)
+                if baked:
+                    surface.blit(baked, (chunk_x*chunk_pixels - offset[0], chunk_y*chunk_pixels - offset[1]))
 
     def tiles_around(self, pos):
         tiles = []
         tile_loc = (int(pos[0]//self.tile_size), int(pos[1]//self.tile_size)) #convert pixel position to tile position, which is bigger
         for offset in NEIGHBORS:
-            check = str(tile_loc[0] + offset[0]) + ";" + str(tile_loc[1] + offset[1])
-            if check in self.tilemap:
-                tiles.append(self.tilemap[check])
+            tile_id = self.tile_id(tile_loc[0] + offset[0], tile_loc[1] + offset[1])
+            if tile_id != EMPTY:
+                tile_type, variant = self.tile_types[tile_id]
+                tiles.append(small_tile(tile_type, variant, (tile_loc[0] + offset[0], tile_loc[1] + offset[1])))
         return tiles
-    
-    def tile_collision(self, pos):
-        rects = []  
-        for tile in self.tiles_around(pos):
-            if tile.type in HAVE_COLLISION:
-                rects.append(pygame.Rect(tile.pos[0]*self.tile_size, tile.pos[1]*self.tile_size, self.tile_size, self.tile_size))
-        return rects
-    
+
+    def build_collision(self):
+        #solid tiles merged greedily into rects, each one as wide as its row allows then grown down while the rows below match
+        #every chunk keeps the rects reaching into it as (x0, y0, x1, y1, rect) in tiles, end exclusive, for sweep
+        if self.solid_grid is None:
+            self.build_solid_grid()
+        grid, origin_x, origin_y = self.solid_grid
+        origin_x, origin_y = int(origin_x), int(origin_y)
+        width, height = grid.shape
+        free = grid.copy() #solid and not in a rect yet
+        rects = []
+        cells = {}
+        for y, x in np.argwhere(grid.T).tolist():
+            if not free[x, y]:
+                continue
+            w = 1
+            while x + w < width and free[x + w, y]:
+                w += 1
+            h = 1
+            while y + h < height and free[x:x + w, y + h].all():
+                h += 1
+            free[x:x + w, y:y + h] = False
+            rect = pygame.Rect((origin_x + x)*self.tile_size, (origin_y + y)*self.tile_size, w*self.tile_size, h*self.tile_size)
+            rects.append(rect)
+            box = (origin_x + x, origin_y + y, origin_x + x + w, origin_y + y + h, rect)
+            for chunk_x in range(box[0] >> CHUNK_SHIFT, ((box[2] - 1) >> CHUNK_SHIFT) + 1):
+                for chunk_y in range(box[1] >> CHUNK_SHIFT, ((box[3] - 1) >> CHUNK_SHIFT) + 1):
+                    cells.setdefault((chunk_x, chunk_y), []).append(box)
+        self.collision = (rects, {key: tuple(boxes) for key, boxes in cells.items()})
+
+    def sweep(self, position, size, distance, axis):
+        #a box at position moved distance along axis (0 x, 1 y): the pixel edge of the first solid tile it runs into, None if the way is clear
+        #the lines of tiles from the ones it covers now to the ones it covers at the end are checked against the merged rects of
+        #the chunks they fall in, the nearest line a rect reaches is the hit, so nothing is passed through at any speed.
+        #Positions are truncated like pygame.Rect does
+        if self.collision is None:
+            self.build_collision()
+        cells = self.collision[1]
+        tile_size = self.tile_size
+        start = int(position[axis])
+        end = int(position[axis] + distance)
+        across = int(position[1 - axis])
+        across_low = across // tile_size
+        across_high = (across + size[1 - axis] - 1) // tile_size
+        if distance > 0:
+            low = start // tile_size
+            high = (end + size[axis] - 1) // tile_size
+        else:
+            low = end // tile_size
+            high = (start + size[axis] - 1) // tile_size
+        hit = None
+        for line_chunk in range(low >> CHUNK_SHIFT, (high >> CHUNK_SHIFT) + 1):
+            for across_chunk in range(across_low >> CHUNK_SHIFT, (across_high >> CHUNK_SHIFT) + 1):
+                for box in cells.get((line_chunk, across_chunk) if axis == 0 else (across_chunk, line_chunk), ()):
+                    line_start, line_end = box[axis], box[axis + 2]
+                    if box[3 - axis] <= across_low or box[1 - axis] > across_high or line_end <= low or line_start > high:
+                        continue
+                    if distance > 0:
+                        line = max(line_start, low)
+                        if hit is None or line < hit:
+                            hit = line
+                    else:
+                        line = min(line_end - 1, high)
+                        if hit is None or line > hit:
+                            hit = line
+        if hit is None:
+            return None
+        return hit * tile_size if distance > 0 else (hit + 1) * tile_size
+
     def solid_check(self,pos):
-        tile_loc= str(int(pos[0]//self.tile_size))+";"+ str(int(pos[1]//self.tile_size))
-        if tile_loc in self.tilemap:
-            if self.tilemap[tile_loc].type in HAVE_COLLISION:
-                return self.tilemap[tile_loc]
+        tile_id = self.tile_id(int(pos[0]//self.tile_size), int(pos[1]//self.tile_size))
+        if tile_id != EMPTY and self.solid_ids[tile_id]:
+            return self.tile_types[tile_id]
+
+    def build_solid_grid(self):
+        if not self.chunks:
+            self.solid_grid = (np.zeros((1,1), dtype=bool), 0, 0)
+            return
+        keys = np.array(list(self.chunks), dtype=int)
+        origin = keys.min(axis=0)
+        size = (keys.max(axis=0) - origin + 1) * CHUNK_SIZE
+        grid = np.zeros(size, dtype=bool)
+        solid_ids = np.array(self.solid_ids + [False], dtype=bool) #EMPTY (-1) picks the last entry
+        for (chunk_x, chunk_y), chunk in self.chunks.items():
+            ids = np.frombuffer(chunk, dtype=np.int16).reshape(CHUNK_SIZE, CHUNK_SIZE) #[y][x]
+            left = (chunk_x - origin[0]) * CHUNK_SIZE
+            top = (chunk_y - origin[1]) * CHUNK_SIZE
+            grid[left:left+CHUNK_SIZE, top:top+CHUNK_SIZE] = solid_ids[ids].T
+        self.solid_grid = (grid, origin[0] * CHUNK_SIZE, origin[1] * CHUNK_SIZE)
+
+    def solid_check_many(self, positions):
+        #same as solid_check for an (n,2) array of pixel positions, returns a bool array
+        if self.solid_grid is None:
+            self.build_solid_grid()
+        grid, origin_x, origin_y = self.solid_grid
+        x = np.floor_divide(positions[:,0], self.tile_size).astype(int) - origin_x
+        y = np.floor_divide(positions[:,1], self.tile_size).astype(int) - origin_y
+        inside = (x >= 0) & (x < grid.shape[0]) & (y >= 0) & (y < grid.shape[1])
+        solid = np.zeros(len(positions), dtype=bool)
+        solid[inside] = grid[x[inside], y[inside]]
+        return solid
+
+    def clear(self):
+        self.chunks = {}
+        self.tile_types = []
+        self.tile_ids = {}
+        self.solid_ids = []
+        self.offgrid_tiles = []
+        self.solid_grid = None
+        self.collision = None
+        self.baked = {}
+        self.baked_shared = False
+
+    def snapshot(self):
+        #the tiles as they are now, for restore() to put back without reading the level again
+        #chunks the tilemap bakes from here on are kept in the snapshot too, until a tile changes
+        #the collision rects are never changed once built, a tile change builds new ones, so they are shared as they are
+        if self.collision is None:
+            self.build_collision()
+        self.baked_shared = True
+        return (self.tile_size, list(self.tile_types), {key: array('h', chunk) for key, chunk in self.chunks.items()},
+                [tile.copy() for tile in self.offgrid_tiles], self.baked, self.collision)
+
+    def restore(self, snapshot):
+        tile_size, tile_types, chunks, offgrid_tiles, baked, collision = snapshot
+        self.clear()
+        self.tile_size = tile_size
+        for tile_type, variant in tile_types:
+            self.type_id(tile_type, variant)
+        self.chunks = {key: array('h', chunk) for key, chunk in chunks.items()}
+        self.offgrid_tiles = [tile.copy() for tile in offgrid_tiles]
+        self.baked = baked
+        self.baked_shared = True
+        self.collision = collision
 
-    
     def save(self, path):
         with open(path, 'wb') as f:
-            #save tilemap and offgrid tiles
-            pickle.dump(self.tilemap, f)
-            pickle.dump(self.offgrid_tiles, f)
+            f.write(self.pack())
+
+    def pack(self):
+        #every tile type the offgrid tiles use goes in the table too, so ids are shared
+        for tile in self.offgrid_tiles:
+            self.type_id(tile.type, tile.variant)
+        grid = [(x, y, self.tile_ids[(tile_type, variant)]) for x, y, tile_type, variant in self.tiles()]
+        offgrid = [(round(tile.pos[0]*OFFGRID_SCALE), round(tile.pos[1]*OFFGRID_SCALE), self.tile_ids[(tile.type, tile.variant)]) for tile in self.offgrid_tiles]
+        data = bytearray(LEVEL_HEADER.pack(LEVEL_MAGIC, LEVEL_VERSION, self.tile_size, len(self.tile_types), len(grid), len(offgrid)))
+        for tile_type, variant in self.tile_types:
+            name = tile_type.encode()
+            data += LEVEL_TYPE.pack(len(name), variant) + name
+        if len(data) % 2:
+            data += b"\0" #keep the int16 rows aligned
+        data += np.array(grid + offgrid, dtype='<i2').reshape(-1, 3).tobytes()
+        return bytes(data)
+
+    def unpack(self, data):
+        #data: bytes or an mmap of a .level file
+        magic, version, tile_size, type_count, grid_count, offgrid_count = LEVEL_HEADER.unpack_from(data)
+        if magic != LEVEL_MAGIC or version != LEVEL_VERSION:
+            raise ValueError("not a version %d level" % LEVEL_VERSION)
+        self.clear()
+        self.tile_size = tile_size
+        offset = LEVEL_HEADER.size
+        for i in range(type_count):
+            length, variant = LEVEL_TYPE.unpack_from(data, offset)
+            offset += LEVEL_TYPE.size
+            self.type_id(bytes(data[offset:offset+length]).decode(), variant)
+            offset += length
+        offset += offset % 2
+        rows = np.frombuffer(data, dtype='<i2', count=(grid_count+offgrid_count)*3, offset=offset).reshape(-1, 3)
+        grid = rows[:grid_count].astype(np.int32)
+        if grid_count:
+            #every chunk filled in one go: rows grouped by chunk, then each cell set by index
+            #chunk x, y packed into one int (int16 tiles fit in 16 bits each) so np.unique works on a flat array
+            keys, first_row, chunk_of_row = np.unique(((grid[:,0] >> CHUNK_SHIFT) << 16) + (grid[:,1] >> CHUNK_SHIFT), return_index=True, return_inverse=True)
+            cells = np.full((len(keys), CHUNK_SIZE*CHUNK_SIZE), EMPTY, dtype=np.int16)
+            cells[chunk_of_row, ((grid[:,1] & CHUNK_MASK) << CHUNK_SHIFT) | (grid[:,0] & CHUNK_MASK)] = grid[:,2]
+            for i in np.argsort(first_row).tolist():
+                #chunks go in the order they were saved in, extract() finds tiles in that order
+                key = int(keys[i])
+                chunk_y = ((key + (1 << 15)) & 0xffff) - (1 << 15)
+                self.chunks[((key - chunk_y) >> 16, chunk_y)] = array('h', cells[i].tobytes())
+        for x, y, type_id in rows[grid_count:].tolist():
+            tile_type, variant = self.tile_types[type_id]
+            self.offgrid_tiles.append(small_tile(tile_type, variant, (unscale(x), unscale(y))))
 
     def load(self, path):
         with open(path, 'rb') as f:
-            self.tilemap = pickle.load(f)
-            self.offgrid_tiles = pickle.load(f)
\ No newline at end of file
+            self.unpack(f.read())
+
+def unscale(value):
+    #offgrid position back to pixels, whole pixels stay ints like the ones placed in the editor
+    if value % OFFGRID_SCALE:
+        return value / OFFGRID_SCALE
+    return value // OFFGRID_SCALE
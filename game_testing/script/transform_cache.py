@@ -0,0 +1,53 @@
+from collections import OrderedDict
+import pygame
+
+class Transform_Cache:
+    #flipped/scaled/rotated copies of sprites, made once and reused every frame
+    #keyed by (id of the source, flip_x, flip_y, size, angle, alpha), least recently used entries are dropped past capacity
+    #every entry keeps its source alive so the id cannot be reused while the entry exists
+    #the returned surface is shared, blit it but do not draw on it or change its alpha (ask for alpha= instead)
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, surface, flip_x=False, flip_y=False, size=None, angle=0, alpha=None):
+        #same order as the old call sites: flip, then scale, then rotate
+        if size is not None:
+            size = (int(size[0]), int(size[1]))
+            if size == surface.get_size():
+                size = None
+        if alpha is not None:
+            alpha = int(alpha)
+        if not (flip_x or flip_y or size or angle) and alpha is None:
+            return surface
+        key = (id(surface), flip_x, flip_y, size, angle, alpha)
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] is surface:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[1]
+        self.misses += 1
+        img = surface
+        if flip_x or flip_y:
+            img = pygame.transform.flip(img, flip_x, flip_y)
+        if size:
+            img = pygame.transform.scale(img, size)
+        if angle:
+            img = pygame.transform.rotate(img, angle)
+        if alpha is not None:
+            if img is surface:
+                img = surface.copy()
+            img.set_alpha(alpha)
+        self.entries[key] = (surface, img)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+        return img
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
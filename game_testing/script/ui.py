@@ -0,0 +1,80 @@
+import pygame
+
+IDLE_WAIT = 500 #ms an idle menu sleeps waiting for input before it looks again
+
+class Menu_Screen:
+    #title, setting and pause screens: a static background plus widgets that are drawn on top of it in order
+    #a widget is only redrawn when the image it shows or its position changes,
+    #then just that part of the screen is redrawn and handed to display.update
+    def __init__(self, screen, overlay):
+        self.screen = screen
+        self.overlay = overlay
+        self.background = pygame.Surface(screen.get_size())
+        self.widgets = {} #name -> (image, rect), in drawing order
+        self.texts = {} #name -> (text, image), so text is only rendered again when it changes
+        self.dirty = []
+        self.full = True
+        self.darkness = None
+
+    def start(self, draw_background):
+        #draw_background(surface) draws everything that does not change while the menu is open
+        draw_background(self.background)
+        self.widgets = {}
+        self.texts = {}
+        self.dirty = []
+        self.full = True
+
+    def show(self, name, image, pos):
+        rect = image.get_rect(topleft=(int(pos[0]), int(pos[1]))) #blit truncates float positions the same way
+        old = self.widgets.get(name)
+        if old is not None and old[0] is image and old[1] == rect:
+            return
+        if old is not None:
+            self.dirty.append(old[1])
+        self.dirty.append(rect)
+        self.widgets[name] = (image, rect)
+
+    def show_text(self, name, font, text, pos, color=(255,255,255)):
+        cached = self.texts.get(name)
+        if cached is None or cached[0] != text:
+            cached = (text, font.render(text, True, color))
+            self.texts[name] = cached
+        self.show(name, cached[1], pos)
+
+    def idle(self):
+        return not (self.full or self.dirty or self.darkness != self.overlay.darkness)
+
+    def events(self, idle):
+        #when nothing is changing, sleep until there is input instead of spinning at FPS
+        if not idle:
+            return pygame.event.get()
+        event = pygame.event.wait(IDLE_WAIT)
+        return ([event] if event.type != pygame.NOEVENT else []) + pygame.event.get()
+
+    def flush(self):
+        if self.darkness != self.overlay.darkness:
+            self.darkness = self.overlay.darkness
+            self.full = True
+        if self.full:
+            self.redraw(self.screen.get_rect())
+            pygame.display.flip()
+        elif self.dirty:
+            rects = [rect.clip(self.screen.get_rect()) for rect in self.dirty]
+            for rect in rects:
+                self.redraw(rect)
+            pygame.display.update(rects)
+        self.full = False
+        self.dirty = []
+
+    def redraw(self, rect):
+        self.screen.set_clip(rect)
+        self.screen.blit(self.background, (0, 0))
+        for image, widget_rect in self.widgets.values():
+            if widget_rect.colliderect(rect):
+                self.screen.blit(image, widget_rect)
+        self.overlay.finish(self.screen)
+        self.screen.set_clip(None)
+
+    def invalidate(self):
+        #something else drew on the screen (the game, a fade), redraw all of it next flush
+        self.full = True
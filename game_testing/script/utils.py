@@ -63,32 +63,64 @@ def load_fix_tile(path):
         images.append(pygame.transform.scale(load_image(path + "/" + img_name), (TILE_SIZE, TILE_SIZE)))
     return images
 
-class Animation:
+class Animation_Clip:
+    #the frames of one animation, loaded once and shared by every Animation playing it, never changed
+    #frame_images has an entry per game frame, so looking up the image is one index
+    __slots__ = ("images", "duration", "loop", "length", "frame_images")
     def __init__(self,images, duration=5,loop=True):
-        self.images = images
+        self.images = tuple(images)
         self.duration = duration
         self.loop = loop
-        self.current_frame = 0
-        self.counter = 0
-        self.done = False   
-        self.frame = 0
+        self.frame_images = tuple(img for img in self.images for i in range(duration))
+        self.length = len(self.frame_images)
 
-    def copy(self):
-        return Animation(self.images, self.duration, self.loop)
+    def get_width(self):
+        return self.images[0].get_width()
     
+    def get_height(self):
+        return self.images[0].get_height()
+
+class Animation:
+    #one entity or particle playing a clip, only where it is and whether it has finished
+    __slots__ = ("clip", "frame", "done")
+    def __init__(self, clip, frame=0):
+        self.clip = clip
+        self.frame = frame
+        self.done = False
+
+    def copy(self):
+        return Animation(self.clip)
+
+    @property
+    def images(self):
+        return self.clip.images
+
     def img(self):
-        return self.images[int(self.frame/self.duration)]
+        return self.clip.frame_images[self.frame]
 
     def update(self):
-        if self.loop:
-            self.frame = (self.frame + 1) % (len(self.images)*self.duration)
+        clip = self.clip
+        if clip.loop:
+            self.frame = (self.frame + 1) % clip.length
         else:
-            self.frame = min(self.frame + 1, len(self.images)*self.duration-1)  
-            if self.frame >= len(self.images)*self.duration-1:
+            self.frame = min(self.frame + 1, clip.length-1)  
+            if self.frame >= clip.length-1:
                 self.done = True
 
     def get_width(self):
-        return self.images[0].get_width()
+        return self.clip.get_width()
     
     def get_height(self):
-        return self.images[0].get_height()
\ No newline at end of file
+        return self.clip.get_height()
+
+def update_animations(animations):
+    #Animation.update for a whole batch of cursors without a method call each
+    for anim in animations:
+        clip = anim.clip
+        if clip.loop:
+            anim.frame = (anim.frame + 1) % clip.length
+        else:
+            last = clip.length-1
+            anim.frame = min(anim.frame + 1, last)
+            if anim.frame >= last:
+                anim.done = True